@@ -511,3 +511,134 @@
   });
 })();
 
+
+// «Показать ещё» в лентах объявлений: подгрузка карточек по курсору (uzmat:listing_feed)
+(() => {
+  const loadMore = (btn) => {
+    if (btn.dataset.loading === '1') return;
+    const grid = document.querySelector('.uz-bento-grid');
+    if (!grid) return;
+    btn.dataset.loading = '1';
+    btn.disabled = true;
+
+    const url = new URL(btn.dataset.feedUrl, window.location.origin);
+    url.searchParams.set('cursor', btn.dataset.cursor);
+    fetch(url.toString(), { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+      .then((r) => r.json())
+      .then((data) => {
+        if (!data.ok) throw new Error(data.error || 'feed error');
+        grid.insertAdjacentHTML('beforeend', data.html);
+        const next = document.querySelector('[data-listing-next]');
+        if (data.has_next) {
+          btn.dataset.cursor = data.next_cursor;
+          if (next) {
+            const nextUrl = new URL(next.href, window.location.origin);
+            nextUrl.searchParams.delete('page');
+            nextUrl.searchParams.set('cursor', data.next_cursor);
+            next.href = nextUrl.toString();
+          }
+        } else {
+          btn.remove();
+          if (next) next.remove();
+        }
+      })
+      .catch(() => {})
+      .finally(() => {
+        btn.dataset.loading = '';
+        btn.disabled = false;
+      });
+  };
+
+  document.addEventListener('click', (e) => {
+    const btn = e.target.closest('.uz-load-more');
+    if (!btn) return;
+    e.preventDefault();
+    loadMore(btn);
+  });
+
+  // Бесконечная прокрутка: кнопка сама срабатывает, когда доходит до экрана
+  if (!('IntersectionObserver' in window)) return;
+  const observer = new IntersectionObserver((entries) => {
+    entries.forEach((entry) => {
+      if (entry.isIntersecting) loadMore(entry.target);
+    });
+  }, { rootMargin: '400px 0px' });
+  const observeButtons = () => {
+    document.querySelectorAll('.uz-load-more:not([data-observed])').forEach((btn) => {
+      btn.dataset.observed = '1';
+      observer.observe(btn);
+    });
+  };
+  observeButtons();
+  // Пагинация перерисовывается при смене фильтров без перезагрузки страницы
+  new MutationObserver(observeButtons).observe(document.body, { childList: true, subtree: true });
+})();
+
+// Подсказки при вводе для полей с data-suggest="brand|model|equipment_type|city" (uzmat:suggest)
+(() => {
+  const SUGGEST_URL = '/api/suggest/';
+  const timers = new WeakMap();
+  const cache = new Map();
+
+  const datalistFor = (input) => {
+    if (input.list) return input.list;
+    const list = document.createElement('datalist');
+    list.id = 'suggest-' + input.name;
+    input.insertAdjacentElement('afterend', list);
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+    return list;
+  };
+
+  const render = (input, suggestions) => {
+    const list = datalistFor(input);
+    list.innerHTML = '';
+    suggestions.forEach((item) => {
+      const option = document.createElement('option');
+      option.value = item.value;
+      option.label = item.value + ' (' + item.count + ')';
+      list.appendChild(option);
+    });
+  };
+
+  const load = (input) => {
+    const q = input.value.trim();
+    if (!q) return;
+    const key = input.dataset.suggest + '|' + q.toLowerCase();
+    if (cache.has(key)) {
+      render(input, cache.get(key));
+      return;
+    }
+    const url = new URL(SUGGEST_URL, window.location.origin);
+    url.searchParams.set('q', q);
+    url.searchParams.set('field', input.dataset.suggest);
+    fetch(url.toString())
+      .then((r) => r.json())
+      .then((data) => {
+        if (!data.ok) return;
+        cache.set(key, data.suggestions);
+        // Ответ мог опоздать: показываем, только если текст не изменился
+        if (input.value.trim() === q) render(input, data.suggestions);
+      })
+      .catch(() => {});
+  };
+
+  document.addEventListener('input', (e) => {
+    const input = e.target;
+    if (!(input instanceof HTMLInputElement) || !input.dataset.suggest) return;
+    clearTimeout(timers.get(input));
+    timers.set(input, setTimeout(() => load(input), 120));
+  });
+})();
+
+// «Сохранить поиск»: берём текущие значения формы фильтров (их меняют без перезагрузки страницы)
+document.addEventListener('submit', (e) => {
+  const form = e.target.closest && e.target.closest('[data-saved-search-form]');
+  const filters = document.getElementById('filters-form');
+  if (!form || !filters) return;
+  const params = new URLSearchParams();
+  new FormData(filters).forEach((value, key) => {
+    if (typeof value === 'string' && value.trim() && value !== 'all') params.append(key, value.trim());
+  });
+  form.querySelector('input[name="query"]').value = params.toString();
+});
@@ -4,11 +4,19 @@ from .models import (
     User,
     Advertisement,
     Favorite,
+    SavedSearch,
     Category,
     VerificationRequest,
+    Payment,
     ChatThread,
     ChatMessage,
     ChatImage,
+    Broadcast,
+    QueuedTask,
+    ScheduledJob,
+    TelegramOutbox,
+    DictionaryEntry,
+    DictionaryAlias,
 )
 
 
@@ -80,6 +88,14 @@ class FavoriteAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
 
 
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ('title', 'user', 'section', 'is_active', 'matches_count', 'last_matched_at', 'created_at')
+    list_filter = ('section', 'is_active', 'notify_email')
+    search_fields = ('title', 'user__username', 'user__email')
+    raw_id_fields = ('user',)
+
+
 @admin.register(VerificationRequest)
 class VerificationRequestAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'verification_type', 'status', 'created_at', 'reviewed_at')
@@ -88,6 +104,15 @@ class VerificationRequestAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
 
 
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'payment_type', 'plan', 'amount', 'status', 'click_trans_id', 'created_at', 'completed_at')
+    list_filter = ('payment_type', 'status', 'created_at')
+    search_fields = ('id', 'click_trans_id', 'user__username', 'user__email')
+    raw_id_fields = ('user', 'advertisement')
+    readonly_fields = ('created_at', 'updated_at', 'completed_at')
+
+
 class ChatImageInline(admin.TabularInline):
     model = ChatImage
     extra = 0
@@ -111,3 +136,47 @@ class ChatMessageAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
     inlines = (ChatImageInline,)
 
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('id', 'sender', 'status', 'sent_count', 'total_recipients', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('encrypted_text', 'last_user_id', 'created_at', 'updated_at', 'finished_at')
+
+
+@admin.register(QueuedTask)
+class QueuedTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    readonly_fields = ('created_at', 'updated_at', 'locked_at')
+
+
+@admin.register(TelegramOutbox)
+class TelegramOutboxAdmin(admin.ModelAdmin):
+    list_display = ('advertisement', 'status', 'attempts', 'run_after', 'sent_at', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('advertisement__title', 'last_error')
+    raw_id_fields = ('advertisement',)
+    readonly_fields = ('attempts', 'locked_at', 'message_id', 'last_error', 'created_at', 'updated_at', 'sent_at')
+
+
+@admin.register(ScheduledJob)
+class ScheduledJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'next_run_at', 'last_started_at', 'last_finished_at', 'last_result', 'locked_by')
+    search_fields = ('name', 'last_error')
+    readonly_fields = ('locked_until', 'locked_by', 'last_started_at', 'last_finished_at', 'last_result', 'last_error')
+
+
+class DictionaryAliasInline(admin.TabularInline):
+    model = DictionaryAlias
+    extra = 1
+    fields = ('key',)
+
+
+@admin.register(DictionaryEntry)
+class DictionaryEntryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind')
+    list_filter = ('kind',)
+    search_fields = ('name', 'aliases__key')
+    inlines = (DictionaryAliasInline,)
@@ -0,0 +1,21 @@
+"""
+Management command: замер выборки ленты главной (сортировка по выражению против bump_phase)
+Использование: python manage.py benchmark_feed [--ads 200000] [--repeat 20]
+Синтетические объявления создаются в транзакции и откатываются.
+"""
+from django.core.management.base import BaseCommand
+
+from uzmat.utils.bump_rank import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает время выборки ленты «свежеподнятые первыми»: до (Coalesce) и после (bump_phase)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ads', type=int, default=200000, help='Сколько синтетических объявлений создать (по умолчанию: 200000)')
+        parser.add_argument('--repeat', type=int, default=20, help='Повторов каждого запроса (по умолчанию: 20)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Создаём {options["ads"]} объявлений (будут откатаны)...')
+        benchmark(options['ads'], options['repeat'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('Замер завершён'))
@@ -0,0 +1,25 @@
+"""
+Management command: расчёт похожих объявлений (SimilarAd)
+Использование: python manage.py build_similar_ads [--full] [--benchmark 100000]
+Без флагов пересчитывает только новые и изменённые объявления — удобно запускать по cron.
+"""
+from django.core.management.base import BaseCommand
+
+from uzmat.utils.similar_ads import benchmark, build_similar_ads
+
+
+class Command(BaseCommand):
+    help = 'Рассчитывает похожие объявления (инкрементально или полностью) и сохраняет соседей в SimilarAd'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересчитать все объявления заново')
+        parser.add_argument('--benchmark', type=int, metavar='N', help='Замер на N синтетических объявлениях (без записи в БД)')
+
+    def handle(self, *args, **options):
+        if options.get('benchmark'):
+            seconds = benchmark(options['benchmark'], stdout=self.stdout)
+            self.stdout.write(self.style.SUCCESS(f'Замер завершён за {seconds:.1f} с'))
+            return
+
+        total = build_similar_ads(full=options['full'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Готово. Пересчитано объявлений: {total}'))
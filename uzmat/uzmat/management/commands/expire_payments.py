@@ -0,0 +1,25 @@
+"""
+Management command: перевод неоплаченных просроченных платежей в failed
+Использование: python manage.py expire_payments [--hours N]
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from uzmat.utils.payments import PAYMENT_TTL, expire_stale_payments
+
+
+class Command(BaseCommand):
+    help = 'Закрывает платежи Click, не оплаченные за отведённое время (по умолчанию 24 часа)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=PAYMENT_TTL.total_seconds() / 3600,
+            help='Через сколько часов неоплаченный платёж считается просроченным (по умолчанию: 24)',
+        )
+
+    def handle(self, *args, **options):
+        expired = expire_stale_payments(timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f'Готово. Просрочено платежей: {expired}'))
@@ -0,0 +1,65 @@
+"""
+Management command: уменьшенные копии для уже загруженных фотографий
+Использование: python manage.py generate_thumbnails [--force] [--chat] [--batch-size N]
+"""
+from django.core.management.base import BaseCommand
+
+from uzmat.models import AdvertisementImage, ChatImage
+from uzmat.utils.thumbnails import build_thumbnails, source_fields
+
+
+class Command(BaseCommand):
+    help = 'Создаёт WebP/JPEG копии фиксированной ширины для фотографий объявлений (и чатов)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать копии, даже если они уже есть',
+        )
+        parser.add_argument(
+            '--chat',
+            action='store_true',
+            help='Также обработать фото из чатов',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Количество фото в одной пачке (по умолчанию: 200)',
+        )
+
+    def handle(self, *args, **options):
+        models = [AdvertisementImage]
+        if options['chat']:
+            models.append(ChatImage)
+
+        for model in models:
+            done, failed = self._process(model, options['batch_size'], options['force'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: создано копий для {done}, ошибок: {failed}'
+            ))
+
+    def _process(self, model, batch_size, force):
+        last_id = 0
+        done = 0
+        failed = 0
+        while True:
+            batch = list(model.objects
+                         .filter(id__gt=last_id)
+                         .order_by('id')
+                         .only(*source_fields(model))[:batch_size])
+            if not batch:
+                break
+            for obj in batch:
+                if obj.thumbnails and not force:
+                    continue
+                try:
+                    if build_thumbnails(obj):
+                        done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'#{obj.id} ({obj.image.name}): {e}'))
+            last_id = batch[-1].id
+            self.stdout.write(f'Обработано до #{last_id}')
+        return done, failed
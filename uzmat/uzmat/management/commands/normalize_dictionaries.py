@@ -0,0 +1,31 @@
+"""
+Management command: нормализация городов, марок и типов техники по справочникам
+Использование: python manage.py normalize_dictionaries [--batch-size N]
+"""
+from django.core.management.base import BaseCommand
+
+from uzmat.models import Advertisement, DictionaryEntry, DictionaryAlias, FacetCount
+from uzmat.utils.dictionaries import seed_dictionaries, normalize_advertisements
+from uzmat.utils.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = 'Дополняет справочники начальными синонимами и проставляет объявлениям ссылки на них'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество объявлений в одной пачке (по умолчанию: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        seed_dictionaries(DictionaryEntry, DictionaryAlias)
+        changed = normalize_advertisements(
+            Advertisement, DictionaryEntry, DictionaryAlias,
+            batch_size=options['batch_size'], stdout=self.stdout,
+        )
+        # Фасеты группируются по каноническим названиям — пересчитываем
+        rebuild_facets(Advertisement, FacetCount, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Готово. Изменено объявлений: {changed}'))
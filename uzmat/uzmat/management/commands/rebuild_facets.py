@@ -0,0 +1,16 @@
+"""
+Management command: полный пересчёт счётчиков фасетов (FacetCount)
+Использование: python manage.py rebuild_facets
+"""
+from django.core.management.base import BaseCommand
+
+from uzmat.models import Advertisement, FacetCount
+from uzmat.utils.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики фасетов фильтров (города, марки, типы техники, состояние, цены)'
+
+    def handle(self, *args, **options):
+        total = rebuild_facets(Advertisement, FacetCount, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Готово. Строк FacetCount: {total}'))
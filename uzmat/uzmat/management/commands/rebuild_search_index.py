@@ -0,0 +1,24 @@
+"""
+Management команда для полной перестройки поискового индекса объявлений
+Использование: python manage.py rebuild_search_index [--batch-size N]
+"""
+from django.core.management.base import BaseCommand
+from uzmat.models import Advertisement, AdSearchTerm
+from uzmat.utils.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает инвертированный индекс поиска по объявлениям'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество объявлений в одной пачке (по умолчанию: 500)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Перестраиваю поисковый индекс...')
+        total = rebuild_index(Advertisement, AdSearchTerm, batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Готово! Проиндексировано объявлений: {total}'))
@@ -0,0 +1,24 @@
+"""
+Management command: пересчёт счётчиков непрочитанных сообщений в чатах
+Использование: python manage.py recount_unread [--batch-size N]
+"""
+from django.core.management.base import BaseCommand
+
+from uzmat.models import ChatThread, ChatMessage
+from uzmat.utils.chat_unread import recount_unread
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики непрочитанных сообщений ChatThread по таблице сообщений'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество тредов в одной пачке (по умолчанию: 500)',
+        )
+
+    def handle(self, *args, **options):
+        fixed = recount_unread(ChatThread, ChatMessage, batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Готово. Исправлено тредов: {fixed}'))
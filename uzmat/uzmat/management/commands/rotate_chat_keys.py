@@ -0,0 +1,52 @@
+"""
+Management command: перешифровка сообщений чатов основным ключом
+Использование: python manage.py rotate_chat_keys [--batch-size N]
+"""
+from cryptography.fernet import InvalidToken
+from django.core.management.base import BaseCommand
+
+from uzmat.models import ChatMessage
+from uzmat.utils.chat_crypto import rotate_token
+
+
+class Command(BaseCommand):
+    help = 'Перешифровывает тексты сообщений основным ключом (после смены SECRET_KEY / CHAT_ENCRYPTION_KEYS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество сообщений в одной пачке (по умолчанию: 500)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        rotated = 0
+        skipped = 0
+        while True:
+            batch = list(ChatMessage.objects
+                         .filter(id__gt=last_id, encrypted_text__isnull=False)
+                         .order_by('id')
+                         .only('id', 'encrypted_text')[:batch_size])
+            if not batch:
+                break
+            changed = []
+            for msg in batch:
+                try:
+                    token = rotate_token(msg.encrypted_text)
+                except InvalidToken:
+                    # Текст не расшифровывается ни одним ключом (или это plaintext)
+                    skipped += 1
+                    continue
+                if token is not None:
+                    msg.encrypted_text = token
+                    changed.append(msg)
+            if changed:
+                ChatMessage.objects.bulk_update(changed, ['encrypted_text'])
+            rotated += len(changed)
+            last_id = batch[-1].id
+            self.stdout.write(f'Обработано до #{last_id}, перешифровано: {rotated}')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово. Перешифровано: {rotated}, пропущено: {skipped}'))
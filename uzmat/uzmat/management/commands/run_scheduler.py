@@ -0,0 +1,61 @@
+"""
+Management command: планировщик периодических задач
+Использование: python manage.py run_scheduler [--once] [--job NAME ...] [--list]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from uzmat.utils.scheduler import load_jobs, run_due_jobs, seconds_until_next
+
+
+class Command(BaseCommand):
+    help = 'Выполняет плановые задачи (истечение продвижений и платежей, напоминания о галочке)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить задачи, срок которых наступил, и выйти (для cron)',
+        )
+        parser.add_argument(
+            '--job',
+            action='append',
+            dest='jobs',
+            help='Только указанная задача (можно повторять)',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Показать зарегистрированные задачи и расписание',
+        )
+
+    def handle(self, *args, **options):
+        jobs = load_jobs()
+        names = options['jobs']
+        unknown = [name for name in names or [] if name not in jobs]
+        if unknown:
+            self.stderr.write(self.style.ERROR(f'Неизвестные задачи: {", ".join(unknown)}'))
+            return
+
+        if options['list']:
+            for name, job in sorted(jobs.items()):
+                self.stdout.write(f'{name}: {job.schedule}')
+            return
+
+        if options['once']:
+            done = run_due_jobs(names)
+            self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {len(done)} {", ".join(done)}'.rstrip()))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Планировщик запущен'))
+        try:
+            while True:
+                close_old_connections()
+                done = run_due_jobs(names)
+                if done:
+                    self.stdout.write(f'Выполнено: {", ".join(done)}')
+                time.sleep(seconds_until_next(names))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Планировщик остановлен'))
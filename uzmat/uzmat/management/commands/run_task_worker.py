@@ -0,0 +1,53 @@
+"""
+Management command: воркер БД-очереди задач
+Использование: python manage.py run_task_worker [--once] [--batch N] [--sleep SEC]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from uzmat.utils.task_queue import process_due_tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из БД-очереди (отправка в Telegram, уведомления, повторы)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать готовые задачи один раз и выйти (для cron)',
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=50,
+            help='Сколько задач забирать за один проход (по умолчанию: 50)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Пауза между проходами, если очередь пуста (по умолчанию: 2 сек)',
+        )
+
+    def handle(self, *args, **options):
+        batch = options['batch']
+
+        if options['once']:
+            processed = process_due_tasks(batch)
+            self.stdout.write(self.style.SUCCESS(f'Обработано задач: {processed}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Воркер очереди задач запущен'))
+        try:
+            while True:
+                close_old_connections()
+                processed = process_due_tasks(batch)
+                if processed:
+                    self.stdout.write(f'Обработано задач: {processed}')
+                else:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Воркер остановлен'))
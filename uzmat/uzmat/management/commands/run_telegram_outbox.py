@@ -0,0 +1,55 @@
+"""
+Management command: отправка публикаций из очереди Telegram
+Использование: python manage.py run_telegram_outbox [--once] [--batch N] [--sleep SEC]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from uzmat.utils.telegram_outbox import default_bucket, drain
+
+
+class Command(BaseCommand):
+    help = 'Публикует объявления из очереди TelegramOutbox с ограничением частоты и повторами'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать готовые публикации один раз и выйти (для cron)',
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=20,
+            help='Сколько публикаций забирать за один проход (по умолчанию: 20)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5.0,
+            help='Пауза между проходами, если очередь пуста (по умолчанию: 5 сек)',
+        )
+
+    def handle(self, *args, **options):
+        batch = options['batch']
+        # Одно «ведро» на процесс: лимит действует между проходами
+        bucket = default_bucket()
+
+        if options['once']:
+            sent = drain(bucket, batch)
+            self.stdout.write(self.style.SUCCESS(f'Обработано публикаций: {sent}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Отправка в Telegram запущена'))
+        try:
+            while True:
+                close_old_connections()
+                sent = drain(bucket, batch)
+                if sent:
+                    self.stdout.write(f'Обработано публикаций: {sent}')
+                else:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Отправка в Telegram остановлена'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_search_index(apps, schema_editor):
+    from uzmat.utils.search import rebuild_index
+    rebuild_index(apps.get_model('uzmat', 'Advertisement'), apps.get_model('uzmat', 'AdSearchTerm'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0022_add_telegram_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='Вес')),
+                ('advertisement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='uzmat.advertisement', verbose_name='Объявление')),
+            ],
+            options={
+                'verbose_name': 'Термин поиска',
+                'verbose_name_plural': 'Индекс поиска',
+                'indexes': [models.Index(fields=['term', 'advertisement'], name='uzmat_adsea_term_5e52fc_idx')],
+                'constraints': [models.UniqueConstraint(fields=('advertisement', 'term'), name='unique_search_term_per_ad')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
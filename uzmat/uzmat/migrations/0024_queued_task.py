@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0023_advertisement_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Задача')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Аргументы')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='Максимум попыток')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Запустить после')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Взята в работу')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлена')),
+            ],
+            options={
+                'verbose_name': 'Задача очереди',
+                'verbose_name_plural': 'Очередь задач',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='uzmat_queue_status_862726_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_daily_views(apps, schema_editor):
+    # История просмотров по дням неизвестна: переносим накопленные счётчики
+    # одной строкой на дату создания объявления
+    Advertisement = apps.get_model('uzmat', 'Advertisement')
+    AdViewDaily = apps.get_model('uzmat', 'AdViewDaily')
+    rows = [
+        AdViewDaily(advertisement_id=ad_id, user_id=user_id, date=created_at.date(), views=views)
+        for ad_id, user_id, created_at, views in Advertisement.objects.filter(views_count__gt=0)
+        .values_list('id', 'user_id', 'created_at', 'views_count').iterator(chunk_size=500)
+    ]
+    AdViewDaily.objects.bulk_create(rows, batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0024_queued_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотров')),
+                ('advertisement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='uzmat.advertisement', verbose_name='Объявление')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ad_daily_views', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Просмотры за день',
+                'verbose_name_plural': 'Просмотры по дням',
+                'indexes': [models.Index(fields=['user', 'date'], name='uzmat_advie_user_id_2e90c0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('advertisement', 'date'), name='unique_ad_views_per_day')],
+            },
+        ),
+        migrations.RunPython(seed_daily_views, migrations.RunPython.noop),
+    ]
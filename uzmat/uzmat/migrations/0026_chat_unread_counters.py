@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:34
+
+from django.db import migrations, models
+
+
+def fill_unread_counters(apps, schema_editor):
+    from uzmat.utils.chat_unread import recount_unread
+
+    recount_unread(apps.get_model('uzmat', 'ChatThread'), apps.get_model('uzmat', 'ChatMessage'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0025_ad_view_daily'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatthread',
+            name='buyer_unread_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Непрочитано покупателем'),
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='seller_unread_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Непрочитано продавцом'),
+        ),
+        migrations.RunPython(fill_unread_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0026_chat_unread_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advertisementimage',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Уменьшенные копии'),
+        ),
+        migrations.AddField(
+            model_name='chatimage',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Уменьшенные копии'),
+        ),
+    ]
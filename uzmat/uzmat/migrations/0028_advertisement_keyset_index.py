@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0027_image_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='advertisement',
+            index=models.Index(fields=['ad_type', 'is_active', '-created_at', '-id'], name='uzmat_adver_ad_type_1ff849_idx'),
+        ),
+    ]
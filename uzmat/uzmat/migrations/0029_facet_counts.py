@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:44
+
+from django.db import migrations, models
+
+
+def fill_facet_counts(apps, schema_editor):
+    from uzmat.utils.facets import rebuild_facets
+    rebuild_facets(apps.get_model('uzmat', 'Advertisement'), apps.get_model('uzmat', 'FacetCount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0028_advertisement_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=10, verbose_name='Страна')),
+                ('ad_type', models.CharField(max_length=20, verbose_name='Тип объявления')),
+                ('facet', models.CharField(choices=[('city', 'Город'), ('brand', 'Марка'), ('equipment_type', 'Тип техники'), ('condition', 'Состояние'), ('price', 'Цена')], max_length=20, verbose_name='Фасет')),
+                ('value', models.CharField(max_length=100, verbose_name='Значение')),
+                ('count', models.IntegerField(default=0, verbose_name='Объявлений')),
+            ],
+            options={
+                'verbose_name': 'Счётчик фасета',
+                'verbose_name_plural': 'Счётчики фасетов',
+                'indexes': [models.Index(fields=['facet', 'ad_type', 'country'], name='uzmat_facet_facet_fa6248_idx')],
+                'constraints': [models.UniqueConstraint(fields=('country', 'ad_type', 'facet', 'value'), name='unique_facet_value')],
+            },
+        ),
+        migrations.RunPython(fill_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_dictionaries(apps, schema_editor):
+    from uzmat.utils.dictionaries import seed_dictionaries, normalize_advertisements
+    from uzmat.utils.facets import rebuild_facets
+
+    entry_model = apps.get_model('uzmat', 'DictionaryEntry')
+    alias_model = apps.get_model('uzmat', 'DictionaryAlias')
+    ad_model = apps.get_model('uzmat', 'Advertisement')
+    seed_dictionaries(entry_model, alias_model)
+    normalize_advertisements(ad_model, entry_model, alias_model)
+    # Фасеты теперь группируются по каноническим названиям
+    rebuild_facets(ad_model, apps.get_model('uzmat', 'FacetCount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0029_facet_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DictionaryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('city', 'Город'), ('brand', 'Марка'), ('equipment_type', 'Тип техники')], max_length=20, verbose_name='Справочник')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+            ],
+            options={
+                'verbose_name': 'Запись справочника',
+                'verbose_name_plural': 'Справочники',
+                'ordering': ['kind', 'name'],
+                'indexes': [models.Index(fields=['kind', 'name'], name='uzmat_dicti_kind_31798d_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DictionaryAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('city', 'Город'), ('brand', 'Марка'), ('equipment_type', 'Тип техники')], max_length=20, verbose_name='Справочник')),
+                ('key', models.CharField(max_length=100, verbose_name='Ключ')),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='uzmat.dictionaryentry', verbose_name='Запись')),
+            ],
+            options={
+                'verbose_name': 'Синоним',
+                'verbose_name_plural': 'Синонимы справочников',
+            },
+        ),
+        migrations.AddField(
+            model_name='advertisement',
+            name='brand_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='uzmat.dictionaryentry', verbose_name='Марка (справочник)'),
+        ),
+        migrations.AddField(
+            model_name='advertisement',
+            name='city_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='uzmat.dictionaryentry', verbose_name='Город (справочник)'),
+        ),
+        migrations.AddField(
+            model_name='advertisement',
+            name='equipment_type_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='uzmat.dictionaryentry', verbose_name='Тип техники (справочник)'),
+        ),
+        migrations.AddIndex(
+            model_name='advertisement',
+            index=models.Index(fields=['country', 'city_ref', 'is_active'], name='uzmat_adver_country_51fd86_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dictionaryalias',
+            constraint=models.UniqueConstraint(fields=('kind', 'key'), name='unique_dictionary_alias'),
+        ),
+        migrations.RunPython(fill_dictionaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0030_dictionaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(choices=[('catalog', 'Каталог'), ('parts', 'Запчасти и ремонт'), ('logistics', 'Логистика и сервис')], default='catalog', max_length=20, verbose_name='Раздел')),
+                ('query', models.CharField(blank=True, max_length=1000, verbose_name='Параметры фильтра')),
+                ('title', models.CharField(max_length=200, verbose_name='Название')),
+                ('notify_chat', models.BooleanField(default=True, verbose_name='Уведомлять в чате')),
+                ('notify_email', models.BooleanField(default=False, verbose_name='Уведомлять на email')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('term_fields', models.PositiveSmallIntegerField(default=0, verbose_name='Полей в индексе')),
+                ('matches_count', models.PositiveIntegerField(default=0, verbose_name='Найдено объявлений')),
+                ('last_matched_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее совпадение')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_searches', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Сохранённый поиск',
+                'verbose_name_plural': 'Сохранённые поиски',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SavedSearchMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('advertisement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_search_matches', to='uzmat.advertisement', verbose_name='Объявление')),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='uzmat.savedsearch', verbose_name='Поиск')),
+            ],
+            options={
+                'verbose_name': 'Совпадение поиска',
+                'verbose_name_plural': 'Совпадения поисков',
+                'constraints': [models.UniqueConstraint(fields=('saved_search', 'advertisement'), name='unique_saved_search_match')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SavedSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=20, verbose_name='Поле')),
+                ('value', models.CharField(max_length=100, verbose_name='Значение')),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='uzmat.savedsearch', verbose_name='Поиск')),
+            ],
+            options={
+                'verbose_name': 'Условие поиска',
+                'verbose_name_plural': 'Индекс сохранённых поисков',
+                'indexes': [models.Index(fields=['field', 'value', 'saved_search'], name='uzmat_saved_field_97f904_idx')],
+                'constraints': [models.UniqueConstraint(fields=('saved_search', 'field', 'value'), name='unique_saved_search_term')],
+            },
+        ),
+    ]
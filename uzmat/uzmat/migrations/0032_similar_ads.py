@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0031_saved_searches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advertisement',
+            name='similar_indexed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Похожие рассчитаны'),
+        ),
+        migrations.CreateModel(
+            name='SimilarAd',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Близость')),
+                ('advertisement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_ads', to='uzmat.advertisement', verbose_name='Объявление')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_for', to='uzmat.advertisement', verbose_name='Похожее объявление')),
+            ],
+            options={
+                'verbose_name': 'Похожее объявление',
+                'verbose_name_plural': 'Похожие объявления',
+                'indexes': [models.Index(fields=['advertisement', '-score'], name='uzmat_simil_adverti_114b37_idx')],
+                'constraints': [models.UniqueConstraint(fields=('advertisement', 'similar'), name='unique_similar_ad')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0032_similar_ads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=150, unique=True, verbose_name='Тег')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Изменено')),
+            ],
+            options={
+                'verbose_name': 'Версия содержимого',
+                'verbose_name_plural': 'Версии содержимого',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0033_content_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_type', models.CharField(choices=[('promotion', 'Продвижение'), ('verification', 'Верификация')], max_length=20, verbose_name='Тип')),
+                ('plan', models.CharField(blank=True, max_length=20, verbose_name='Тариф продвижения')),
+                ('verification_type', models.CharField(blank=True, max_length=20, verbose_name='Тип верификации')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Сумма, сум')),
+                ('status', models.CharField(choices=[('created', 'Создан'), ('prepared', 'Подготовлен'), ('completed', 'Оплачен'), ('failed', 'Не оплачен')], default='created', max_length=20, verbose_name='Статус')),
+                ('click_trans_id', models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='ID транзакции Click')),
+                ('error_note', models.CharField(blank=True, max_length=255, verbose_name='Причина ошибки')),
+                ('result_shown', models.BooleanField(default=False, verbose_name='Результат показан')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата оплаты')),
+                ('advertisement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to='uzmat.advertisement', verbose_name='Объявление')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Платёж',
+                'verbose_name_plural': 'Платежи',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='uzmat_payme_status_30d199_idx'), models.Index(fields=['user', '-created_at'], name='uzmat_payme_user_id_6f57ba_idx')],
+            },
+        ),
+    ]
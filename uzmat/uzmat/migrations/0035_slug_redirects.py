@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0034_payments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugRedirect',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_slug', models.SlugField(max_length=200, unique=True, verbose_name='Прежний URL')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('advertisement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slug_redirects', to='uzmat.advertisement', verbose_name='Объявление')),
+            ],
+            options={
+                'verbose_name': 'Перенаправление URL',
+                'verbose_name_plural': 'Перенаправления URL',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+import re
+
+from django.db import migrations
+
+# Заглушки старого генератора для кириллических заголовков: ad-rent-new, ad-rent-new-17, ...
+PLACEHOLDER_RE = re.compile(r'^ad-(sale|rent|service|parts)-new(-\d+)?$')
+BATCH_SIZE = 500
+
+
+def rewrite_placeholder_slugs(apps, schema_editor):
+    from uzmat.utils.slugs import base36, slug_base
+
+    Advertisement = apps.get_model('uzmat', 'Advertisement')
+    SlugRedirect = apps.get_model('uzmat', 'SlugRedirect')
+
+    ads = [
+        ad for ad in Advertisement.objects.filter(slug__startswith='ad-').only('id', 'slug', 'title', 'ad_type').iterator()
+        if PLACEHOLDER_RE.match(ad.slug)
+    ]
+    for start in range(0, len(ads), BATCH_SIZE):
+        batch = ads[start:start + BATCH_SIZE]
+        new_slugs = {ad.pk: f'{slug_base(ad.title, ad.ad_type)}-{base36(ad.pk)}' for ad in batch}
+        taken = set(Advertisement.objects.filter(slug__in=new_slugs.values()).values_list('slug', flat=True))
+        redirects = []
+        for ad in batch:
+            new_slug = new_slugs[ad.pk]
+            if new_slug in taken:
+                new_slug = f'{new_slug}-{base36(ad.pk)}'
+            redirects.append(SlugRedirect(old_slug=ad.slug, advertisement_id=ad.pk))
+            ad.slug = new_slug
+        Advertisement.objects.bulk_update(batch, ['slug'])
+        SlugRedirect.objects.bulk_create(redirects, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0035_slug_redirects'),
+    ]
+
+    operations = [
+        migrations.RunPython(rewrite_placeholder_slugs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0036_rewrite_placeholder_slugs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Broadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('encrypted_text', models.TextField(verbose_name='Текст (зашифрованный)')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Отправляется'), ('done', 'Отправлена')], default='pending', max_length=20, verbose_name='Статус')),
+                ('total_recipients', models.PositiveIntegerField(default=0, verbose_name='Получателей')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='Отправлено')),
+                ('last_user_id', models.PositiveBigIntegerField(default=0, verbose_name='Последний обработанный пользователь')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcasts', to=settings.AUTH_USER_MODEL, verbose_name='Отправитель')),
+            ],
+            options={
+                'verbose_name': 'Рассылка',
+                'verbose_name_plural': 'Рассылки',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0037_broadcasts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Задача')),
+                ('next_run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующий запуск')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Занята до')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='Кем занята')),
+                ('last_started_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний запуск')),
+                ('last_finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее завершение')),
+                ('last_result', models.CharField(blank=True, max_length=255, verbose_name='Результат')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Плановая задача',
+                'verbose_name_plural': 'Плановые задачи',
+                'ordering': ['name'],
+            },
+        ),
+    ]
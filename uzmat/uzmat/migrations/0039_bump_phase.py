@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:21
+
+import uzmat.utils.bump_rank
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+# Копия utils.bump_rank на момент миграции: миграция не зависит от живого кода
+BUMP_INTERVAL = 3 * 3600
+
+
+def fill_bump_phase(apps, schema_editor):
+    # Фаза — от времени создания: объявления поднимаются в те же моменты цикла, что и раньше
+    Advertisement = apps.get_model('uzmat', 'Advertisement')
+    batch = []
+    for ad in Advertisement.objects.only('id', 'created_at').iterator(chunk_size=BATCH_SIZE):
+        ad.bump_phase = int(ad.created_at.timestamp()) % BUMP_INTERVAL
+        batch.append(ad)
+        if len(batch) >= BATCH_SIZE:
+            Advertisement.objects.bulk_update(batch, ['bump_phase'])
+            batch = []
+    if batch:
+        Advertisement.objects.bulk_update(batch, ['bump_phase'])
+
+
+def drop_bump_job(apps, schema_editor):
+    # Плановая задача bump_ads больше не нужна
+    apps.get_model('uzmat', 'ScheduledJob').objects.filter(name='bump_ads').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0038_scheduled_jobs'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='advertisement',
+            name='uzmat_adver_is_acti_f1bc1c_idx',
+        ),
+        migrations.RemoveField(
+            model_name='advertisement',
+            name='last_bumped_at',
+        ),
+        migrations.AddField(
+            model_name='advertisement',
+            name='bump_phase',
+            field=models.PositiveIntegerField(default=uzmat.utils.bump_rank.current_bump_phase, verbose_name='Фаза автоподнятия'),
+        ),
+        migrations.RunPython(fill_bump_phase, migrations.RunPython.noop),
+        migrations.RunPython(drop_bump_job, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='advertisement',
+            index=models.Index(fields=['ad_type', 'bump_phase'], name='uzmat_adver_ad_type_de8bec_idx'),
+        ),
+    ]
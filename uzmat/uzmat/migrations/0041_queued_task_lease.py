@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:37
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def lease_running_tasks(apps, schema_editor):
+    # Выполняющиеся сейчас задачи — с прежним сроком «10 минут от взятия в работу»
+    QueuedTask = apps.get_model('uzmat', 'QueuedTask')
+    QueuedTask.objects.filter(status='running', locked_at__isnull=False).update(
+        lease_until=F('locked_at') + timedelta(minutes=10),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0040_telegram_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedtask',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Аренда до'),
+        ),
+        migrations.RunPython(lease_running_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0041_queued_task_lease'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ContentVersion',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uzmat', '0042_remove_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedtask',
+            name='locked_by',
+            field=models.CharField(blank=True, max_length=32, verbose_name='Метка захвата'),
+        ),
+    ]
@@ -1,13 +1,17 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.utils.text import slugify
 from django.urls import reverse
 from django.conf import settings
 from django.utils import timezone
-import base64
-import hashlib
+from django.utils.functional import cached_property
 
-from cryptography.fernet import Fernet, InvalidToken
+from .utils.chat_crypto import encrypt_text, decrypt_text
+from .utils.thumbnails import ThumbnailsMixin
+from .utils.slugs import unique_slug
+from .utils.bump_rank import current_bump_phase
+from .utils.dictionaries import (
+    assign_dictionary_refs, normalize_key, DICTIONARY_SOURCE_FIELDS, DICTIONARY_REF_FIELDS,
+)
 
 
 class User(AbstractUser):
@@ -90,6 +94,68 @@ class Category(models.Model):
         return self.name
 
 
+class DictionaryEntry(models.Model):
+    """Запись справочника: город, марка или тип техники (каноническое название)"""
+    KIND_CHOICES = [
+        ('city', 'Город'),
+        ('brand', 'Марка'),
+        ('equipment_type', 'Тип техники'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Справочник")
+    name = models.CharField(max_length=100, verbose_name="Название")
+
+    class Meta:
+        verbose_name = "Запись справочника"
+        verbose_name_plural = "Справочники"
+        ordering = ['kind', 'name']
+        indexes = [
+            models.Index(fields=['kind', 'name']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.name}"
+
+
+class DictionaryAlias(models.Model):
+    """Синоним записи справочника (написание, транслитерация); key — нормализованный текст"""
+    entry = models.ForeignKey(DictionaryEntry, on_delete=models.CASCADE, related_name='aliases', verbose_name="Запись")
+    kind = models.CharField(max_length=20, choices=DictionaryEntry.KIND_CHOICES, verbose_name="Справочник")
+    key = models.CharField(max_length=100, verbose_name="Ключ")
+
+    class Meta:
+        verbose_name = "Синоним"
+        verbose_name_plural = "Синонимы справочников"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='unique_dictionary_alias'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} -> {self.entry_id}"
+
+    def save(self, *args, **kwargs):
+        # Синонимы из админки вводятся как есть — храним нормализованный ключ
+        self.kind = self.entry.kind
+        self.key = normalize_key(self.key)
+        super().save(*args, **kwargs)
+
+
+class AdvertisementQuerySet(models.QuerySet):
+    def for_cards(self):
+        """
+        Проекция для карточек каталога: главное фото (путь и копии) считается
+        в том же запросе, что и объявления.
+        В шаблонах используйте ad.card_image вместо ad.images.first.
+        """
+        main_image = (AdvertisementImage.objects
+                      .filter(advertisement=models.OuterRef('pk'))
+                      .order_by(*AdvertisementImage._meta.ordering))
+        return self.annotate(
+            card_image_name=models.Subquery(main_image.values('image')[:1]),
+            card_image_thumbnails=models.Subquery(main_image.values('thumbnails')[:1], output_field=models.JSONField()),
+        )
+
+
 class Advertisement(models.Model):
     """Модель объявления"""
     AD_TYPE_CHOICES = [
@@ -148,6 +214,11 @@ class Advertisement(models.Model):
     country = models.CharField(max_length=10, default='kz', verbose_name="Страна")
     city = models.CharField(max_length=100, verbose_name="Город")
     phone = models.CharField(max_length=20, verbose_name="Телефон")
+
+    # Ссылки на справочники (заполняются в save() по текстовым полям, см. utils/dictionaries.py)
+    city_ref = models.ForeignKey(DictionaryEntry, on_delete=models.SET_NULL, blank=True, null=True, related_name='+', verbose_name="Город (справочник)")
+    brand_ref = models.ForeignKey(DictionaryEntry, on_delete=models.SET_NULL, blank=True, null=True, related_name='+', verbose_name="Марка (справочник)")
+    equipment_type_ref = models.ForeignKey(DictionaryEntry, on_delete=models.SET_NULL, blank=True, null=True, related_name='+', verbose_name="Тип техники (справочник)")
     
     # Цена
     price = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True, verbose_name="Цена")
@@ -185,7 +256,10 @@ class Advertisement(models.Model):
         ],
         verbose_name="Тариф продвижения"
     )
-    last_bumped_at = models.DateTimeField(blank=True, null=True, verbose_name="Последнее поднятие")
+    # Фаза автоподнятия внутри цикла (utils/bump_rank.py); задаётся при создании и не меняется
+    bump_phase = models.PositiveIntegerField(default=current_bump_phase, verbose_name="Фаза автоподнятия")
+    # Когда объявление последний раз попало в расчёт похожих (utils/similar_ads.py)
+    similar_indexed_at = models.DateTimeField(blank=True, null=True, verbose_name="Похожие рассчитаны")
     
     # Telegram
     sent_to_telegram = models.BooleanField(default=False, verbose_name="Отправлено в Telegram")
@@ -194,6 +268,8 @@ class Advertisement(models.Model):
     # Даты
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    objects = AdvertisementQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Объявление"
@@ -206,8 +282,13 @@ class Advertisement(models.Model):
             models.Index(fields=['is_promoted', 'promotion_until']),
             models.Index(fields=['user', 'is_active']),
             models.Index(fields=['country', 'city', 'is_active']),
-            models.Index(fields=['is_active', 'last_bumped_at']),
+            # Лента «свежеподнятые первыми»: диапазон по bump_phase (utils/bump_rank.py)
+            models.Index(fields=['ad_type', 'bump_phase']),
             models.Index(fields=['promotion_plan', 'promoted_at']),
+            # Keyset-пагинация лент: WHERE ad_type, is_active ORDER BY created_at, id
+            models.Index(fields=['ad_type', 'is_active', '-created_at', '-id']),
+            # Фильтры по справочникам (город в пределах страны)
+            models.Index(fields=['country', 'city_ref', 'is_active']),
         ]
     
     def __str__(self):
@@ -215,18 +296,30 @@ class Advertisement(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.title)
-            # Убеждаемся, что slug уникален
-            original_slug = self.slug
-            counter = 1
-            while Advertisement.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
+            # Транслитерация заголовка + короткий суффикс (utils/slugs.py)
+            self.slug = unique_slug(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & DICTIONARY_SOURCE_FIELDS:
+            assign_dictionary_refs(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | DICTIONARY_REF_FIELDS
         super().save(*args, **kwargs)
     
     def get_absolute_url(self):
         return reverse('uzmat:ad_detail', kwargs={'slug': self.slug})
     
+    @cached_property
+    def card_image(self):
+        """
+        Главное фото для карточки. Из аннотаций for_cards() — без запросов,
+        иначе (queryset без for_cards) — через ad.images.first()
+        """
+        if hasattr(self, 'card_image_name'):
+            if not self.card_image_name:
+                return None
+            return AdvertisementImage(image=self.card_image_name, thumbnails=self.card_image_thumbnails or {})
+        return self.images.first()
+
     def get_price_display(self):
         """Форматированное отображение цены"""
         if not self.price:
@@ -274,10 +367,26 @@ class Advertisement(models.Model):
         return countries.get(self.country, 'Казахстан')
 
 
-class AdvertisementImage(models.Model):
+class SlugRedirect(models.Model):
+    """Прежний адрес объявления (после смены заголовка или переименования slug): ведёт 301 на текущий"""
+    old_slug = models.SlugField(unique=True, max_length=200, verbose_name="Прежний URL")
+    advertisement = models.ForeignKey(Advertisement, on_delete=models.CASCADE, related_name='slug_redirects', verbose_name="Объявление")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Перенаправление URL"
+        verbose_name_plural = "Перенаправления URL"
+
+    def __str__(self):
+        return f"{self.old_slug} -> {self.advertisement_id}"
+
+
+class AdvertisementImage(ThumbnailsMixin, models.Model):
     """Фотографии объявлений"""
     advertisement = models.ForeignKey(Advertisement, on_delete=models.CASCADE, related_name='images', verbose_name="Объявление")
     image = models.ImageField(upload_to='advertisements/', verbose_name="Фотография")
+    # Пути уменьшенных копий (utils/thumbnails.py)
+    thumbnails = models.JSONField(default=dict, blank=True, verbose_name="Уменьшенные копии")
     is_main = models.BooleanField(default=False, verbose_name="Главное изображение")
     order = models.IntegerField(default=0, verbose_name="Порядок")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
@@ -291,6 +400,102 @@ class AdvertisementImage(models.Model):
         return f"Фото для {self.advertisement.title}"
 
 
+class AdSearchTerm(models.Model):
+    """Запись инвертированного индекса поиска: основа слова -> объявление"""
+    advertisement = models.ForeignKey(Advertisement, on_delete=models.CASCADE, related_name='search_terms', verbose_name="Объявление")
+    term = models.CharField(max_length=64, verbose_name="Основа слова")
+    weight = models.PositiveSmallIntegerField(default=1, verbose_name="Вес")
+
+    class Meta:
+        verbose_name = "Термин поиска"
+        verbose_name_plural = "Индекс поиска"
+        constraints = [
+            models.UniqueConstraint(fields=['advertisement', 'term'], name='unique_search_term_per_ad'),
+        ]
+        indexes = [
+            models.Index(fields=['term', 'advertisement']),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.advertisement_id}"
+
+
+class SimilarAd(models.Model):
+    """Похожее объявление: предрассчитанный сосед по вектору признаков (build_similar_ads)"""
+    advertisement = models.ForeignKey(Advertisement, on_delete=models.CASCADE, related_name='similar_ads', verbose_name="Объявление")
+    similar = models.ForeignKey(Advertisement, on_delete=models.CASCADE, related_name='similar_for', verbose_name="Похожее объявление")
+    score = models.FloatField(verbose_name="Близость")
+
+    class Meta:
+        verbose_name = "Похожее объявление"
+        verbose_name_plural = "Похожие объявления"
+        constraints = [
+            models.UniqueConstraint(fields=['advertisement', 'similar'], name='unique_similar_ad'),
+        ]
+        indexes = [
+            models.Index(fields=['advertisement', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.advertisement_id} ~ {self.similar_id}: {self.score:.2f}"
+
+
+class AdViewDaily(models.Model):
+    """Просмотры объявления за день (предагрегированная статистика)"""
+    advertisement = models.ForeignKey(Advertisement, on_delete=models.CASCADE, related_name='daily_views', verbose_name="Объявление")
+    # Владелец объявления (денормализация для статистики профиля без JOIN по всем объявлениям)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ad_daily_views', verbose_name="Владелец")
+    date = models.DateField(verbose_name="Дата")
+    views = models.PositiveIntegerField(default=0, verbose_name="Просмотров")
+
+    class Meta:
+        verbose_name = "Просмотры за день"
+        verbose_name_plural = "Просмотры по дням"
+        constraints = [
+            models.UniqueConstraint(fields=['advertisement', 'date'], name='unique_ad_views_per_day'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.advertisement_id} {self.date}: {self.views}"
+
+
+class FacetCount(models.Model):
+    """
+    Число активных объявлений по значению фасета (город, марка, тип техники,
+    состояние, диапазон цены) в разрезе страны и типа объявления.
+    Поддерживается сигналами (utils/facets.py), пересчёт: rebuild_facets
+    """
+    FACET_CHOICES = [
+        ('city', 'Город'),
+        ('brand', 'Марка'),
+        ('equipment_type', 'Тип техники'),
+        ('condition', 'Состояние'),
+        ('price', 'Цена'),
+    ]
+
+    country = models.CharField(max_length=10, verbose_name="Страна")
+    ad_type = models.CharField(max_length=20, verbose_name="Тип объявления")
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES, verbose_name="Фасет")
+    value = models.CharField(max_length=100, verbose_name="Значение")
+    count = models.IntegerField(default=0, verbose_name="Объявлений")
+
+    class Meta:
+        verbose_name = "Счётчик фасета"
+        verbose_name_plural = "Счётчики фасетов"
+        constraints = [
+            models.UniqueConstraint(fields=['country', 'ad_type', 'facet', 'value'], name='unique_facet_value'),
+        ]
+        indexes = [
+            models.Index(fields=['facet', 'ad_type', 'country']),
+        ]
+
+    def __str__(self):
+        return f"{self.country}/{self.ad_type} {self.facet}={self.value}: {self.count}"
+
+
 class Favorite(models.Model):
     """Избранные объявления"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites', verbose_name="Пользователь")
@@ -307,6 +512,82 @@ class Favorite(models.Model):
         return f"{self.user} - {self.advertisement.title}"
 
 
+class SavedSearch(models.Model):
+    """
+    Сохранённый поиск: фильтры ленты, по которым пользователь ждёт новые объявления.
+    Новое объявление сверяется с поисками через индекс SavedSearchTerm (utils/saved_searches.py)
+    """
+    SECTION_CHOICES = [
+        ('catalog', 'Каталог'),
+        ('parts', 'Запчасти и ремонт'),
+        ('logistics', 'Логистика и сервис'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_searches', verbose_name="Пользователь")
+    section = models.CharField(max_length=20, choices=SECTION_CHOICES, default='catalog', verbose_name="Раздел")
+    # GET-параметры ленты в том виде, в каком их читает get_filtered_ads
+    query = models.CharField(max_length=1000, blank=True, verbose_name="Параметры фильтра")
+    title = models.CharField(max_length=200, verbose_name="Название")
+    notify_chat = models.BooleanField(default=True, verbose_name="Уведомлять в чате")
+    notify_email = models.BooleanField(default=False, verbose_name="Уведомлять на email")
+    is_active = models.BooleanField(default=True, verbose_name="Активен")
+    # Сколько разных полей фильтра лежит в индексе (объявление должно совпасть по всем)
+    term_fields = models.PositiveSmallIntegerField(default=0, verbose_name="Полей в индексе")
+    matches_count = models.PositiveIntegerField(default=0, verbose_name="Найдено объявлений")
+    last_matched_at = models.DateTimeField(null=True, blank=True, verbose_name="Последнее совпадение")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Сохранённый поиск"
+        verbose_name_plural = "Сохранённые поиски"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.user} - {self.title}"
+
+    def get_absolute_url(self):
+        base = {'catalog': 'uzmat:catalog', 'parts': 'uzmat:parts_repair', 'logistics': 'uzmat:logistics'}
+        url = reverse(base.get(self.section, 'uzmat:catalog'))
+        return f"{url}?{self.query}" if self.query else url
+
+
+class SavedSearchTerm(models.Model):
+    """Запись инвертированного индекса сохранённых поисков: (поле, значение) -> поиск"""
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='terms', verbose_name="Поиск")
+    field = models.CharField(max_length=20, verbose_name="Поле")
+    value = models.CharField(max_length=100, verbose_name="Значение")
+
+    class Meta:
+        verbose_name = "Условие поиска"
+        verbose_name_plural = "Индекс сохранённых поисков"
+        constraints = [
+            models.UniqueConstraint(fields=['saved_search', 'field', 'value'], name='unique_saved_search_term'),
+        ]
+        indexes = [
+            models.Index(fields=['field', 'value', 'saved_search']),
+        ]
+
+    def __str__(self):
+        return f"{self.field}={self.value} -> {self.saved_search_id}"
+
+
+class SavedSearchMatch(models.Model):
+    """Объявление, найденное по сохранённому поиску (одно уведомление на пару)"""
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='matches', verbose_name="Поиск")
+    advertisement = models.ForeignKey(Advertisement, on_delete=models.CASCADE, related_name='saved_search_matches', verbose_name="Объявление")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата")
+
+    class Meta:
+        verbose_name = "Совпадение поиска"
+        verbose_name_plural = "Совпадения поисков"
+        constraints = [
+            models.UniqueConstraint(fields=['saved_search', 'advertisement'], name='unique_saved_search_match'),
+        ]
+
+    def __str__(self):
+        return f"{self.saved_search_id} -> {self.advertisement_id}"
+
+
 class VerificationRequest(models.Model):
     """Заявка на верификацию профиля"""
     TYPE_CHOICES = [
@@ -335,12 +616,50 @@ class VerificationRequest(models.Model):
         return f"Заявка #{self.id} ({self.get_verification_type_display()}) — {self.user}"
 
 
-def _chat_fernet() -> Fernet:
-    # Детерминированный ключ из SECRET_KEY (для dev/простоты).
-    # Важно: если SECRET_KEY сменится, старые сообщения расшифровать нельзя.
-    raw = hashlib.sha256(settings.SECRET_KEY.encode('utf-8')).digest()
-    key = base64.urlsafe_b64encode(raw)
-    return Fernet(key)
+class Payment(models.Model):
+    """
+    Платёж через Click (продвижение объявления или верификация).
+    id — merchant_trans_id в Click; статусы: created -> prepared -> completed/failed
+    (логика переходов и обработка webhook — utils/payments.py)
+    """
+    TYPE_CHOICES = [
+        ('promotion', 'Продвижение'),
+        ('verification', 'Верификация'),
+    ]
+    STATUS_CHOICES = [
+        ('created', 'Создан'),
+        ('prepared', 'Подготовлен'),
+        ('completed', 'Оплачен'),
+        ('failed', 'Не оплачен'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='payments', verbose_name='Пользователь')
+    payment_type = models.CharField(max_length=20, choices=TYPE_CHOICES, verbose_name='Тип')
+    advertisement = models.ForeignKey('Advertisement', on_delete=models.SET_NULL, blank=True, null=True, related_name='payments', verbose_name='Объявление')
+    plan = models.CharField(max_length=20, blank=True, verbose_name='Тариф продвижения')
+    verification_type = models.CharField(max_length=20, blank=True, verbose_name='Тип верификации')
+    amount = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Сумма, сум')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='created', verbose_name='Статус')
+    # Ключ идемпотентности: повторный webhook с тем же click_trans_id не применяет оплату дважды
+    click_trans_id = models.CharField(max_length=64, unique=True, blank=True, null=True, verbose_name='ID транзакции Click')
+    error_note = models.CharField(max_length=255, blank=True, verbose_name='Причина ошибки')
+    # Пользователь уже видел сообщение об успешной оплате
+    result_shown = models.BooleanField(default=False, verbose_name='Результат показан')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+    completed_at = models.DateTimeField(blank=True, null=True, verbose_name='Дата оплаты')
+
+    class Meta:
+        verbose_name = 'Платёж'
+        verbose_name_plural = 'Платежи'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"Платёж #{self.id} ({self.get_payment_type_display()}, {self.get_status_display()})"
 
 
 class ChatThread(models.Model):
@@ -357,6 +676,9 @@ class ChatThread(models.Model):
     last_message_at = models.DateTimeField(blank=True, null=True, verbose_name='Время последнего сообщения')
     buyer_last_read_at = models.DateTimeField(blank=True, null=True, verbose_name='Время последнего прочтения покупателем')
     seller_last_read_at = models.DateTimeField(blank=True, null=True, verbose_name='Время последнего прочтения продавцом')
+    # Денормализованные счётчики непрочитанных (пересчёт: manage.py recount_unread)
+    buyer_unread_count = models.PositiveIntegerField(default=0, verbose_name='Непрочитано покупателем')
+    seller_unread_count = models.PositiveIntegerField(default=0, verbose_name='Непрочитано продавцом')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
 
     class Meta:
@@ -381,6 +703,64 @@ class ChatThread(models.Model):
     def other_user(self, me):
         return self.seller if me_id(me) == self.buyer_id else self.buyer
 
+    def _side(self, user_id):
+        if user_id == self.buyer_id:
+            return 'buyer'
+        if user_id == self.seller_id:
+            return 'seller'
+        return None
+
+    def unread_for(self, me):
+        side = self._side(me_id(me))
+        return getattr(self, f'{side}_unread_count') if side else 0
+
+    def register_message(self, message):
+        """
+        Обновляет время последнего сообщения и атомарно увеличивает
+        счётчик непрочитанных получателя (один UPDATE)
+        """
+        side = self._side(message.sender_id)
+        recipient = 'seller' if side == 'buyer' else 'buyer'
+        field = f'{recipient}_unread_count'
+        ChatThread.objects.filter(pk=self.pk).update(**{
+            'last_message_at': message.created_at,
+            field: models.F(field) + 1,
+        })
+        self.last_message_at = message.created_at
+        setattr(self, field, getattr(self, field) + 1)
+
+    def unregister_message(self, message):
+        """Уменьшает счётчик получателя, если удалённое сообщение было непрочитанным"""
+        side = self._side(message.sender_id)
+        recipient = 'seller' if side == 'buyer' else 'buyer'
+        last_read = getattr(self, f'{recipient}_last_read_at')
+        if last_read and message.created_at <= last_read:
+            return
+        field = f'{recipient}_unread_count'
+        ChatThread.objects.filter(pk=self.pk, **{f'{field}__gt': 0}).update(**{field: models.F(field) - 1})
+
+    def mark_read(self, me):
+        """Помечает тред прочитанным для пользователя и обнуляет его счётчик"""
+        side = self._side(me_id(me))
+        if not side:
+            return
+        now = timezone.now()
+        ChatThread.objects.filter(pk=self.pk).update(**{
+            f'{side}_last_read_at': now,
+            f'{side}_unread_count': 0,
+        })
+        setattr(self, f'{side}_last_read_at', now)
+        setattr(self, f'{side}_unread_count', 0)
+
+    @classmethod
+    def total_unread_for(cls, user):
+        """Сумма непрочитанных во всех тредах пользователя (один запрос)"""
+        totals = cls.objects.filter(models.Q(buyer=user) | models.Q(seller=user)).aggregate(
+            as_buyer=models.Sum('buyer_unread_count', filter=models.Q(buyer=user)),
+            as_seller=models.Sum('seller_unread_count', filter=models.Q(seller=user)),
+        )
+        return (totals['as_buyer'] or 0) + (totals['as_seller'] or 0)
+
 
 def me_id(me):
     try:
@@ -420,32 +800,28 @@ class ChatMessage(models.Model):
         if not plain:
             self.encrypted_text = None
             return
-        token = _chat_fernet().encrypt(plain.encode('utf-8'))
-        self.encrypted_text = token.decode('utf-8')
+        self.encrypted_text = encrypt_text(plain)
+        self._text_memo = (self.encrypted_text, plain)
 
     def get_text(self) -> str:
-        if not self.encrypted_text:
-            return ''
-        try:
-            plain = _chat_fernet().decrypt(self.encrypted_text.encode('utf-8'))
-            return plain.decode('utf-8')
-        except (InvalidToken, ValueError, TypeError):
-            # Если кто-то записал plaintext напрямую (например, через админку),
-            # не прячем сообщение. Но если это похоже на fernet-токен — не показываем "мусор".
-            raw = (self.encrypted_text or '').strip()
-            if raw.startswith('gAAAA'):
-                return ''
-            return raw
+        # Расшифровка кэшируется на объекте и в LRU процесса (utils/chat_crypto.py)
+        memo = getattr(self, '_text_memo', None)
+        if memo is not None and memo[0] == self.encrypted_text:
+            return memo[1]
+        plain = decrypt_text(self.encrypted_text, self.pk)
+        self._text_memo = (self.encrypted_text, plain)
+        return plain
 
     @property
     def text(self) -> str:
         return self.get_text()
 
 
-class ChatImage(models.Model):
+class ChatImage(ThumbnailsMixin, models.Model):
     """Вложение к сообщению: только изображения"""
     message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE, related_name='images', verbose_name='Сообщение')
     image = models.ImageField(upload_to='chat/images/', verbose_name='Изображение')
+    thumbnails = models.JSONField(default=dict, blank=True, verbose_name='Уменьшенные копии')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')
 
     class Meta:
@@ -457,3 +833,147 @@ class ChatImage(models.Model):
         return f"Фото #{self.id} для сообщения #{self.message_id}"
 
 
+class Broadcast(models.Model):
+    """
+    Рассылка уведомления всем пользователям в чат техподдержки.
+    Выполняется фоновой задачей пачками (utils/broadcasts.py); last_user_id —
+    курсор, с которого рассылка продолжается после сбоя.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает'),
+        ('running', 'Отправляется'),
+        ('done', 'Отправлена'),
+    ]
+
+    sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='broadcasts', verbose_name='Отправитель')
+    # Текст шифруется один раз и копируется во все сообщения рассылки
+    encrypted_text = models.TextField(verbose_name='Текст (зашифрованный)')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='Статус')
+    total_recipients = models.PositiveIntegerField(default=0, verbose_name='Получателей')
+    sent_count = models.PositiveIntegerField(default=0, verbose_name='Отправлено')
+    last_user_id = models.PositiveBigIntegerField(default=0, verbose_name='Последний обработанный пользователь')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')
+
+    class Meta:
+        verbose_name = 'Рассылка'
+        verbose_name_plural = 'Рассылки'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Рассылка #{self.id} ({self.get_status_display()})"
+
+    @property
+    def progress_percent(self):
+        if not self.total_recipients:
+            return 100 if self.status == 'done' else 0
+        return min(100, self.sent_count * 100 // self.total_recipients)
+
+    def get_text(self) -> str:
+        return decrypt_text(self.encrypted_text)
+
+
+class QueuedTask(models.Model):
+    """Задача надёжной очереди (переживает перезапуск процессов)"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Ожидает'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Выполнена'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Задача")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Аргументы")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="Максимум попыток")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Запустить после")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взята в работу")
+    # Метка захвата: результат записывает только тот, кто задачу забрал
+    locked_by = models.CharField(max_length=32, blank=True, verbose_name="Метка захвата")
+    # До какого момента задача считается выполняемой (продлевает heartbeat())
+    lease_until = models.DateTimeField(null=True, blank=True, verbose_name="Аренда до")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлена")
+
+    class Meta:
+        verbose_name = "Задача очереди"
+        verbose_name_plural = "Очередь задач"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.get_status_display()})"
+
+
+class TelegramOutbox(models.Model):
+    """
+    Публикация объявления в Telegram-канал, ожидающая отправки.
+    Разбирает run_telegram_outbox (utils/telegram_outbox.py): один HTTP-сеанс,
+    ограничение частоты под лимиты канала, повторы с учётом retry_after.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Ожидает'),
+        (STATUS_SENDING, 'Отправляется'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    advertisement = models.ForeignKey(Advertisement, on_delete=models.CASCADE, related_name='telegram_posts', verbose_name="Объявление")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveIntegerField(default=8, verbose_name="Максимум попыток")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Отправить после")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взято в работу")
+    message_id = models.CharField(max_length=50, blank=True, verbose_name="ID сообщения в Telegram")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+
+    class Meta:
+        verbose_name = "Публикация в Telegram"
+        verbose_name_plural = "Очередь Telegram"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"Telegram #{self.id} для объявления #{self.advertisement_id} ({self.get_status_display()})"
+
+
+class ScheduledJob(models.Model):
+    """
+    Состояние плановой задачи (utils/scheduler.py): когда запускать следующий раз
+    и кто сейчас выполняет. Строка служит блокировкой — задачу берёт один узел.
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="Задача")
+    next_run_at = models.DateTimeField(default=timezone.now, verbose_name="Следующий запуск")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="Занята до")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Кем занята")
+    last_started_at = models.DateTimeField(null=True, blank=True, verbose_name="Последний запуск")
+    last_finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Последнее завершение")
+    last_result = models.CharField(max_length=255, blank=True, verbose_name="Результат")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+
+    class Meta:
+        verbose_name = "Плановая задача"
+        verbose_name_plural = "Плановые задачи"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
@@ -1,36 +1,194 @@
 """
-Django signals для автоматической отправки объявлений в Telegram
+Django signals: поисковый индекс, фасеты, кэш страниц и копии фото
 """
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
-from uzmat.models import Advertisement
-from uzmat.utils.telegram_service import send_ad_to_telegram
+from uzmat.models import Advertisement, AdvertisementImage, ChatImage, User
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=Advertisement)
-def send_ad_to_telegram_on_create(sender, instance, created, **kwargs):
-    """
-    Автоматически отправляет объявление в Telegram при создании
-    ВАЖНО: Отправка происходит только из views.py после сохранения всех изображений
-    Этот сигнал отключен, чтобы избежать отправки до загрузки изображений
-    """
-    # ОТКЛЮЧЕНО: Отправка теперь происходит из views.py после сохранения всех изображений
-    # Это гарантирует, что изображения уже загружены перед отправкой
-    return
-    
-    # Старый код (закомментирован для справки):
-    # logger.info(f"Сигнал post_save для объявления {instance.id}: created={created}, is_active={instance.is_active}, sent_to_telegram={instance.sent_to_telegram}")
-    # if not created:
-    #     return
-    # if instance.sent_to_telegram:
-    #     return
-    # if not instance.is_active:
-    #     return
-    # if not settings.TELEGRAM_ENABLED:
-    #     return
-    # ... остальной код
+def update_search_index(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """
+    Поддерживает актуальность поискового индекса при сохранении объявления
+    (удаление обрабатывается каскадом по внешнему ключу)
+    """
+    if raw:
+        return
+    from uzmat.utils.search import index_advertisement, should_reindex
+    if not created and not should_reindex(update_fields):
+        return
+    try:
+        index_advertisement(instance)
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении поискового индекса для объявления {instance.pk}: {e}", exc_info=True)
+
+
+@receiver(post_save, sender=Advertisement)
+@receiver(post_delete, sender=Advertisement)
+def invalidate_home_feed_on_ad_change(sender, instance, update_fields=None, raw=False, **kwargs):
+    """
+    Сбрасывает подборки главной при создании, продвижении, поднятии,
+    деактивации или удалении объявления
+    """
+    if raw:
+        return
+    from uzmat.utils.home_feed import FEED_FIELDS, invalidate_home_feed
+    if update_fields and not set(update_fields) & FEED_FIELDS:
+        return
+    invalidate_home_feed()
+
+
+def _touches_facets(update_fields):
+    from uzmat.utils.facets import FACET_SOURCE_FIELDS
+    return not update_fields or bool(set(update_fields) & set(FACET_SOURCE_FIELDS))
+
+
+# Поля, от которых зависят теги лент объявления, кроме полей фасетов
+PAGE_TAG_FIELDS = {'user', 'city_ref', 'brand_ref', 'equipment_type_ref'}
+
+
+@receiver(pre_save, sender=Advertisement)
+def remember_state_before_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    """
+    Одним запросом запоминает объявление в том виде, в каком оно лежит в БД:
+    фасеты (для пересчёта разницы) и ленты кэша страниц (оно могло из них уйти)
+    """
+    if raw:
+        return
+    touches_facets = _touches_facets(update_fields)
+    if not touches_facets and not set(update_fields) & PAGE_TAG_FIELDS:
+        return
+    from uzmat.utils.facets import FACET_SOURCE_FIELDS, facet_keys
+    from uzmat.utils.page_cache import feed_tags_for_ad
+
+    values = None
+    if instance.pk is not None:
+        values = sender.objects.filter(pk=instance.pk).values(
+            *FACET_SOURCE_FIELDS, 'user_id', 'city_ref_id', 'brand_ref_id', 'equipment_type_ref_id',
+        ).first()
+    if touches_facets:
+        # Нового объявления ещё нет ни в одном фасете
+        instance._facet_keys_before = facet_keys(values) if values else set()
+    if values is None:
+        return
+    instance._page_tags_before = {f'user:{values["user_id"]}'} | feed_tags_for_ad(values['ad_type'], values['country'], {
+        'city': values['city_ref_id'],
+        'brand': values['brand_ref_id'],
+        'equipment_type': values['equipment_type_ref_id'],
+    })
+
+
+@receiver(post_save, sender=Advertisement)
+def update_facet_counts(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Обновляет счётчики фасетов при создании, редактировании и (де)активации"""
+    if raw or not hasattr(instance, '_facet_keys_before'):
+        return
+    from uzmat.utils.facets import apply_facet_changes, facet_keys
+    old_keys = instance._facet_keys_before
+    del instance._facet_keys_before
+    try:
+        apply_facet_changes(old_keys, facet_keys(instance))
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении фасетов для объявления {instance.pk}: {e}", exc_info=True)
+
+
+@receiver(post_delete, sender=Advertisement)
+def remove_facet_counts(sender, instance, **kwargs):
+    """Убирает удалённое объявление из счётчиков фасетов"""
+    from uzmat.utils.facets import apply_facet_changes, facet_keys
+    try:
+        apply_facet_changes(facet_keys(instance), set())
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении фасетов для объявления {instance.pk}: {e}", exc_info=True)
+
+
+# Поля, изменение которых не видно на страницах (кэш страниц не сбрасываем)
+PAGE_CACHE_IGNORED_FIELDS = {'sent_to_telegram', 'telegram_message_id', 'views_count', 'similar_indexed_at'}
+
+
+@receiver(post_save, sender=Advertisement)
+@receiver(post_delete, sender=Advertisement)
+def invalidate_cached_pages(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Сбрасывает закэшированные страницы, на которых было (или появится) объявление"""
+    if raw:
+        return
+    if update_fields and set(update_fields) <= PAGE_CACHE_IGNORED_FIELDS:
+        return
+    from uzmat.utils.page_cache import ad_tags, invalidate_tags
+    tags = ad_tags(instance) | getattr(instance, '_page_tags_before', set())
+    instance.__dict__.pop('_page_tags_before', None)
+    try:
+        invalidate_tags(*tags)
+    except Exception as e:
+        logger.error(f"Ошибка при сбросе кэша страниц для объявления {instance.pk}: {e}")
+
+
+@receiver(post_save, sender=AdvertisementImage)
+@receiver(post_delete, sender=AdvertisementImage)
+def invalidate_cached_pages_on_image_change(sender, instance, raw=False, **kwargs):
+    """
+    Фото видно на странице объявления, главное — и на карточках лент. Ленты
+    сбрасываем, только если объявление уже загружено (форма сохраняет его
+    после фото и сбросит их сама); отдельный запрос ради тегов не делаем.
+    """
+    if raw:
+        return
+    from uzmat.utils.page_cache import ad_tags, invalidate_tags
+    tags = {f'ad:{instance.advertisement_id}'}
+    if instance.is_main and sender._meta.get_field('advertisement').is_cached(instance):
+        tags |= ad_tags(instance.advertisement)
+    try:
+        invalidate_tags(*tags)
+    except Exception as e:
+        logger.error(f"Ошибка при сбросе кэша страниц для фото #{instance.pk}: {e}")
+
+
+@receiver(post_save, sender=User)
+def invalidate_home_feed_on_verification_change(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """
+    Сбрасывает подборки главной при изменении верификации пользователя
+    """
+    if raw or created:
+        return
+    from uzmat.utils.home_feed import USER_FEED_FIELDS, invalidate_home_feed
+    if update_fields and not set(update_fields) & USER_FEED_FIELDS:
+        return
+    invalidate_home_feed()
+
+
+@receiver(post_save, sender=AdvertisementImage)
+@receiver(post_save, sender=ChatImage)
+def schedule_image_thumbnails(sender, instance, created, raw=False, **kwargs):
+    """
+    Ставит генерацию уменьшенных копий в очередь при загрузке фото.
+    bulk_create сигналы не вызывает — там копии заказываются явно.
+    """
+    if raw or not created:
+        return
+    from uzmat.utils.thumbnails import schedule_thumbnails
+
+    try:
+        schedule_thumbnails(sender, [instance.pk])
+    except Exception as e:
+        logger.error(f"Ошибка при постановке генерации копий для {sender.__name__} #{instance.pk}: {e}")
+
+
+@receiver(post_delete, sender=AdvertisementImage)
+@receiver(post_delete, sender=ChatImage)
+def delete_image_thumbnails(sender, instance, **kwargs):
+    """
+    Удаляет файлы уменьшенных копий удалённого фото (после коммита: при
+    откате удаления файлы нужны). QuerySet.delete() сигнал тоже вызывает.
+    """
+    if not instance.thumbnails:
+        return
+    from django.db import transaction
+    from uzmat.utils.thumbnails import delete_derivatives
 
+    storage = instance.image.storage
+    thumbnails = instance.thumbnails
+    transaction.on_commit(lambda: delete_derivatives(storage, thumbnails))
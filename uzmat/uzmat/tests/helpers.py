@@ -0,0 +1,38 @@
+"""Общее для тестов: кэш в памяти процесса и фабрики объявлений"""
+import itertools
+
+from django.test import override_settings
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-shared'},
+}
+
+# Тесты не трогают файл общего кэша разработчика, не ходят в Telegram,
+# а фоновые задачи выполняются сразу (потоки пула не видят транзакцию теста)
+isolated = override_settings(CACHES=LOCMEM_CACHES, TELEGRAM_ENABLED=False, BACKGROUND_TASKS_EAGER=True)
+
+_counter = itertools.count(1)
+
+
+def make_user(**fields):
+    from uzmat.models import User
+
+    number = next(_counter)
+    fields.setdefault('username', f'user{number}')
+    return User.objects.create_user(**fields)
+
+
+def make_ad(user=None, **fields):
+    from uzmat.models import Advertisement
+
+    defaults = {
+        'ad_type': 'sale',
+        'title': 'Объявление',
+        'description': '-',
+        'country': 'uz',
+        'city': 'Ташкент',
+        'phone': '+998900000000',
+    }
+    defaults.update(fields)
+    return Advertisement.objects.create(user=user or make_user(), **defaults)
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TestCase
+
+from uzmat.models import Advertisement
+from uzmat.utils.bump_rank import BUMP_INTERVAL, benchmark, latest_bumped_ids
+
+from .helpers import isolated, make_ad
+
+# Начало цикла поднятия: фаза момента равна числу секунд после него
+CYCLE_START = datetime.fromtimestamp(BUMP_INTERVAL * 100000, tz=dt_timezone.utc)
+
+
+def at_phase(phase):
+    return CYCLE_START + timedelta(seconds=phase)
+
+
+@isolated
+class LatestBumpedTests(TestCase):
+    def setUp(self):
+        self.ads = {phase: make_ad(bump_phase=phase) for phase in (100, 5000, 9000)}
+
+    def ids(self, now, **kwargs):
+        return latest_bumped_ids(Advertisement.objects.all(), 3, now, **kwargs)
+
+    def test_recent_phases_first_then_previous_cycle(self):
+        # Курсор на фазе 6000: 5000 и 100 подняты в этом цикле, 9000 — в прошлом
+        expected = [self.ads[5000].id, self.ads[100].id, self.ads[9000].id]
+
+        self.assertEqual(self.ids(at_phase(6000)), expected)
+        self.assertEqual(self.ids(at_phase(6000), ad_types=('sale', 'rent')), expected)
+
+    def test_cursor_wraps(self):
+        self.assertEqual(self.ids(at_phase(50)), [self.ads[9000].id, self.ads[5000].id, self.ads[100].id])
+
+
+class BenchmarkTests(TestCase):
+    def test_rolls_back_and_keeps_model_field(self):
+        results = benchmark(count=50, repeat=1)
+
+        self.assertEqual(set(results), {'без фильтра', 'страна uz'})
+        self.assertFalse(Advertisement.objects.filter(slug__startswith='bench-').exists())
+        # Раньше замер переключал auto_now_add у поля на весь процесс
+        self.assertTrue(Advertisement._meta.get_field('created_at').auto_now_add)
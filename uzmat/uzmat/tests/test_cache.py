@@ -0,0 +1,93 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from uzmat.utils.sqlite_cache import SQLiteCache
+from uzmat.utils.two_tier_cache import SEQ_KEY, TwoTierCache
+
+from .helpers import isolated
+
+
+def make_two_tier(sync_interval=0):
+    return TwoTierCache('shared', {'OPTIONS': {'SYNC_INTERVAL': sync_interval, 'L2_ONLY_PREFIXES': ('metrics:',)}})
+
+
+@isolated
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        # Два «процесса» с общим L2
+        self.first = make_two_tier()
+        self.second = make_two_tier()
+
+    def test_write_reaches_other_l1(self):
+        self.first.set('key', 1)
+        self.assertEqual(self.second.get('key'), 1)
+
+        self.first.set('key', 2)
+
+        self.assertEqual(self.second.get('key'), 2)
+
+    def test_batch_publishes_once_at_close(self):
+        self.second.set('a', 0)
+        self.assertEqual(self.second.get('a'), 0)
+        seq = caches['shared'].get(SEQ_KEY)
+        # Пачка старше интервала сверки публикуется досрочно: берём большой
+        self.first = make_two_tier(sync_interval=60)
+
+        self.first.begin_batch()
+        self.first.set('a', 1)
+        self.first.incr('a')
+        self.first.set('b', 1)
+        # До конца запроса журнал не пишется, а свой L1 уже новый
+        self.assertEqual(caches['shared'].get(SEQ_KEY), seq)
+        self.assertEqual(self.first.get('a'), 2)
+
+        self.first.close()
+
+        self.assertEqual(caches['shared'].get(SEQ_KEY), seq + 2)
+        self.assertEqual(self.second.get('a'), 2)
+
+    def test_l2_only_keys_skip_log(self):
+        seq = caches['shared'].get(SEQ_KEY)
+
+        self.first.set('metrics:hits', 1)
+        self.first.incr('metrics:hits')
+
+        self.assertEqual(caches['shared'].get(SEQ_KEY), seq)
+        self.assertEqual(self.second.get('metrics:hits'), 2)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_basic_operations(self):
+        self.cache.set_many({'a': 1, 'b': [2]})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': [2]})
+        self.assertEqual(self.cache.incr('a', 5), 6)
+        self.assertFalse(self.cache.add('a', 0))
+        self.assertTrue(self.cache.add('c', 3))
+
+        self.cache.delete_many(['a', 'b'])
+
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': 3})
+
+    def test_add_existing_key_does_not_wait_for_write_lock(self):
+        self.cache.set('since', 1)
+        other = sqlite3.connect(self.path, isolation_level=None)
+        other.execute('BEGIN IMMEDIATE')
+        try:
+            # Без проверки до BEGIN IMMEDIATE ждали бы блокировку (timeout=5) и упали
+            self.cache._connection().execute('PRAGMA busy_timeout = 0')
+            self.assertFalse(self.cache.add('since', 2))
+        finally:
+            other.execute('ROLLBACK')
+            other.close()
@@ -0,0 +1,55 @@
+import asyncio
+
+from django.test import TestCase
+
+from uzmat.models import ChatThread
+from uzmat.utils.broadcasts import deliver_support_messages
+from uzmat.utils.chat_crypto import encrypt_text
+from uzmat.utils.chat_pubsub import ChatBroker, _read_watermarks
+
+from .helpers import isolated, make_user
+
+
+class ChatBrokerTests(TestCase):
+    def test_changed_watermark_wakes_only_that_thread(self):
+        async def scenario():
+            broker = ChatBroker()
+            _, first = broker.subscribe(1)
+            _, second = broker.subscribe(2)
+            # Первое наблюдение будит (сообщение могло прийти до подписки)
+            self.assertEqual(sorted(broker.check({1: 'a', 2: 'x'})), [1, 2])
+            await asyncio.sleep(0)
+            first.clear()
+            second.clear()
+
+            self.assertEqual(broker.check({1: 'b', 2: 'x'}), [1])
+            await asyncio.sleep(0)
+            self.assertTrue(first.is_set())
+            self.assertFalse(second.is_set())
+
+        asyncio.run(scenario())
+
+    def test_unsubscribed_threads_are_ignored(self):
+        async def scenario():
+            broker = ChatBroker()
+            subscription = broker.subscribe(1)
+            broker.unsubscribe(1, subscription)
+            self.assertEqual(broker.check({1: 'a'}), [])
+            self.assertEqual(broker.subscriber_count(), 0)
+
+        asyncio.run(scenario())
+
+
+@isolated
+class WatermarkTests(TestCase):
+    def test_messages_written_by_other_processes_move_watermark(self):
+        staff = make_user(is_staff=True)
+        user = make_user()
+        # Рассылки и напоминания пишут пакетным UPDATE, без chat_send
+        deliver_support_messages(staff.id, [user.id], encrypt_text('первое'))
+        thread = ChatThread.objects.get(buyer=user, seller=staff)
+        before = _read_watermarks([thread.id])[thread.id]
+
+        deliver_support_messages(staff.id, [user.id], encrypt_text('второе'))
+        after = _read_watermarks([thread.id])[thread.id]
+        self.assertGreater(after, before)
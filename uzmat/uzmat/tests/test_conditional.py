@@ -0,0 +1,38 @@
+from django.test import TestCase
+
+from .helpers import isolated, make_ad
+
+
+@isolated
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.ad = make_ad(title='Экскаватор')
+        self.url = self.ad.get_absolute_url()
+
+    def test_same_version_gets_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_ad_change_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.ad.title = 'Экскаватор Komatsu'
+        self.ad.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_listing_etag_follows_feed_tag(self):
+        url = '/catalog/?country=uz'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        make_ad(country='uz')
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from uzmat.utils import metrics, page_cache
+
+from .helpers import isolated, make_ad
+
+
+@isolated
+class BufferedCountersTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_stay_in_memory_until_interval(self):
+        counters = metrics.BufferedCounters(flush_interval=3600)
+
+        with mock.patch.object(metrics, 'incr') as incr:
+            for _ in range(100):
+                self.assertFalse(counters.incr('sessions:skip'))
+        incr.assert_not_called()
+
+        counters.flush()
+        self.assertEqual(metrics.get_values(['sessions:skip']), {'sessions:skip': 100})
+
+    def test_flush_once_interval_passed(self):
+        counters = metrics.BufferedCounters(flush_interval=0)
+
+        self.assertTrue(counters.incr('sessions:write', 3))
+        self.assertEqual(metrics.get_values(['sessions:write']), {'sessions:write': 3})
+
+    def test_cache_error_does_not_raise(self):
+        counters = metrics.BufferedCounters(flush_interval=3600)
+        counters.incr('sessions:skip')
+
+        with mock.patch.object(metrics, 'incr', side_effect=OSError('disk full')):
+            counters.flush()
+
+
+@isolated
+class PageCacheCountersTests(TestCase):
+    def setUp(self):
+        # Приросты прошлых тестов этого процесса — в кэш до очистки
+        page_cache._counters.flush()
+        cache.clear()
+
+    def test_requests_do_not_write_metrics(self):
+        url = make_ad().get_absolute_url()
+
+        with mock.patch.object(metrics, 'incr') as incr:
+            self.client.get(url)
+            self.client.get(url)
+        incr.assert_not_called()
+
+        stats = page_cache.page_cache_stats()['ad_detail']
+        self.assertEqual((stats['hit'], stats['miss'], stats['hit_ratio']), (1, 1, 0.5))
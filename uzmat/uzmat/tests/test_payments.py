@@ -0,0 +1,141 @@
+import hashlib
+import hmac
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+
+from uzmat.models import Advertisement, Payment, VerificationRequest
+from uzmat.utils.payments import create_payment, expire_stale_payments, handle_click_webhook
+
+from .helpers import isolated, make_ad, make_user
+
+
+def click_request(payment, action, click_trans_id='1001', amount=None, prepare_id='', **extra):
+    """Запрос Click с подписью, как её считает verify_click_signature"""
+    amount = str(payment.amount if amount is None else amount)
+    sign_time = '2026-03-10 14:00:00'
+    secret_key = settings.CLICK_SETTINGS['SECRET_KEY']
+    signed = f'{payment.pk}{prepare_id}{Decimal(amount)}{action}{sign_time}{secret_key}'
+    data = {
+        'click_trans_id': click_trans_id,
+        'merchant_trans_id': str(payment.pk),
+        'merchant_prepare_id': prepare_id,
+        'amount': amount,
+        'action': str(action),
+        'sign_time': sign_time,
+        'sign_string': hmac.new(secret_key.encode('utf-8'), signed.encode('utf-8'), hashlib.sha256).hexdigest(),
+    }
+    data.update(extra)
+    return data
+
+
+@isolated
+class ClickWebhookTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.ad = make_ad(user=self.user)
+        self.payment = create_payment(self.user, 'promotion', Decimal('50000.00'), advertisement=self.ad, plan='premium')
+
+    def reload(self):
+        return Payment.objects.get(pk=self.payment.pk)
+
+    def prepare_and_complete(self, click_trans_id='1001'):
+        prepared = handle_click_webhook(click_request(self.payment, 0, click_trans_id))
+        self.assertEqual(prepared['error'], 0)
+        return handle_click_webhook(click_request(self.payment, 1, click_trans_id, prepare_id=prepared['merchant_prepare_id']))
+
+    def test_prepare_then_complete_applies_promotion(self):
+        result = self.prepare_and_complete()
+
+        self.assertEqual((result['error'], result['merchant_confirm_id']), (0, str(self.payment.pk)))
+        payment = self.reload()
+        self.assertEqual((payment.status, payment.click_trans_id), ('completed', '1001'))
+        self.assertIsNotNone(payment.completed_at)
+        ad = Advertisement.objects.get(pk=self.ad.pk)
+        self.assertTrue(ad.is_promoted)
+        self.assertEqual(ad.promotion_plan, 'premium')
+        self.assertGreater(ad.promotion_until, timezone.now() + timedelta(days=13))
+
+    def test_repeated_complete_is_not_applied_twice(self):
+        self.prepare_and_complete()
+        promotion_until = Advertisement.objects.get(pk=self.ad.pk).promotion_until
+
+        repeat = handle_click_webhook(click_request(self.payment, 1, '1001', prepare_id=str(self.payment.pk)))
+
+        self.assertEqual(repeat['error'], 0)
+        self.assertEqual(Advertisement.objects.get(pk=self.ad.pk).promotion_until, promotion_until)
+        # Другая транзакция Click по оплаченному платежу
+        other = handle_click_webhook(click_request(self.payment, 1, '2002', prepare_id=str(self.payment.pk)))
+        self.assertEqual(other['error'], -4)
+
+    def test_complete_requires_prepare(self):
+        result = handle_click_webhook(click_request(self.payment, 1, prepare_id=str(self.payment.pk)))
+
+        self.assertEqual(result['error'], -6)
+        self.assertEqual(self.reload().status, 'created')
+
+        handle_click_webhook(click_request(self.payment, 0))
+        # Чужой merchant_prepare_id и другая транзакция Click
+        self.assertEqual(handle_click_webhook(click_request(self.payment, 1, prepare_id='999'))['error'], -6)
+        self.assertEqual(handle_click_webhook(click_request(self.payment, 1, '2002', prepare_id=str(self.payment.pk)))['error'], -6)
+        self.assertFalse(Advertisement.objects.get(pk=self.ad.pk).is_promoted)
+
+    def test_wrong_amount(self):
+        result = handle_click_webhook(click_request(self.payment, 0, amount='1.00'))
+
+        self.assertEqual(result['error'], -2)
+        self.assertEqual(self.reload().status, 'created')
+
+    def test_bad_signature(self):
+        data = click_request(self.payment, 0)
+        data['sign_string'] = '0' * 64
+
+        self.assertEqual(handle_click_webhook(data)['error'], -1)
+        self.assertEqual(handle_click_webhook({'action': 'x'})['error'], -8)
+        self.assertEqual(self.reload().status, 'created')
+
+    def test_cancelled_payment_is_not_completed(self):
+        handle_click_webhook(click_request(self.payment, 0))
+
+        self.assertEqual(handle_click_webhook(click_request(self.payment, -1))['error'], 0)
+        result = handle_click_webhook(click_request(self.payment, 1, prepare_id=str(self.payment.pk)))
+
+        self.assertEqual(result['error'], -9)
+        self.assertEqual(self.reload().status, 'failed')
+        self.assertFalse(Advertisement.objects.get(pk=self.ad.pk).is_promoted)
+
+    def test_click_error_fails_payment(self):
+        handle_click_webhook(click_request(self.payment, 0))
+
+        result = handle_click_webhook(click_request(
+            self.payment, 1, prepare_id=str(self.payment.pk), error='-5017', error_note='Недостаточно средств',
+        ))
+
+        self.assertEqual(result['error'], -9)
+        payment = self.reload()
+        self.assertEqual((payment.status, payment.error_note), ('failed', 'Недостаточно средств'))
+
+    def test_verification_payment_creates_request(self):
+        self.payment = create_payment(self.user, 'verification', Decimal('100000.00'), verification_type='company')
+
+        self.assertEqual(self.prepare_and_complete(click_trans_id='3003')['error'], 0)
+
+        request = VerificationRequest.objects.get(user=self.user)
+        self.assertEqual((request.verification_type, request.status), ('company', 'pending'))
+
+
+class ExpireStalePaymentsTests(TestCase):
+    def test_only_old_unpaid_payments_expire(self):
+        user = make_user()
+        old = create_payment(user, 'promotion', Decimal('1.00'))
+        fresh = create_payment(user, 'promotion', Decimal('1.00'))
+        paid = create_payment(user, 'promotion', Decimal('1.00'), status='completed')
+        Payment.objects.filter(pk__in=[old.pk, paid.pk]).update(created_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(expire_stale_payments(), 1)
+
+        statuses = dict(Payment.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {old.pk: 'failed', fresh.pk: 'created', paid.pk: 'completed'})
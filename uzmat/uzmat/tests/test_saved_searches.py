@@ -0,0 +1,43 @@
+from django.test import TestCase
+
+from uzmat.models import DictionaryEntry, SavedSearchTerm
+from uzmat.utils.saved_searches import candidate_search_ids, save_search
+
+from .helpers import isolated, make_ad, make_user
+
+
+@isolated
+class SavedSearchIndexTests(TestCase):
+    def setUp(self):
+        self.owner = make_user()
+
+    def save(self, query, section='catalog'):
+        saved_search, error = save_search(self.owner, section, query)
+        self.assertIsNone(error)
+        return saved_search
+
+    def test_known_city_matches_by_reference(self):
+        make_ad(city='Ташкент')
+        saved_search = self.save('city=Ташкент&ad_type=sale')
+
+        self.assertIn(saved_search.id, candidate_search_ids(make_ad(city='ташкент')))
+        self.assertNotIn(saved_search.id, candidate_search_ids(make_ad(city='Самарканд')))
+        self.assertNotIn(saved_search.id, candidate_search_ids(make_ad(city='Ташкент', ad_type='rent')))
+
+    def test_unknown_value_does_not_create_dictionary_entries(self):
+        entries = DictionaryEntry.objects.count()
+
+        saved_search = self.save('city=Новый Посёлок&brand=Неизвестная марка')
+
+        self.assertEqual(DictionaryEntry.objects.count(), entries)
+        self.assertEqual(
+            set(SavedSearchTerm.objects.filter(saved_search=saved_search, field__in=['city', 'brand']).values_list('value', flat=True)),
+            {'key:noviy poselok', 'key:neizvestnaya marka'},
+        )
+
+    def test_unknown_value_matches_later_ad_by_normalized_text(self):
+        saved_search = self.save('city=Новый Посёлок')
+
+        # У объявления справочник заведёт запись, а поиск сравнится по тексту
+        self.assertIn(saved_search.id, candidate_search_ids(make_ad(city='новый  посёлок')))
+        self.assertNotIn(saved_search.id, candidate_search_ids(make_ad(city='Новый')))
@@ -0,0 +1,92 @@
+import builtins
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from uzmat.models import Advertisement, ScheduledJob
+from uzmat.utils import scheduler
+from uzmat.utils.scheduled_jobs import expire_promotions
+from uzmat.utils.scheduler import CronSpec, run_due_jobs, scheduled_job
+
+from .helpers import isolated, make_ad
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class CronSpecTests(SimpleTestCase):
+    def test_next_after(self):
+        self.assertEqual(CronSpec('0 * * * *').next_after(local(2026, 3, 10, 14, 0)), local(2026, 3, 10, 15, 0))
+        self.assertEqual(CronSpec('*/15 * * * *').next_after(local(2026, 3, 10, 14, 7)), local(2026, 3, 10, 14, 15))
+        self.assertEqual(CronSpec('30 2 * * *').next_after(local(2026, 3, 10, 14, 0)), local(2026, 3, 11, 2, 30))
+        # 0 — воскресенье; 15.03.2026 — воскресенье
+        self.assertEqual(CronSpec('0 9 * * 0').next_after(local(2026, 3, 10, 14, 0)), local(2026, 3, 15, 9, 0))
+
+    def test_invalid_expression(self):
+        for expression in ('* * * *', '60 * * * *', '0 0 31 2 *'):
+            with self.subTest(expression=expression), self.assertRaises(ValueError):
+                CronSpec(expression).next_after(local(2026, 1, 1, 0, 0))
+
+
+class RunDueJobsTests(TestCase):
+    def setUp(self):
+        self.calls = 0
+
+        @scheduled_job('test_counter', every=60)
+        def counter():
+            self.calls += 1
+            return f'вызовов: {self.calls}'
+
+        self.addCleanup(scheduler.JOB_REGISTRY.pop, 'test_counter')
+
+    def test_runs_once_per_interval(self):
+        self.assertEqual(run_due_jobs(['test_counter']), ['test_counter'])
+        self.assertEqual(run_due_jobs(['test_counter']), [])
+
+        row = ScheduledJob.objects.get(name='test_counter')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(row.last_result, 'вызовов: 1')
+        self.assertIsNone(row.locked_until)
+        self.assertGreater(row.next_run_at, timezone.now() + timedelta(seconds=50))
+
+    def test_locked_job_is_skipped(self):
+        run_due_jobs(['test_counter'])
+        now = timezone.now()
+        # Срок наступил, но задачу держит другой узел
+        ScheduledJob.objects.filter(name='test_counter').update(
+            next_run_at=now, locked_until=now + timedelta(minutes=5), locked_by='other:1',
+        )
+
+        self.assertEqual(run_due_jobs(['test_counter']), [])
+        self.assertEqual(self.calls, 1)
+
+
+@isolated
+class ExpirePromotionsTests(TestCase):
+    def test_only_expired_promotions_removed(self):
+        now = timezone.now()
+        expired = make_ad(is_promoted=True, promotion_until=now - timedelta(hours=1))
+        active = make_ad(is_promoted=True, promotion_until=now + timedelta(days=1))
+
+        self.assertEqual(expire_promotions(), 'истекло: 1')
+
+        self.assertFalse(Advertisement.objects.get(id=expired.id).is_promoted)
+        self.assertTrue(Advertisement.objects.get(id=active.id).is_promoted)
+
+    def test_promotion_extended_after_read_is_kept(self):
+        now = timezone.now()
+        ad = make_ad(is_promoted=True, promotion_until=now - timedelta(hours=1))
+
+        def read_then_extend(ids):
+            ids = builtins.list(ids)
+            # Пользователь продлил продвижение между выборкой и UPDATE
+            Advertisement.objects.filter(id=ad.id).update(promotion_until=now + timedelta(days=7))
+            return ids
+
+        with mock.patch('uzmat.utils.scheduled_jobs.list', side_effect=read_then_extend, create=True):
+            self.assertEqual(expire_promotions(), 'истекло: 0')
+
+        self.assertTrue(Advertisement.objects.get(id=ad.id).is_promoted)
@@ -0,0 +1,71 @@
+from django.test import TestCase
+
+from uzmat.models import Advertisement
+from uzmat.utils.search import apply_search, parse_query, stem
+from uzmat.utils.stemmers import LANG_KZ, LANG_LATIN, LANG_RU, LANG_UZ, detect_language
+
+from .helpers import isolated, make_ad
+
+
+class StemTests(TestCase):
+    def test_russian_inflections_share_stem(self):
+        pairs = [
+            ('погрузчик', 'погрузчика'),
+            ('погрузчик', 'погрузчики'),
+            ('ремонт', 'ремонта'),
+            ('кран', 'краны'),
+            ('кран', 'кранов'),
+            ('техника', 'техники'),
+            ('аренда', 'аренду'),
+            ('экскаватор', 'экскаваторами'),
+            ('двигатель', 'двигателя'),
+            ('гусеничный', 'гусеничного'),
+        ]
+        for base, inflected in pairs:
+            with self.subTest(base=base, inflected=inflected):
+                self.assertEqual(stem(base), stem(inflected))
+
+    def test_language_detection(self):
+        self.assertEqual(detect_language('погрузчик'), LANG_RU)
+        self.assertEqual(detect_language('жүк'), LANG_KZ)
+        self.assertEqual(detect_language('қурилиш'), LANG_UZ)
+        self.assertEqual(detect_language('ekskavator'), LANG_LATIN)
+
+    def test_turkic_rules_do_not_touch_russian_words(self):
+        # «да», «га», «лар» — узбекские/казахские окончания, но не русские
+        self.assertEqual(stem('погода'), 'погод')
+        self.assertEqual(stem('дорога'), 'дорог')
+
+    def test_uzbek_and_kazakh_plurals(self):
+        self.assertEqual(stem('ekskavatorlar'), stem('ekskavator'))
+        self.assertEqual(stem('көліктер'), 'көлік')
+        self.assertEqual(stem('қурилмалар'), 'қурилма')
+
+    def test_models_are_not_stemmed(self):
+        self.assertEqual(parse_query('PC200 320D'), ['pc200', '320d'])
+
+
+@isolated
+class ApplySearchTests(TestCase):
+    def search(self, query):
+        return list(apply_search(Advertisement.objects.all(), query).values_list('title', flat=True))
+
+    def test_query_finds_inflected_titles(self):
+        make_ad(title='Аренда погрузчика')
+        make_ad(title='Ремонта двигателя не требует')
+        make_ad(title='Краны в аренду')
+        make_ad(title='Продажа самосвала')
+
+        self.assertEqual(self.search('погрузчик'), ['Аренда погрузчика'])
+        self.assertEqual(self.search('ремонт'), ['Ремонта двигателя не требует'])
+        self.assertEqual(self.search('кран'), ['Краны в аренду'])
+        self.assertEqual(self.search('погрузчик аренда'), ['Аренда погрузчика'])
+
+    def test_unfinished_last_word_matches_by_prefix(self):
+        make_ad(title='Экскаватор Komatsu PC200')
+        self.assertEqual(self.search('экскав'), ['Экскаватор Komatsu PC200'])
+        self.assertEqual(self.search('komatsu pc2'), ['Экскаватор Komatsu PC200'])
+
+    def test_all_words_required(self):
+        make_ad(title='Аренда погрузчика')
+        self.assertEqual(self.search('погрузчик бульдозер'), [])
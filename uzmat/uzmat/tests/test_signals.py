@@ -0,0 +1,39 @@
+from django.test import TestCase
+
+from uzmat.models import Advertisement, FacetCount
+from uzmat.utils.page_cache import _current_versions, _tag_key
+
+from .helpers import isolated, make_ad
+
+
+def tag_version(tag):
+    return _current_versions([tag])[_tag_key(tag)]
+
+
+@isolated
+class StateBeforeSaveTests(TestCase):
+    def test_new_ad_counted_in_facets(self):
+        make_ad(city='Ташкент')
+
+        self.assertTrue(FacetCount.objects.filter(facet='city', value='Ташкент', count=1).exists())
+
+    def test_city_change_resets_old_city_feed(self):
+        ad = make_ad(city='Ташкент')
+        old_tag = f'feed:sale:city:{ad.city_ref_id}'
+        before = tag_version(old_tag)
+
+        ad.city = 'Самарканд'
+        ad.save(update_fields=['city'])
+
+        self.assertNotEqual(tag_version(old_tag), before)
+        self.assertFalse(FacetCount.objects.filter(facet='city', value='Ташкент', count__gt=0).exists())
+        self.assertTrue(FacetCount.objects.filter(facet='city', value='Самарканд', count=1).exists())
+
+    def test_field_outside_feeds_does_not_read_old_row(self):
+        ad = make_ad()
+        ad.views_count = 5
+
+        # Только UPDATE: состояние до сохранения не нужно ни фасетам, ни кэшу страниц
+        with self.assertNumQueries(1):
+            ad.save(update_fields=['views_count'])
+        self.assertEqual(Advertisement.objects.get(id=ad.id).views_count, 5)
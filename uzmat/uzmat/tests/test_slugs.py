@@ -0,0 +1,67 @@
+from django.test import SimpleTestCase, TestCase
+
+from uzmat.models import Advertisement, SlugRedirect
+from uzmat.utils.slugs import MAX_BASE_LENGTH, base36, change_slug, slug_base, slug_matches_title, unique_slug
+
+from .helpers import isolated, make_ad
+
+
+class SlugBaseTests(SimpleTestCase):
+    def test_transliteration(self):
+        self.assertEqual(slug_base('Экскаватор Komatsu PC200'), 'ekskavator-komatsu-pc200')
+        self.assertEqual(slug_base('Щётка ЖЁСТКАЯ'), 'shchyotka-zhyostkaya')
+        self.assertEqual(slug_base('Қўл тележкаси'), 'qol-telezhkasi')
+        self.assertEqual(slug_base('Ұңғыма бұрғысы'), 'unggyma-burgysy')
+
+    def test_long_title_cut_at_word(self):
+        base = slug_base('погрузчик ' * 20)
+
+        self.assertLessEqual(len(base), MAX_BASE_LENGTH)
+        self.assertTrue(base.endswith('pogruzchik'))
+
+    def test_empty_title(self):
+        self.assertEqual(slug_base('!!!', 'rent'), 'ad-rent')
+        self.assertEqual(slug_base(''), 'ad-item')
+
+    def test_base36(self):
+        self.assertEqual([base36(n) for n in (0, 35, 36, 1295)], ['0', 'z', '10', 'zz'])
+
+
+@isolated
+class UniqueSlugTests(TestCase):
+    def test_new_ad_gets_base_and_suffix(self):
+        ad = make_ad(title='Кран Liebherr')
+
+        self.assertRegex(ad.slug, r'^kran-liebherr-[0-9a-f]{6}$')
+        self.assertTrue(slug_matches_title(ad))
+
+    def test_taken_slugs_get_counter(self):
+        ad = make_ad(title='Кран')
+        candidate = f'kran-{base36(ad.pk)}'
+        Advertisement.objects.filter(pk=ad.pk).update(slug='other')
+        make_ad(slug=candidate)
+        make_ad(slug=f'{candidate}-2')
+
+        self.assertEqual(unique_slug(ad), f'{candidate}-3')
+
+    def test_own_slug_is_not_taken(self):
+        ad = make_ad(title='Кран')
+        ad.slug = unique_slug(ad)
+        ad.save()
+
+        self.assertEqual(unique_slug(ad), ad.slug)
+
+    def test_change_slug_keeps_redirect(self):
+        ad = make_ad(title='Кран')
+        old_slug = ad.slug
+        ad.title = 'Автокран'
+
+        self.assertFalse(slug_matches_title(ad))
+        change_slug(ad)
+        ad.save()
+
+        self.assertEqual(ad.slug, f'avtokran-{base36(ad.pk)}')
+        self.assertEqual(SlugRedirect.objects.get(old_slug=old_slug).advertisement_id, ad.pk)
+        response = self.client.get(f'/ad/{old_slug}/')
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], ad.get_absolute_url())
@@ -0,0 +1,123 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from uzmat.models import QueuedTask
+from uzmat.utils import task_queue
+from uzmat.utils.background_tasks import BackgroundWorkerPool
+from uzmat.utils.task_queue import durable_task, enqueue_task, heartbeat, process_due_tasks, release_stale_tasks
+
+from .helpers import isolated
+
+calls = []
+
+
+@durable_task('test_record', max_attempts=2)
+def record_task(value):
+    calls.append(value)
+
+
+@durable_task('test_fail', max_attempts=2)
+def failing_task():
+    raise RuntimeError('boom')
+
+
+@durable_task('test_long', lease=3600)
+def long_task():
+    calls.append(QueuedTask.objects.get(name='test_long').lease_until)
+    heartbeat()
+    calls.append(QueuedTask.objects.get(name='test_long').lease_until)
+
+
+@durable_task('test_reclaimed', max_attempts=1)
+def reclaimed_task():
+    # Аренда истекла, задачу забрал другой воркер
+    QueuedTask.objects.filter(name='test_reclaimed').update(locked_by='other', last_error='чужой')
+    calls.append(heartbeat())
+    raise RuntimeError('поздно')
+
+
+@isolated
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_task_runs_once(self):
+        task = enqueue_task('test_record', 7)
+        self.assertEqual(process_due_tasks(), 1)
+        self.assertEqual(process_due_tasks(), 0)
+        task.refresh_from_db()
+        self.assertEqual(task.status, QueuedTask.STATUS_DONE)
+        self.assertIsNone(task.lease_until)
+        self.assertEqual(calls, [7])
+
+    def test_failure_backs_off_then_fails(self):
+        task = enqueue_task('test_fail')
+        process_due_tasks()
+        task.refresh_from_db()
+        self.assertEqual(task.status, QueuedTask.STATUS_PENDING)
+        self.assertGreater(task.run_after, timezone.now())
+        self.assertEqual(task.last_error, 'boom')
+
+        QueuedTask.objects.filter(id=task.id).update(run_after=timezone.now())
+        process_due_tasks()
+        task.refresh_from_db()
+        self.assertEqual(task.status, QueuedTask.STATUS_FAILED)
+        self.assertEqual(task.attempts, 2)
+
+    def test_lease_is_per_task_and_heartbeat_extends_it(self):
+        enqueue_task('test_long')
+        started = timezone.now()
+        process_due_tasks()
+        claimed_lease, extended_lease = calls
+        self.assertGreater(claimed_lease, started + timezone.timedelta(minutes=59))
+        self.assertGreaterEqual(extended_lease, claimed_lease)
+
+    def test_reclaimed_task_keeps_new_owner_state(self):
+        task = enqueue_task('test_reclaimed')
+
+        with self.assertLogs('uzmat.utils.task_queue', level='WARNING'):
+            process_due_tasks()
+
+        self.assertEqual(calls, [False])
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.locked_by, task.last_error), (QueuedTask.STATUS_RUNNING, 'other', 'чужой'))
+
+    def test_only_expired_leases_are_released(self):
+        now = timezone.now()
+        running = {'status': QueuedTask.STATUS_RUNNING, 'locked_at': now - timezone.timedelta(hours=1)}
+        alive = QueuedTask.objects.create(name='test_long', lease_until=now + timezone.timedelta(minutes=5), **running)
+        dead = QueuedTask.objects.create(name='test_record', lease_until=now - timezone.timedelta(seconds=1), **running)
+
+        self.assertEqual(release_stale_tasks(), 1)
+        alive.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual(alive.status, QueuedTask.STATUS_RUNNING)
+        self.assertEqual(dead.status, QueuedTask.STATUS_PENDING)
+
+    def test_heartbeat_outside_task_is_noop(self):
+        self.assertTrue(heartbeat())
+        self.assertIsNone(getattr(task_queue._current, 'task', None))
+
+
+class WorkerPoolTests(TestCase):
+    def test_full_pool_drops_with_error_log(self):
+        pool = BackgroundWorkerPool(workers=1, queue_size=1, submit_timeout=0.01)
+        release = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        try:
+            self.assertTrue(pool.submit(block))
+            started.wait(5)
+            self.assertTrue(pool.submit(mock.Mock()))  # ждёт в очереди
+            with self.assertLogs('uzmat.utils.background_tasks', level='ERROR'):
+                self.assertFalse(pool.submit(mock.Mock()))
+            self.assertEqual(pool.dropped, 1)
+        finally:
+            release.set()
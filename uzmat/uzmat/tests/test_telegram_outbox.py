@@ -0,0 +1,200 @@
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from uzmat.models import Advertisement, TelegramOutbox
+from uzmat.utils import metrics
+from uzmat.utils.telegram_outbox import TokenBucket, drain, enqueue_ad, release_stale, send_entry
+
+from .helpers import isolated, make_ad
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    """Отвечает очередными ответами server.responses и запоминает запросы"""
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        self.server.requests.append((self.path, {key: values[0] for key, values in form.items()}))
+        status, body = self.server.responses.pop(0)
+        payload = body.encode('utf-8') if isinstance(body, str) else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def ok(message_id):
+    return 200, {'ok': True, 'result': {'message_id': message_id}}
+
+
+def api_error(status, description, **parameters):
+    body = {'ok': False, 'error_code': status, 'description': description}
+    if parameters:
+        body['parameters'] = parameters
+    return status, body
+
+
+@isolated
+class TelegramOutboxTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTelegramHandler)
+        cls.server.requests = []
+        cls.server.responses = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        cache.clear()
+        self.server.requests.clear()
+        self.server.responses.clear()
+        telegram = override_settings(
+            TELEGRAM_ENABLED=True,
+            TELEGRAM_BOT_TOKEN='test-token',
+            TELEGRAM_CHANNEL_ID='@test_channel',
+            TELEGRAM_API_URL=f'http://127.0.0.1:{self.server.server_port}',
+        )
+        telegram.enable()
+        self.addCleanup(telegram.disable)
+
+        self.ad = make_ad(title='Экскаватор Komatsu')
+        self.entry = enqueue_ad(self.ad.id)
+        # Токенов с запасом: тесты не спят
+        self.bucket = TokenBucket(rate=1000, capacity=1000)
+
+    def reload(self):
+        return TelegramOutbox.objects.get(id=self.entry.id)
+
+    def test_success_marks_entry_and_ad_sent(self):
+        self.server.responses.append(ok(42))
+
+        self.assertEqual(drain(self.bucket), 1)
+
+        entry = self.reload()
+        self.assertEqual((entry.status, entry.message_id, entry.attempts), (TelegramOutbox.STATUS_SENT, '42', 1))
+        ad = Advertisement.objects.get(id=self.ad.id)
+        self.assertTrue(ad.sent_to_telegram)
+        self.assertEqual(ad.telegram_message_id, '42')
+
+        path, form = self.server.requests[0]
+        self.assertEqual(path, '/bottest-token/sendMessage')
+        self.assertEqual(form['chat_id'], '@test_channel')
+        self.assertIn('Экскаватор Komatsu', form['text'])
+        self.assertEqual(metrics.get_values(['telegram:sent']), {'telegram:sent': 1})
+
+    def test_rate_limit_pauses_bucket_without_spending_attempt(self):
+        self.server.responses.append(api_error(429, 'Too Many Requests: retry after 7', retry_after=7))
+
+        with mock.patch.object(self.bucket, 'pause', wraps=self.bucket.pause) as pause:
+            self.assertTrue(send_entry(self.entry.id, self.bucket))
+
+        pause.assert_called_once_with(7)
+        entry = self.reload()
+        self.assertEqual((entry.status, entry.attempts), (TelegramOutbox.STATUS_PENDING, 0))
+        self.assertGreater(entry.run_after, timezone.now() + timedelta(seconds=5))
+
+    def test_server_error_backs_off_and_retries(self):
+        self.server.responses += [(502, '<html>Bad Gateway</html>'), ok(7)]
+
+        self.assertTrue(send_entry(self.entry.id, self.bucket))
+
+        entry = self.reload()
+        self.assertEqual((entry.status, entry.attempts), (TelegramOutbox.STATUS_PENDING, 1))
+        self.assertIn('502', entry.last_error)
+        self.assertGreater(entry.run_after, timezone.now())
+        # До срока повтора публикацию не забирают
+        self.assertFalse(send_entry(self.entry.id, self.bucket))
+
+        TelegramOutbox.objects.filter(id=self.entry.id).update(run_after=timezone.now())
+        self.assertTrue(send_entry(self.entry.id, self.bucket))
+
+        entry = self.reload()
+        self.assertEqual((entry.status, entry.attempts, entry.message_id), (TelegramOutbox.STATUS_SENT, 2, '7'))
+
+    def test_bad_request_fails_at_once(self):
+        self.server.responses.append(api_error(400, 'Bad Request: chat not found'))
+
+        self.assertTrue(send_entry(self.entry.id, self.bucket))
+
+        entry = self.reload()
+        self.assertEqual((entry.status, entry.attempts), (TelegramOutbox.STATUS_FAILED, 1))
+        self.assertEqual(entry.last_error, 'Bad Request: chat not found')
+        self.assertFalse(Advertisement.objects.get(id=self.ad.id).sent_to_telegram)
+
+    def test_release_stale_requeues_stuck_rows(self):
+        now = timezone.now()
+        stuck = enqueue_ad(make_ad().id)
+        TelegramOutbox.objects.filter(id=stuck.id).update(status=TelegramOutbox.STATUS_SENDING, locked_at=now - timedelta(minutes=11))
+        TelegramOutbox.objects.filter(id=self.entry.id).update(status=TelegramOutbox.STATUS_SENDING, locked_at=now)
+
+        self.assertEqual(release_stale(), 1)
+
+        self.assertEqual(TelegramOutbox.objects.get(id=stuck.id).status, TelegramOutbox.STATUS_PENDING)
+        self.assertEqual(self.reload().status, TelegramOutbox.STATUS_SENDING)
+
+    def test_disabled_sending_leaves_queue(self):
+        with self.settings(TELEGRAM_ENABLED=False):
+            self.assertEqual(drain(self.bucket), 0)
+
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(self.reload().status, TelegramOutbox.STATUS_PENDING)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        # 2 запроса в секунду, не больше 3 подряд
+        self.bucket = TokenBucket(rate=2, capacity=3, clock=self.clock)
+
+    def test_burst_then_rate(self):
+        for _ in range(3):
+            self.bucket.acquire(sleep=self.clock.sleep)
+        self.assertEqual(self.clock.now, 1000.0)
+
+        self.assertAlmostEqual(self.bucket.wait_time(), 0.5)
+        self.bucket.acquire(sleep=self.clock.sleep)
+        self.assertAlmostEqual(self.clock.now, 1000.5)
+
+    def test_refill_is_capped(self):
+        for _ in range(3):
+            self.bucket.acquire(sleep=self.clock.sleep)
+        self.clock.now += 60
+
+        for _ in range(3):
+            self.bucket.acquire(sleep=self.clock.sleep)
+        self.assertEqual(self.clock.now, 1060.0)
+        self.assertAlmostEqual(self.bucket.wait_time(), 0.5)
+
+    def test_pause_blocks_then_allows_one(self):
+        self.bucket.pause(7)
+
+        self.assertAlmostEqual(self.bucket.wait_time(), 7)
+        self.bucket.acquire(sleep=self.clock.sleep)
+        self.assertAlmostEqual(self.clock.now, 1007.0)
+        # После паузы — один запрос, дальше по rate
+        self.assertAlmostEqual(self.bucket.wait_time(), 0.5)
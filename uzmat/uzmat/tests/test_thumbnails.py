@@ -0,0 +1,64 @@
+import io
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from uzmat.models import AdvertisementImage
+from uzmat.utils.page_cache import _current_versions, _tag_key
+from uzmat.utils.thumbnails import build_thumbnails, thumbnail_paths
+
+from .helpers import isolated, make_ad
+
+
+def make_photo(width=800, height=600):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, format='JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@isolated
+class ThumbnailsTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.ad = make_ad()
+        self.photo = AdvertisementImage.objects.create(advertisement=self.ad, image=make_photo(), is_main=True)
+        self.storage = self.photo.image.storage
+
+    def test_build_saves_paths_and_resets_ad_page(self):
+        tag = f'ad:{self.ad.id}'
+        before = _current_versions([tag])[_tag_key(tag)]
+
+        self.assertTrue(build_thumbnails(self.photo))
+
+        stored = AdvertisementImage.objects.get(id=self.photo.id).thumbnails
+        self.assertEqual(set(stored['jpeg']), {'320', '640'})
+        paths = thumbnail_paths(stored)
+        self.assertEqual(len(paths), 4)
+        self.assertTrue(all(self.storage.exists(path) for path in paths))
+        self.assertNotEqual(_current_versions([tag])[_tag_key(tag)], before)
+
+    def test_delete_removes_derivatives_after_commit(self):
+        build_thumbnails(self.photo)
+        paths = thumbnail_paths(self.photo.thumbnails)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AdvertisementImage.objects.filter(id=self.photo.id).delete()
+
+        self.assertFalse(any(self.storage.exists(path) for path in paths))
+
+    def test_photo_deleted_during_generation(self):
+        AdvertisementImage.objects.filter(id=self.photo.id).delete()
+
+        self.assertFalse(build_thumbnails(self.photo))
+
+        # Копии, сделанные для удалённого фото, не остаются в хранилище
+        _, files = self.storage.listdir('advertisements')
+        self.assertEqual(files, [self.photo.image.name.split('/')[-1]])
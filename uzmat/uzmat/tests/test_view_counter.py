@@ -0,0 +1,51 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from uzmat.models import Advertisement, AdViewDaily
+from uzmat.utils.view_counter import ViewCounter
+
+from .helpers import isolated, make_ad
+
+
+@isolated
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        self.ad = make_ad()
+        # Большой интервал: сброс только явный
+        self.counter = ViewCounter(flush_interval=3600)
+
+    def views(self):
+        return Advertisement.objects.get(id=self.ad.id).views_count
+
+    def test_same_ip_counted_once(self):
+        self.assertTrue(self.counter.record(self.ad.id, self.ad.user_id, '1.1.1.1'))
+        self.assertFalse(self.counter.record(self.ad.id, self.ad.user_id, '1.1.1.1'))
+        self.assertTrue(self.counter.record(self.ad.id, self.ad.user_id, '2.2.2.2'))
+        self.assertEqual(self.views(), 0)
+
+        self.assertEqual(self.counter.flush(), 1)
+        self.assertEqual(self.views(), 2)
+        daily = AdViewDaily.objects.get(advertisement=self.ad, date=timezone.localdate())
+        self.assertEqual(daily.views, 2)
+
+    def test_failed_daily_write_does_not_double_count(self):
+        self.counter.record(self.ad.id, self.ad.user_id, '1.1.1.1')
+        with mock.patch.object(AdViewDaily.objects, 'bulk_create', side_effect=RuntimeError('disk full')):
+            self.assertEqual(self.counter.flush(), 0)
+        # UPDATE объявлений откатился вместе с дневной статистикой
+        self.assertEqual(self.views(), 0)
+
+        self.counter.flush()
+        self.assertEqual(self.views(), 1)
+        self.assertEqual(AdViewDaily.objects.get(advertisement=self.ad).views, 1)
+
+    def test_timer_flushes_quiet_worker(self):
+        counter = ViewCounter(flush_interval=0.01)
+        flushed = threading.Event()
+        counter.flush = flushed.set
+        counter.record(self.ad.id, self.ad.user_id, '1.1.1.1')
+        counter.start_timer()
+        self.assertTrue(flushed.wait(2))
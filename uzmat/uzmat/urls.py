@@ -15,6 +15,7 @@ urlpatterns = [
     path('chats/start/<int:ad_id>/', views.chat_start, name='chat_start'),
     path('chats/api/<int:thread_id>/send/', views.chat_send, name='chat_send'),
     path('chats/api/<int:thread_id>/poll/', views.chat_poll, name='chat_poll'),
+    path('chats/api/<int:thread_id>/stream/', views.chat_stream, name='chat_stream'),
     path('chats/api/message/<int:message_id>/edit/', views.chat_message_edit, name='chat_message_edit'),
     path('chats/api/message/<int:message_id>/delete/', views.chat_message_delete, name='chat_message_delete'),
     path('settings/', views.settings, name='settings'),
@@ -25,6 +26,11 @@ urlpatterns = [
     path('rules/', views.rules_page, name='rules'),
     path('safety/', views.safety_page, name='safety'),
     path('catalog/', views.catalog, name='catalog'),
+    path('api/listings/<str:section>/', views.listing_feed, name='listing_feed'),
+    path('api/suggest/', views.suggest_api, name='suggest'),
+    path('api/metrics/page-cache/', views.page_cache_metrics, name='page_cache_metrics'),
+    path('api/metrics/sessions/', views.session_metrics, name='session_metrics'),
+    path('api/metrics/telegram/', views.telegram_metrics, name='telegram_metrics'),
     path('create/', views.create_ad, name='create_ad'),
     path('privacy/', views.privacy_policy, name='privacy_policy'),
     path('terms/', views.terms_of_use, name='terms_of_use'),
@@ -33,6 +39,8 @@ urlpatterns = [
     path('logistics/', views.logistics, name='logistics'),
     path('logistics/add/', views.add_cargo, name='add_cargo'),
     path('favorite/<int:ad_id>/', views.toggle_favorite, name='toggle_favorite'),
+    path('saved-searches/', views.saved_search_create, name='saved_search_create'),
+    path('saved-searches/<int:search_id>/delete/', views.saved_search_delete, name='saved_search_delete'),
     path('user/<int:user_id>/', views.user_profile, name='user_profile'),
     path('ad/<slug:slug>/edit/', views.edit_ad, name='edit_ad'),
     path('ad/<slug:slug>/delete/', views.delete_ad, name='delete_ad'),
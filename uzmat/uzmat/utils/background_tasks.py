@@ -1,143 +1,183 @@
 """
 Утилиты для выполнения фоновых задач асинхронно
+
+Задачи выполняются ограниченным пулом потоков (один пул на процесс) с
+ограниченной очередью. Задачи, которые нельзя терять при перезапуске
+(Telegram, уведомления), ставятся в БД-очередь через utils/task_queue.py.
 """
+import logging
+import queue
 import threading
-from django.utils import timezone
-from django.core.cache import cache
+from django.conf import settings
+from django.db import close_old_connections
+
+from .task_queue import durable_task
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorkerPool:
+    """
+    Пул из фиксированного числа потоков с ограниченной очередью задач.
+    Если очередь заполнена, submit() немного ждёт (back-pressure), а затем
+    отбрасывает задачу, не блокируя запрос.
+    """
+
+    def __init__(self, workers, queue_size, submit_timeout):
+        self.workers = max(1, workers)
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._threads = []
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _ensure_started(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._worker,
+                    name=f'uzmat-bg-{len(self._threads) + 1}',
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            func, args, kwargs = self._queue.get()
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Ошибка в фоновой задаче {getattr(func, '__name__', func)}: {e}", exc_info=True)
+            finally:
+                # Потоки пула живут долго: не держим устаревшие соединения с БД
+                close_old_connections()
+                self._queue.task_done()
+
+    def submit(self, func, *args, **kwargs):
+        """Ставит задачу в очередь. Возвращает False, если задача отброшена."""
+        self._ensure_started()
+        try:
+            self._queue.put((func, args, kwargs), timeout=self.submit_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            # Вызывающий код получает False и повторяет сам (счётчик просмотров,
+            # подсказки) или у него есть запасной путь (очередь задач в БД, пересчёт
+            # главной по запросу); в лог — как ошибка: пул не справляется с нагрузкой
+            logger.error(
+                f"Очередь фоновых задач переполнена ({self._queue.maxsize}), "
+                f"задача {getattr(func, '__name__', func)} отброшена (всего отброшено: {self.dropped})"
+            )
+            return False
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Пул фоновых задач текущего процесса (создаётся лениво)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BackgroundWorkerPool(
+                    workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 4),
+                    queue_size=getattr(settings, 'BACKGROUND_TASK_QUEUE_SIZE', 1000),
+                    submit_timeout=getattr(settings, 'BACKGROUND_TASK_SUBMIT_TIMEOUT', 0.05),
+                )
+    return _pool
 
 
 def run_in_background(func, *args, **kwargs):
     """
-    Запускает функцию в фоновом потоке
-    Не блокирует основной запрос
+    Запускает функцию в пуле фоновых потоков
+    Не блокирует основной запрос (при переполнении очереди задача отбрасывается).
+    С BACKGROUND_TASKS_EAGER (тесты) выполняет сразу в текущем потоке.
     """
-    thread = threading.Thread(target=func, args=args, kwargs=kwargs)
-    thread.daemon = True
-    thread.start()
-    return thread
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Ошибка в фоновой задаче {getattr(func, '__name__', func)}: {e}", exc_info=True)
+        return True
+    return get_pool().submit(func, *args, **kwargs)
 
 
-def bump_ads_async():
+@durable_task('send_notification', max_attempts=3)
+def send_notification_async(user_id, message, thread_id=None):
     """
-    Асинхронное автоподнятие объявлений
-    Выполняется в фоновом потоке, не блокирует запрос
+    Отправка уведомлений (можно расширить для email/push)
+    Выполняется через БД-очередь: enqueue_task('send_notification', ...)
     """
-    try:
-        # Импортируем здесь, чтобы избежать циклических импортов
-        from ..models import Advertisement
-        from django.db.models import Q
-        
-        now = timezone.now()
-        bump_candidates = list(
-            Advertisement.objects.filter(
-                is_active=True
-            ).filter(
-                Q(last_bumped_at__isnull=True) | Q(last_bumped_at__lte=now - timezone.timedelta(hours=3))
-            ).values_list('id', flat=True)[:500]
-        )
-        if bump_candidates:
-            # Используем bulk update для производительности
-            Advertisement.objects.filter(id__in=bump_candidates).update(last_bumped_at=now)
-    except Exception as e:
-        # Логируем ошибку, но не прерываем работу сайта
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Ошибка при автоподнятии объявлений: {e}")
+    # Здесь можно добавить отправку email, push-уведомлений и т.д.
+    # Пока просто логируем
+    logger.info(f"Уведомление отправлено пользователю {user_id}: {message}")
 
 
-def increment_ad_views_async(ad_id, user_ip):
+@durable_task('send_ad_to_telegram', max_attempts=5)
+def send_ad_to_telegram_async(ad_id):
     """
-    Асинхронное увеличение счетчика просмотров
-    Выполняется в фоновом потоке
+    Оставлено для задач, поставленных до появления очереди Telegram:
+    перекладывает публикацию в TelegramOutbox (utils/telegram_outbox.py)
     """
-    try:
-        # Импортируем здесь, чтобы избежать циклических импортов
-        from ..models import Advertisement
-        from django.db.models import F
-        
-        # Используем кэш для предотвращения частых обновлений от одного IP
-        view_cache_key = f'ad_view_{ad_id}_{user_ip}'
-        if not cache.get(view_cache_key):
-            # Атомарное обновление через F() - быстрее и безопаснее
-            Advertisement.objects.filter(id=ad_id).update(views_count=F('views_count') + 1)
-            # Кэшируем на 5 минут, чтобы один IP не накручивал счетчик
-            cache.set(view_cache_key, True, 300)
-    except Exception as e:
-        # Логируем ошибку, но не прерываем работу сайта
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Ошибка при увеличении счетчика просмотров: {e}")
+    from .telegram_outbox import enqueue_ad
 
+    enqueue_ad(ad_id)
 
-def update_unread_count_cache_async(user_id, unread_count):
+
+@durable_task('generate_thumbnails', max_attempts=3)
+def generate_thumbnails_async(model_label, ids):
     """
-    Асинхронное обновление кэша непрочитанных сообщений
+    Генерация уменьшенных копий фотографий (AdvertisementImage / ChatImage)
+    Выполняется через БД-очередь: utils.thumbnails.schedule_thumbnails(...)
     """
-    try:
-        cache_key = f'unread_count_{user_id}'
-        cache.set(cache_key, unread_count, 30)
-    except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Ошибка при обновлении кэша непрочитанных сообщений: {e}")
+    from django.apps import apps
+    from .thumbnails import build_thumbnails, source_fields
 
+    model = apps.get_model(model_label)
+    failed = []
+    for obj in model.objects.filter(id__in=ids).only(*source_fields(model)):
+        if obj.thumbnails:
+            # Уже сделано (повтор после частичной ошибки)
+            continue
+        try:
+            build_thumbnails(obj)
+        except Exception as e:
+            logger.error(f"Ошибка при создании копий для {model_label} #{obj.id}: {e}")
+            failed.append(obj.id)
+    if failed:
+        raise RuntimeError(f"Не удалось создать копии для {model_label}: {failed}")
 
-def send_notification_async(user_id, message, thread_id=None):
+
+@durable_task('match_saved_searches', max_attempts=3)
+def match_saved_searches_async(ad_id):
     """
-    Асинхронная отправка уведомлений (можно расширить для email/push)
+    Сверка нового объявления с сохранёнными поисками и уведомления
+    Выполняется через БД-очередь: enqueue_task('match_saved_searches', ad_id)
     """
-    try:
-        # Здесь можно добавить отправку email, push-уведомлений и т.д.
-        # Пока просто логируем
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"Уведомление отправлено пользователю {user_id}: {message}")
-    except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Ошибка при отправке уведомления: {e}")
+    from .saved_searches import notify_saved_searches
 
+    notify_saved_searches(ad_id)
 
-def send_ad_to_telegram_async(ad_id):
+
+@durable_task('send_broadcast', max_attempts=10, lease=300)
+def send_broadcast_async(broadcast_id):
     """
-    Асинхронная отправка объявления в Telegram канал
-    Выполняется в фоновом потоке, не блокирует основной запрос
+    Рассылка уведомления всем пользователям пачками
+    Выполняется через БД-очередь: utils.broadcasts.start_broadcast(...).
+    Повтор после сбоя продолжает с последней отправленной пачки.
     """
+    from .broadcasts import record_error, run_broadcast
+
     try:
-        # Импортируем здесь, чтобы избежать циклических импортов
-        from ..models import Advertisement
-        from .telegram_service import send_ad_to_telegram
-        import logging
-        
-        logger = logging.getLogger(__name__)
-        logger.info(f"🔄 [ASYNC] Начинаем асинхронную отправку объявления {ad_id} в Telegram")
-        
-        # Получаем объявление из БД
-        try:
-            ad = Advertisement.objects.get(id=ad_id)
-        except Advertisement.DoesNotExist:
-            logger.error(f"❌ [ASYNC] Объявление {ad_id} не найдено в БД")
-            return
-        
-        # Обновляем объект, чтобы получить актуальные изображения
-        ad.refresh_from_db()
-        logger.info(f"📸 [ASYNC] Объявление {ad_id}: images.exists()={ad.images.exists()}, image={bool(ad.image)}")
-        
-        # Отправляем в Telegram
-        success, message_id, error = send_ad_to_telegram(ad)
-        
-        if success:
-            # Обновляем объявление
-            ad.sent_to_telegram = True
-            if message_id:
-                ad.telegram_message_id = message_id
-            ad.save(update_fields=['sent_to_telegram', 'telegram_message_id'])
-            logger.info(f"✅ [ASYNC] Объявление {ad_id} успешно отправлено в Telegram. Message ID: {message_id}")
-        else:
-            logger.error(f"❌ [ASYNC] Ошибка при отправке объявления {ad_id} в Telegram: {error}")
-            
+        run_broadcast(broadcast_id)
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"❌ [ASYNC] Исключение при отправке объявления {ad_id} в Telegram: {str(e)}", exc_info=True)
-
+        record_error(broadcast_id, e)
+        raise
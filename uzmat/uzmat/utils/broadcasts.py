@@ -0,0 +1,166 @@
+"""
+Рассылка уведомлений всем пользователям через чат техподдержки
+
+Текст шифруется один раз при создании рассылки. Фоновая задача
+(send_broadcast) идёт по пользователям пачками по id: существующие треды
+поддержки пачки находятся одним запросом, недостающие создаются bulk_create,
+сообщения — тоже bulk_create, время последнего сообщения и счётчики
+непрочитанных обновляются одним UPDATE (deliver_support_messages — его же
+используют плановые напоминания, utils/scheduled_jobs.py). Каждая пачка — отдельная транзакция
+вместе со сдвигом курсора Broadcast.last_user_id, поэтому после сбоя рассылка
+продолжается с места остановки и никому не приходит дважды.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .chat_crypto import encrypt_text
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+
+
+def _recipients(sender_id):
+    from ..models import User
+
+    return User.objects.filter(is_active=True, is_staff=False).exclude(id=sender_id)
+
+
+def start_broadcast(sender, text):
+    """Создаёт рассылку и ставит её в очередь задач; возвращает Broadcast"""
+    from ..models import Broadcast
+    from .task_queue import enqueue_task
+
+    with transaction.atomic():
+        broadcast = Broadcast.objects.create(
+            sender=sender,
+            encrypted_text=encrypt_text(text.strip()),
+            total_recipients=_recipients(sender.id).count(),
+        )
+        enqueue_task('send_broadcast', broadcast.id)
+    return broadcast
+
+
+def _support_threads(sender_id, user_ids):
+    """{user_id: thread_id} для существующих тредов поддержки (один запрос)"""
+    from ..models import ChatThread
+
+    threads = {}
+    rows = (ChatThread.objects
+            .filter(thread_type='support', advertisement__isnull=True, seller_id=sender_id, buyer_id__in=user_ids)
+            .order_by('id')
+            .values_list('buyer_id', 'id'))
+    for buyer_id, thread_id in rows:
+        # Дубли (advertisement = NULL не попадает под уникальный индекс) — берём самый старый
+        threads.setdefault(buyer_id, thread_id)
+    return threads
+
+
+def deliver_support_messages(sender_id, user_ids, encrypted_text, now=None, **message_fields):
+    """
+    Одинаковое сообщение от sender_id в треды поддержки пользователей user_ids:
+    поиск тредов одним запросом, bulk_create недостающих тредов и сообщений,
+    last_message_at и счётчики непрочитанных — одним UPDATE. Вызывать в транзакции.
+    """
+    from ..models import ChatMessage, ChatThread
+
+    now = now or timezone.now()
+    threads = _support_threads(sender_id, user_ids)
+    existing_ids = list(threads.values())
+    missing = [user_id for user_id in user_ids if user_id not in threads]
+    if missing:
+        ChatThread.objects.bulk_create(
+            [
+                ChatThread(
+                    thread_type='support',
+                    buyer_id=user_id,
+                    seller_id=sender_id,
+                    last_message_at=now,
+                    buyer_unread_count=1,
+                )
+                for user_id in missing
+            ],
+            batch_size=500,
+        )
+        # MySQL не возвращает id из bulk_create — перечитываем новые треды
+        threads.update(_support_threads(sender_id, missing))
+
+    ChatMessage.objects.bulk_create(
+        [
+            ChatMessage(thread_id=threads[user_id], sender_id=sender_id, encrypted_text=encrypted_text, **message_fields)
+            for user_id in user_ids
+            if user_id in threads
+        ],
+        batch_size=500,
+    )
+    if existing_ids:
+        # То же, что ChatThread.register_message, но одним UPDATE на пачку
+        ChatThread.objects.filter(id__in=existing_ids).update(
+            last_message_at=now,
+            buyer_unread_count=F('buyer_unread_count') + 1,
+        )
+
+
+def _send_chunk(broadcast_id, chunk_size):
+    """
+    Отправляет следующую пачку. Возвращает число получателей в пачке
+    (0 — рассылка закончена или уже завершена другим процессом).
+    """
+    from ..models import Broadcast
+
+    with transaction.atomic():
+        # Блокировка строки: два воркера с одной задачей не отправят пачку дважды
+        broadcast = Broadcast.objects.select_for_update().filter(id=broadcast_id).first()
+        if broadcast is None or broadcast.status == 'done':
+            return 0
+
+        sender_id = broadcast.sender_id
+        user_ids = list(
+            _recipients(sender_id)
+            .filter(id__gt=broadcast.last_user_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        now = timezone.now()
+        if not user_ids:
+            broadcast.status = 'done'
+            broadcast.finished_at = now
+            broadcast.save(update_fields=['status', 'finished_at', 'updated_at'])
+            return 0
+
+        deliver_support_messages(sender_id, user_ids, broadcast.encrypted_text, now)
+
+        broadcast.status = 'running'
+        broadcast.last_error = ''
+        broadcast.last_user_id = user_ids[-1]
+        broadcast.sent_count = F('sent_count') + len(user_ids)
+        broadcast.save(update_fields=['status', 'last_error', 'last_user_id', 'sent_count', 'updated_at'])
+    return len(user_ids)
+
+
+def run_broadcast(broadcast_id, chunk_size=CHUNK_SIZE):
+    """Отправляет рассылку до конца (с места остановки); возвращает число отправленных сейчас"""
+    from .task_queue import heartbeat
+
+    sent = 0
+    while True:
+        count = _send_chunk(broadcast_id, chunk_size)
+        if not count:
+            break
+        sent += count
+        # Долгая рассылка продлевает аренду задачи, иначе её отдадут второму воркеру
+        if not heartbeat():
+            logger.warning(f"Рассылка {broadcast_id}: задачу забрал другой воркер, останавливаемся")
+            break
+    logger.info(f"Рассылка {broadcast_id}: отправлено {sent} сообщений")
+    return sent
+
+
+def record_error(broadcast_id, error):
+    """Запоминает ошибку для страницы рассылок (повтор выполнит очередь задач)"""
+    from ..models import Broadcast
+
+    Broadcast.objects.filter(id=broadcast_id).update(last_error=str(error)[:2000], updated_at=timezone.now())
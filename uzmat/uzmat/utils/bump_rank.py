@@ -0,0 +1,164 @@
+"""
+Автоподнятие без записи в БД: «каждое объявление всплывает раз в BUMP_INTERVAL»
+
+Вместо периодического UPDATE last_bumped_at у объявления хранится фаза
+bump_phase — секунда внутри цикла BUMP_INTERVAL, в которую оно поднимается
+(время создания по модулю интервала, задаётся один раз при создании).
+Последнее поднятие в момент T — ближайшее к T сверху время с этой фазой,
+поэтому порядок «свежеподнятые первыми» — это фазы от текущей позиции цикла
+вниз, затем с конца цикла: два диапазонных прохода по индексу
+(ad_type, bump_phase) без сортировки выражения.
+"""
+import random
+import time
+import uuid
+
+from django.db.models import Case, F, IntegerField, When
+from django.utils import timezone
+
+BUMP_INTERVAL = 3 * 3600  # секунд
+# Типы объявлений лент главной
+FEED_AD_TYPES = ('sale', 'rent')
+
+
+def bump_phase_at(moment):
+    return int(moment.timestamp()) % BUMP_INTERVAL
+
+
+def current_bump_phase():
+    """Фаза текущего момента; default поля bump_phase (новое объявление поднято при создании)"""
+    return bump_phase_at(timezone.now())
+
+
+def with_bump_order(queryset, now=None):
+    """
+    Аннотация bump_order: чем больше, тем позже поднято. Для вторичной сортировки
+    (после verified_until и т.п.); основную ленту берите через latest_bumped_ids().
+    """
+    cursor = bump_phase_at(now or timezone.now())
+    # Фазы «после» курсора подняты в прошлом цикле — опускаем их, не уходя в минус (unsigned в MySQL)
+    return queryset.annotate(bump_order=Case(
+        When(bump_phase__lte=cursor, then=F('bump_phase') + BUMP_INTERVAL),
+        default=F('bump_phase'),
+        output_field=IntegerField(),
+    ))
+
+
+def _bump_key(cursor):
+    # Порядок «позже поднято — раньше»: сначала фазы до курсора, затем фазы прошлого цикла
+    return lambda row: (row[1] <= cursor, row[1], row[0])
+
+
+def _scan(queryset, cursor, limit):
+    """Два диапазона по bump_phase (до курсора, затем после), не больше limit строк"""
+    rows = list(
+        queryset.filter(bump_phase__lte=cursor)
+        .order_by('-bump_phase', '-id')
+        .values_list('id', 'bump_phase')[:limit]
+    )
+    if len(rows) < limit:
+        rows += list(
+            queryset.filter(bump_phase__gt=cursor)
+            .order_by('-bump_phase', '-id')
+            .values_list('id', 'bump_phase')[:limit - len(rows)]
+        )
+    return rows
+
+
+def latest_bumped_ids(queryset, limit, now=None, ad_types=None):
+    """
+    ID первых limit объявлений по времени последнего поднятия.
+    С ad_types — отдельный проход по индексу (ad_type, bump_phase)
+    на каждый тип и слияние в Python: для ad_type IN (...) планировщик иначе
+    сортирует все подходящие строки.
+    """
+    cursor = bump_phase_at(now or timezone.now())
+    if not ad_types:
+        return [ad_id for ad_id, _ in _scan(queryset, cursor, limit)]
+    rows = []
+    for ad_type in ad_types:
+        rows += _scan(queryset.filter(ad_type=ad_type), cursor, limit)
+    rows.sort(key=_bump_key(cursor), reverse=True)
+    return [ad_id for ad_id, _ in rows[:limit]]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+
+def benchmark(count=200000, repeat=20, limit=8, stdout=None):
+    """
+    Замер выборки ленты главной на count синтетических объявлениях (в транзакции,
+    которая откатывается). «До» — сортировка по выражению Coalesce(дата, created_at),
+    как было с last_bumped_at; «после» — latest_bumped_ids(). Возвращает словарь мс.
+    """
+    from django.db import connection, transaction
+    from django.db.models.functions import Coalesce
+
+    from ..models import Advertisement, User
+
+    now = timezone.now()
+    rng = random.Random(42)
+    results = {}
+    try:
+        with transaction.atomic():
+            user = User.objects.create_user(username=f'bench-{uuid.uuid4().hex[:8]}')
+            created_by_slug = {}
+            for start in range(0, count, 5000):
+                ads = []
+                for i in range(start, min(count, start + 5000)):
+                    created = now - timezone.timedelta(seconds=rng.randint(0, 180 * 86400))
+                    slug = f'bench-{user.id}-{i}'
+                    created_by_slug[slug] = created
+                    ads.append(Advertisement(
+                        user=user, ad_type=rng.choice(['sale', 'rent', 'service', 'parts']),
+                        title=f'Bench {i}', slug=slug, description='-',
+                        country=rng.choice(['uz', 'kz', 'ru']), city='-', phone='-',
+                        bump_phase=bump_phase_at(created),
+                        # Как last_bumped_at: у части объявлений даты поднятия нет
+                        promoted_at=created + timezone.timedelta(hours=rng.randint(0, 72)) if rng.random() < 0.7 else None,
+                    ))
+                Advertisement.objects.bulk_create(ads, batch_size=1000)
+            # created_at (auto_now_add) при вставке — «сейчас»; синтетические даты
+            # ставим отдельным UPDATE (bulk_update не вызывает pre_save полей).
+            # id берём из БД: MySQL не возвращает их из bulk_create
+            rows = Advertisement.objects.filter(user=user).values_list('id', 'slug')
+            Advertisement.objects.bulk_update(
+                [Advertisement(id=ad_id, created_at=created_by_slug[slug]) for ad_id, slug in rows],
+                ['created_at'], batch_size=1000,
+            )
+            if connection.vendor in ('sqlite', 'postgresql'):
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+            base = Advertisement.objects.filter(is_active=True, ad_type__in=FEED_AD_TYPES).exclude(slug='')
+            cases = {
+                'без фильтра': base,
+                'страна uz': base.filter(country='uz'),
+            }
+            for name, queryset in cases.items():
+                before = queryset.annotate(bump_order=Coalesce('promoted_at', 'created_at')).order_by('-bump_order')
+                results[name] = {
+                    'before': _timed(lambda: list(before.values_list('id', flat=True)[:limit]), repeat),
+                    'after': _timed(lambda: latest_bumped_ids(queryset, limit, now, FEED_AD_TYPES), repeat),
+                }
+                if stdout:
+                    (b50, b95), (a50, a95) = results[name]['before'], results[name]['after']
+                    stdout.write(
+                        f'{name}: до — медиана {b50:.1f} мс (p95 {b95:.1f}), '
+                        f'после — медиана {a50:.2f} мс (p95 {a95:.2f}), ускорение ×{b50 / max(a50, 0.001):.0f}'
+                    )
+            raise _Rollback
+    except _Rollback:
+        pass
+    return results
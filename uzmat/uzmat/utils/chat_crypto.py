@@ -0,0 +1,143 @@
+"""
+Шифрование текста сообщений чата
+
+Шифр (MultiFernet) строится один раз на процесс. Первый ключ шифрует новые
+сообщения, остальные только расшифровывают старые:
+  1. CHAT_ENCRYPTION_KEYS — явные Fernet-ключи через запятую (первый — основной);
+  2. ключ из SECRET_KEY;
+  3. ключи из SECRET_KEY_FALLBACKS.
+Поэтому смена SECRET_KEY (со старым значением в SECRET_KEY_FALLBACKS) не делает
+старые сообщения нечитаемыми. Перешифровать всё основным ключом:
+python manage.py rotate_chat_keys
+"""
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# Сколько расшифрованных текстов держать в памяти процесса
+DECRYPT_CACHE_SIZE = 2048
+
+
+def derive_key(secret):
+    """Детерминированный Fernet-ключ из секретной строки"""
+    raw = hashlib.sha256(secret.encode('utf-8')).digest()
+    return base64.urlsafe_b64encode(raw)
+
+
+def _configured_keys():
+    keys = []
+    for key in getattr(settings, 'CHAT_ENCRYPTION_KEYS', []) or []:
+        key = key.strip()
+        if key:
+            keys.append(key.encode('utf-8'))
+    keys.append(derive_key(settings.SECRET_KEY))
+    for secret in getattr(settings, 'SECRET_KEY_FALLBACKS', []) or []:
+        keys.append(derive_key(secret))
+    # Без дублей, с сохранением порядка
+    return list(dict.fromkeys(keys))
+
+
+@lru_cache(maxsize=1)
+def get_cipher():
+    """Шифр текущего процесса (создаётся один раз)"""
+    return MultiFernet([Fernet(key) for key in _configured_keys()])
+
+
+class _DecryptCache:
+    """LRU расшифрованных текстов: (id сообщения, хэш шифротекста) -> текст"""
+
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_decrypt_cache = _DecryptCache(DECRYPT_CACHE_SIZE)
+
+
+@receiver(setting_changed)
+def _reset_cipher(setting, **kwargs):
+    if setting in ('SECRET_KEY', 'SECRET_KEY_FALLBACKS', 'CHAT_ENCRYPTION_KEYS'):
+        get_cipher.cache_clear()
+        _decrypt_cache.clear()
+
+
+def encrypt_text(plain):
+    """Шифрует текст основным ключом"""
+    return get_cipher().encrypt(plain.encode('utf-8')).decode('utf-8')
+
+
+def _decrypt(token):
+    try:
+        return get_cipher().decrypt(token.encode('utf-8')).decode('utf-8')
+    except (InvalidToken, ValueError, TypeError):
+        # Если кто-то записал plaintext напрямую (например, через админку),
+        # не прячем сообщение. Но если это похоже на fernet-токен — не показываем "мусор".
+        raw = (token or '').strip()
+        if raw.startswith('gAAAA'):
+            return ''
+        return raw
+
+
+def decrypt_text(token, message_id=None):
+    """Расшифровывает текст сообщения (с LRU, если известен id сообщения)"""
+    if not token:
+        return ''
+    if message_id is None:
+        return _decrypt(token)
+    # Ключ включает хэш шифротекста: после редактирования сообщения кэш не устареет
+    key = (message_id, hash(token))
+    plain = _decrypt_cache.get(key)
+    if plain is None:
+        plain = _decrypt(token)
+        _decrypt_cache.set(key, plain)
+    return plain
+
+
+def decrypt_many(messages):
+    """
+    Расшифровывает тексты списка сообщений за один проход и запоминает их
+    на объектах, чтобы повторные обращения к message.text не тратили крипто
+    """
+    for message in messages:
+        message.get_text()
+    return messages
+
+
+def rotate_token(token):
+    """
+    Перешифровывает токен основным ключом (для ротации ключей).
+    Возвращает None, если токен уже зашифрован основным ключом.
+    """
+    data = token.encode('utf-8')
+    try:
+        Fernet(_configured_keys()[0]).decrypt(data)
+        return None
+    except InvalidToken:
+        pass
+    return get_cipher().rotate(data).decode('utf-8')
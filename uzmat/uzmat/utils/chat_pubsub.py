@@ -0,0 +1,123 @@
+"""
+Доставка сообщений чата через SSE (chat_stream) между процессами
+
+Сообщения пишут разные процессы: chat_send под gunicorn, рассылки и
+напоминания — воркер очереди и планировщик, уведомления сохранённых поисков —
+воркер. Общий для всех «канал» — водяной знак ChatThread.last_message_at,
+который каждый из них и так обновляет вместе с сообщением (register_message
+или пакетный UPDATE рассылки), поэтому отдельной публикации не нужно.
+
+В ASGI-процессе одна задача-наблюдатель раз в WATCH_INTERVAL секунд одним
+запросом по первичному ключу читает водяные знаки всех тредов, на которые
+есть открытые потоки, и будит подписчиков изменившихся тредов; те дочитывают
+новые сообщения сами. Стоимость — один запрос в интервал на процесс, а не
+на соединение, и ASGI-процессов может быть несколько.
+"""
+import asyncio
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Как часто наблюдатель проверяет водяные знаки, сек (задержка доставки)
+WATCH_INTERVAL = 1.0
+
+
+def _read_watermarks(thread_ids):
+    from ..models import ChatThread
+
+    try:
+        return dict(ChatThread.objects.filter(id__in=thread_ids).values_list('id', 'last_message_at'))
+    finally:
+        # Поток исполнителя живёт долго: соединение не держим между проверками
+        close_old_connections()
+
+
+class ChatBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {thread_id: {(loop, event), ...}}
+        self._subscribers = {}
+        # {thread_id: последний увиденный last_message_at}
+        self._watermarks = {}
+        # {loop: задача-наблюдатель}
+        self._watchers = {}
+
+    def subscribe(self, thread_id):
+        """
+        Подписка на тред; вызывать из корутины (нужен текущий event loop).
+        Событие подписки взводится, когда в треде появились новые сообщения.
+        """
+        loop = asyncio.get_running_loop()
+        subscription = (loop, asyncio.Event())
+        with self._lock:
+            self._subscribers.setdefault(thread_id, set()).add(subscription)
+            watcher = self._watchers.get(loop)
+            if watcher is None or watcher.done():
+                self._watchers[loop] = loop.create_task(self._watch())
+        return subscription
+
+    def unsubscribe(self, thread_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(thread_id)
+            if not subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[thread_id]
+                self._watermarks.pop(thread_id, None)
+
+    def notify(self, thread_id):
+        """Будит подписчиков треда (потокобезопасно, без ожидания)"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(thread_id, ()))
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Event loop уже закрыт — соединение отпишется само
+                pass
+        return len(subscribers)
+
+    def check(self, watermarks):
+        """
+        Сравнивает свежие водяные знаки с увиденными и будит изменившиеся треды.
+        Первое наблюдение тоже будит: сообщение могло прийти между догоняющим
+        чтением потока и подпиской. Возвращает id разбуженных тредов.
+        """
+        changed = []
+        with self._lock:
+            for thread_id, last_message_at in watermarks.items():
+                if thread_id not in self._subscribers:
+                    continue
+                if thread_id not in self._watermarks or self._watermarks[thread_id] != last_message_at:
+                    self._watermarks[thread_id] = last_message_at
+                    changed.append(thread_id)
+        for thread_id in changed:
+            self.notify(thread_id)
+        return changed
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL)
+            with self._lock:
+                thread_ids = list(self._subscribers)
+            if not thread_ids:
+                # Подписчиков нет — наблюдатель заново запустит следующая подписка
+                return
+            try:
+                watermarks = await sync_to_async(_read_watermarks, thread_sensitive=False)(thread_ids)
+            except Exception as e:
+                logger.error(f"Ошибка при проверке новых сообщений чатов: {e}", exc_info=True)
+                continue
+            self.check(watermarks)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+broker = ChatBroker()
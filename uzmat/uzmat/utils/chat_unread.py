@@ -0,0 +1,55 @@
+"""
+Пересчёт денормализованных счётчиков непрочитанных сообщений ChatThread
+по таблице ChatMessage (для management-команды и миграции)
+"""
+from django.db.models import Count, F, Q
+
+
+def _count_unread(message_model, thread_ids, side):
+    last_read = f'thread__{side}_last_read_at'
+    rows = (message_model.objects
+            .filter(thread_id__in=thread_ids)
+            .exclude(sender_id=F(f'thread__{side}_id'))
+            .filter(Q(**{f'{last_read}__isnull': True}) | Q(created_at__gt=F(last_read)))
+            .order_by()
+            .values('thread_id')
+            .annotate(total=Count('id')))
+    return {row['thread_id']: row['total'] for row in rows}
+
+
+def recount_unread(thread_model, message_model, batch_size=500, stdout=None):
+    """
+    Пересчитывает buyer_unread_count / seller_unread_count пачками тредов.
+    Возвращает число исправленных тредов.
+    """
+    last_id = 0
+    fixed = 0
+    processed = 0
+    while True:
+        threads = list(thread_model.objects
+                       .filter(id__gt=last_id)
+                       .order_by('id')
+                       .only('id', 'buyer_unread_count', 'seller_unread_count')[:batch_size])
+        if not threads:
+            break
+        ids = [t.id for t in threads]
+        buyer_counts = _count_unread(message_model, ids, 'buyer')
+        seller_counts = _count_unread(message_model, ids, 'seller')
+
+        changed = []
+        for thread in threads:
+            buyer_unread = buyer_counts.get(thread.id, 0)
+            seller_unread = seller_counts.get(thread.id, 0)
+            if thread.buyer_unread_count != buyer_unread or thread.seller_unread_count != seller_unread:
+                thread.buyer_unread_count = buyer_unread
+                thread.seller_unread_count = seller_unread
+                changed.append(thread)
+        if changed:
+            thread_model.objects.bulk_update(changed, ['buyer_unread_count', 'seller_unread_count'])
+
+        fixed += len(changed)
+        processed += len(threads)
+        last_id = ids[-1]
+        if stdout:
+            stdout.write(f'Проверено тредов: {processed}, исправлено: {fixed}')
+    return fixed
@@ -0,0 +1,113 @@
+"""
+Условные GET-запросы: ETag / Last-Modified и ответ 304 без тела
+
+Версия ресурса считается до тяжёлых запросов view: для страниц — по версиям
+тегов кэша страниц (utils/page_cache.py: ad:<id>, user:<id>, feed:...; их
+увеличивают сигналы, одно чтение кэша на запрос и ни одной записи в БД при
+сохранении), для опроса чата — по ChatThread.last_message_at. Совпала версия
+у клиента — view не вызывается.
+
+Версии тегов — счётчики, а не время, поэтому страницам ставится только ETag,
+без Last-Modified (браузеры переспрашивают по If-None-Match).
+ETag анонимных страниц дополнительно меняется раз в CONDITIONAL_GET_PERIOD
+секунд: истечение продвижения и значка проверки продавца версий не меняет.
+"""
+import hashlib
+import logging
+import time
+from calendar import timegm
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .page_cache import anonymous_page_request, tag_versions
+
+logger = logging.getLogger(__name__)
+
+
+def conditional_period():
+    return getattr(settings, 'CONDITIONAL_GET_PERIOD', 300)
+
+
+def make_validators(parts, modified=(), periodic=True):
+    """ETag — хэш частей версии, Last-Modified — самое позднее из времён изменения"""
+    parts = [str(part) for part in parts]
+    modified = [dt for dt in modified if dt]
+    period = conditional_period()
+    if periodic and period > 0:
+        started = int(time.time()) // period * period
+        parts.append(str(started))
+        if modified:
+            modified.append(datetime.fromtimestamp(started, tz=dt_timezone.utc))
+    etag = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+    return etag, max(modified) if modified else None
+
+
+def content_validators(tags, *extra):
+    """Валидаторы страницы по версиям тегов кэша страниц (и доп. частям, например строке запроса)"""
+    versions = tag_versions(tags)
+    parts = [f'{tag}={versions[tag]}' for tag in sorted(versions)]
+    return make_validators([*parts, *extra])
+
+
+def not_modified(request, etag, last_modified=None):
+    """Ответ 304, если у клиента та же версия (If-None-Match / If-Modified-Since); иначе None"""
+    response = get_conditional_response(
+        request,
+        etag=quote_etag(etag),
+        last_modified=timegm(last_modified.utctimetuple()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    """ETag и Last-Modified в ответ; браузер хранит его, но перед показом переспрашивает сервер"""
+    if response.status_code in (200, 304) and not response.has_header('ETag'):
+        response['ETag'] = quote_etag(etag)
+        if last_modified:
+            response['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(validators, on_not_modified=None):
+    """
+    Декоратор view анонимной страницы: validators(request, *args, **kwargs)
+    возвращает (etag, last_modified) или None (страницу не версионируем).
+    on_not_modified(request, meta) — что сделать и при ответе 304 (счётчик просмотров);
+    meta validators передают через page_cache.set_page_meta.
+    Ставится над cache_anonymous_page: 304 не трогает даже кэш страниц.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            result = None
+            if anonymous_page_request(request):
+                try:
+                    result = validators(request, *args, **kwargs)
+                except Exception as e:
+                    logger.error(f"Условный GET ({view_func.__name__}): ошибка расчёта версии: {e}")
+            if result is None:
+                return view_func(request, *args, **kwargs)
+
+            etag, last_modified = result
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                if on_not_modified:
+                    try:
+                        on_not_modified(request, getattr(request, '_page_cache_meta', None) or {})
+                    except Exception as e:
+                        logger.error(f"Условный GET ({view_func.__name__}): ошибка on_not_modified: {e}")
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,243 @@
+"""
+Справочники городов, марок и типов техники
+
+Свободный текст из объявлений (Ташкент / Toshkent / Tashkent, CAT / Caterpillar)
+приводится к записи справочника DictionaryEntry через таблицу синонимов
+DictionaryAlias. Ключ синонима — транслитерированная в латиницу строка в нижнем
+регистре, поэтому кириллица и латиница одного слова совпадают без отдельного
+синонима. Объявление хранит ссылки city_ref / brand_ref / equipment_type_ref,
+и фильтры ленты — это индексное равенство / IN по ним вместо icontains.
+Нормализовать существующие объявления: python manage.py normalize_dictionaries
+"""
+import logging
+import re
+
+from django.db import IntegrityError, transaction
+
+logger = logging.getLogger(__name__)
+
+KIND_CITY = 'city'
+KIND_BRAND = 'brand'
+KIND_EQUIPMENT_TYPE = 'equipment_type'
+
+# Вид справочника -> (поле-ссылка объявления, поля с исходным текстом по приоритету)
+AD_DICTIONARY_FIELDS = {
+    KIND_CITY: ('city_ref', ('city',)),
+    KIND_BRAND: ('brand_ref', ('brand', 'part_brand')),
+    KIND_EQUIPMENT_TYPE: ('equipment_type_ref', ('equipment_type', 'part_equipment_type')),
+}
+DICTIONARY_SOURCE_FIELDS = {field for _, fields in AD_DICTIONARY_FIELDS.values() for field in fields}
+DICTIONARY_REF_FIELDS = {ref for ref, _ in AD_DICTIONARY_FIELDS.values()}
+
+NAME_MAX_LENGTH = 100
+# Сколько записей справочника может дать префиксный поиск по недописанному слову
+MAX_PREFIX_MATCHES = 50
+
+# Кириллица (ru/uz/kz) -> латиница
+_TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'j',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '', 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya',
+    # Узбекский
+    'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+    # Казахский
+    'ә': 'a', 'ө': 'o', 'ү': 'u', 'ұ': 'u', 'і': 'i', 'ң': 'ng', 'һ': 'h',
+}
+_APOSTROPHES_RE = re.compile(r"[ʻʼ’‘`']")
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+# Начальное наполнение: вид -> [(каноническое название, [синонимы]), ...]
+DICTIONARY_SEED = {
+    KIND_CITY: [
+        ('Ташкент', ['Toshkent', 'Tashkent', 'Тошкент']),
+        ('Самарканд', ['Samarqand', 'Samarkand', 'Самарқанд']),
+        ('Бухара', ['Buxoro', 'Bukhara', 'Бухоро']),
+        ('Наманган', ['Namangan']),
+        ('Андижан', ['Andijon', 'Andijan', 'Андижон']),
+        ('Фергана', ['Fargona', "Farg'ona", 'Fergana', 'Фарғона']),
+        ('Нукус', ['Nukus']),
+        ('Карши', ['Qarshi', 'Karshi', 'Қарши']),
+        ('Навои', ['Navoiy', 'Navoi', 'Навоий']),
+        ('Термез', ['Termiz', 'Termez']),
+        ('Ургенч', ['Urganch', 'Urgench']),
+        ('Джизак', ['Jizzax', 'Jizzakh', 'Жиззах']),
+        ('Алматы', ['Almaty', 'Алма-Ата', 'Алмата']),
+        ('Астана', ['Astana', 'Нур-Султан', 'Nur-Sultan']),
+        ('Шымкент', ['Shymkent', 'Чимкент', 'Chimkent']),
+        ('Караганда', ['Karaganda', 'Qaraghandy', 'Қарағанды']),
+        ('Актобе', ['Aktobe', 'Ақтөбе', 'Актюбинск']),
+        ('Атырау', ['Atyrau']),
+        ('Актау', ['Aktau', 'Ақтау']),
+        ('Павлодар', ['Pavlodar']),
+        ('Усть-Каменогорск', ['Oskemen', 'Өскемен', 'Ust-Kamenogorsk']),
+        ('Москва', ['Moskva', 'Moscow']),
+        ('Санкт-Петербург', ['Saint Petersburg', 'Петербург', 'СПб']),
+    ],
+    KIND_BRAND: [
+        ('Caterpillar', ['CAT', 'Катерпиллер', 'Катерпиллар']),
+        ('Komatsu', ['Комацу', 'Коматсу']),
+        ('Hitachi', ['Хитачи']),
+        ('Volvo', ['Вольво']),
+        ('JCB', ['ДжиСиБи']),
+        ('Hyundai', ['Хендай', 'Хундай', 'Хюндай']),
+        ('Doosan', ['Дусан', 'Доосан']),
+        ('Liebherr', ['Либхер', 'Либхерр']),
+        ('XCMG', ['ХСМГ']),
+        ('Shantui', ['Шантуй']),
+        ('SANY', ['Сани']),
+        ('SDLG', ['СДЛГ']),
+        ('LiuGong', ['Люгонг']),
+        ('Howo', ['Хово', 'Sinotruk']),
+        ('Shacman', ['Шакман', 'Shaanxi']),
+        ('КАМАЗ', ['Kamaz']),
+        ('МТЗ', ['Беларус', 'Belarus', 'MTZ']),
+        ('ЧТЗ', ['ChTZ']),
+    ],
+    KIND_EQUIPMENT_TYPE: [
+        ('Экскаватор', ['Ekskavator', 'Excavator']),
+        ('Экскаватор-погрузчик', ['Ekskavator-yuklagich', 'Backhoe loader']),
+        ('Погрузчик', ['Yuklagich', 'Loader', 'Фронтальный погрузчик']),
+        ('Бульдозер', ['Buldozer', 'Bulldozer']),
+        ('Автокран', ['Кран', 'Kran', 'Crane', 'Avtokran']),
+        ('Самосвал', ['Samosval', 'Dump truck']),
+        ('Автогрейдер', ['Грейдер', 'Greyder', 'Grader']),
+        ('Каток', ['Katok', 'Roller', 'Дорожный каток']),
+        ('Манипулятор', ['Manipulyator', 'Кран-манипулятор']),
+        ('Трактор', ['Traktor', 'Tractor']),
+        ('Автобетоносмеситель', ['Миксер', 'Бетономешалка', 'Mixer']),
+        ('Автовышка', ['Avtovishka', 'Aerial platform']),
+        ('Тягач', ['Tyagach', 'Седельный тягач']),
+    ],
+}
+
+
+def normalize_key(text):
+    """Ключ для сравнения: латиница в нижнем регистре, без пунктуации"""
+    text = _APOSTROPHES_RE.sub('', (text or '').strip().lower())
+    text = ''.join(_TRANSLIT.get(ch, ch) for ch in text)
+    return _NON_ALNUM_RE.sub(' ', text).strip()[:NAME_MAX_LENGTH]
+
+
+def _source_value(values, fields):
+    for field in fields:
+        value = (values.get(field) or '').strip()
+        if value:
+            return value[:NAME_MAX_LENGTH]
+    return ''
+
+
+def resolve_entry_id(kind, text, entry_model=None, alias_model=None, create=True):
+    """
+    id записи справочника для текста (по синониму). Неизвестное значение
+    становится новой записью, чтобы у каждого объявления была ссылка.
+    """
+    if entry_model is None:
+        from ..models import DictionaryEntry as entry_model, DictionaryAlias as alias_model
+
+    key = normalize_key(text)
+    if not key:
+        return None
+    entry_id = alias_model.objects.filter(kind=kind, key=key).values_list('entry_id', flat=True).first()
+    if entry_id or not create:
+        return entry_id
+    try:
+        with transaction.atomic():
+            entry = entry_model.objects.create(kind=kind, name=text.strip()[:NAME_MAX_LENGTH])
+            alias_model.objects.create(kind=kind, key=key, entry=entry)
+            return entry.id
+    except IntegrityError:
+        # Параллельный запрос уже создал синоним
+        return alias_model.objects.filter(kind=kind, key=key).values_list('entry_id', flat=True).first()
+
+
+def assign_dictionary_refs(advertisement):
+    """Проставляет объявлению ссылки на справочники по текстовым полям"""
+    values = {field: getattr(advertisement, field) for field in DICTIONARY_SOURCE_FIELDS}
+    for kind, (ref_field, fields) in AD_DICTIONARY_FIELDS.items():
+        text = _source_value(values, fields)
+        setattr(advertisement, f'{ref_field}_id', resolve_entry_id(kind, text) if text else None)
+
+
+def matching_entry_ids(kind, text):
+    """
+    id записей справочника, подходящих под введённый в фильтр текст:
+    точное совпадение синонима, иначе — синонимы, начинающиеся с текста
+    (пользователь мог не дописать слово). Оба варианта идут по индексу (kind, key).
+    """
+    from ..models import DictionaryAlias
+
+    key = normalize_key(text)
+    if not key:
+        return []
+    aliases = DictionaryAlias.objects.filter(kind=kind)
+    exact = list(aliases.filter(key=key).values_list('entry_id', flat=True))
+    if exact:
+        return exact
+    return list(
+        aliases.filter(key__startswith=key)
+        .values_list('entry_id', flat=True)
+        .distinct()[:MAX_PREFIX_MATCHES]
+    )
+
+
+def filter_by_dictionary(queryset, kind, text):
+    """Фильтр объявлений по справочнику вместо icontains по свободному тексту"""
+    ref_field = AD_DICTIONARY_FIELDS[kind][0]
+    ids = matching_entry_ids(kind, text)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(**{f'{ref_field}_id__in': ids})
+
+
+def seed_dictionaries(entry_model, alias_model):
+    """Заполняет справочники начальными значениями (повторный запуск безопасен)"""
+    for kind, entries in DICTIONARY_SEED.items():
+        for name, aliases in entries:
+            entry_id = resolve_entry_id(kind, name, entry_model, alias_model)
+            entry_model.objects.filter(id=entry_id).update(name=name)
+            for alias in aliases:
+                key = normalize_key(alias)
+                if key:
+                    alias_model.objects.get_or_create(kind=kind, key=key, defaults={'entry_id': entry_id})
+
+
+def normalize_advertisements(ad_model, entry_model, alias_model, batch_size=1000, stdout=None):
+    """
+    Проставляет ссылки на справочники объявлениям пачками по id.
+    Возвращает число изменённых объявлений.
+    """
+    ref_fields = [ref for ref, _ in AD_DICTIONARY_FIELDS.values()]
+    fields = ['id'] + sorted(DICTIONARY_SOURCE_FIELDS) + [f'{ref}_id' for ref in ref_fields]
+    # Синонимы в памяти: не ходим в БД за каждым значением
+    cache = {}
+    last_id = 0
+    changed_total = 0
+    processed = 0
+    while True:
+        batch = list(ad_model.objects.filter(id__gt=last_id).order_by('id').values(*fields)[:batch_size])
+        if not batch:
+            break
+        changed = []
+        for values in batch:
+            updates = {}
+            for kind, (ref_field, source_fields) in AD_DICTIONARY_FIELDS.items():
+                text = _source_value(values, source_fields)
+                cache_key = (kind, normalize_key(text))
+                if cache_key not in cache:
+                    cache[cache_key] = resolve_entry_id(kind, text, entry_model, alias_model) if text else None
+                if values[f'{ref_field}_id'] != cache[cache_key]:
+                    updates[f'{ref_field}_id'] = cache[cache_key]
+            if updates:
+                changed.append(ad_model(id=values['id'], **{
+                    f'{ref}_id': updates.get(f'{ref}_id', values[f'{ref}_id']) for ref in ref_fields
+                }))
+        if changed:
+            ad_model.objects.bulk_update(changed, ref_fields, batch_size=batch_size)
+        changed_total += len(changed)
+        processed += len(batch)
+        last_id = batch[-1]['id']
+        if stdout:
+            stdout.write(f'Обработано объявлений: {processed}, изменено: {changed_total}')
+    return changed_total
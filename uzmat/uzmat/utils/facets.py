@@ -0,0 +1,169 @@
+"""
+Фасетные счётчики для фильтров лент (город, марка, тип техники, состояние, цена)
+
+Таблица FacetCount хранит число активных объявлений по каждому значению фасета
+в разрезе (страна, тип объявления). Сигналы объявления меняют только
+затронутые строки (+1/-1), поэтому сайдбару не нужен GROUP BY по всем
+объявлениям на каждый просмотр. Полный пересчёт: python manage.py rebuild_facets
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+FACETS = ('city', 'brand', 'equipment_type', 'condition', 'price')
+
+# Поля объявления, от которых зависят фасеты.
+# *_ref__name — канонические названия из справочников (utils/dictionaries.py)
+FACET_SOURCE_FIELDS = (
+    'is_active', 'slug', 'country', 'ad_type', 'city',
+    'brand', 'part_brand', 'equipment_type', 'part_equipment_type',
+    'condition', 'price_usd',
+    'city_ref__name', 'brand_ref__name', 'equipment_type_ref__name',
+)
+
+# Диапазоны цены в USD: (от, до, ключ, подпись)
+PRICE_BUCKETS = (
+    (0, 1000, '0-1000', 'до $1 000'),
+    (1000, 5000, '1000-5000', '$1 000 – 5 000'),
+    (5000, 20000, '5000-20000', '$5 000 – 20 000'),
+    (20000, 50000, '20000-50000', '$20 000 – 50 000'),
+    (50000, None, '50000-', 'от $50 000'),
+)
+PRICE_BUCKET_LABELS = {key: label for _, _, key, label in PRICE_BUCKETS}
+_PRICE_BUCKET_ORDER = {key: i for i, (_, _, key, _) in enumerate(PRICE_BUCKETS)}
+
+VALUE_MAX_LENGTH = 100
+
+
+def price_bucket(price_usd):
+    if price_usd is None:
+        return None
+    for low, high, key, _ in PRICE_BUCKETS:
+        if price_usd >= low and (high is None or price_usd < high):
+            return key
+    return None
+
+
+def _clean(value):
+    value = (value or '').strip()
+    return value[:VALUE_MAX_LENGTH] or None
+
+
+def _ad_values(ad):
+    values = {}
+    for field in FACET_SOURCE_FIELDS:
+        if '__' in field:
+            ref, attr = field.split('__')
+            entry = getattr(ad, ref) if getattr(ad, f'{ref}_id') else None
+            values[field] = getattr(entry, attr) if entry else None
+        else:
+            values[field] = getattr(ad, field)
+    return values
+
+
+def facet_keys(values):
+    """
+    Множество ключей (страна, тип, фасет, значение), в которые входит объявление.
+    values — словарь полей FACET_SOURCE_FIELDS (или объект объявления).
+    """
+    if not isinstance(values, dict):
+        values = _ad_values(values)
+    if not values.get('is_active') or not values.get('slug'):
+        return set()
+
+    facet_values = {
+        'city': _clean(values.get('city_ref__name') or values.get('city')),
+        'brand': _clean(values.get('brand_ref__name') or values.get('brand') or values.get('part_brand')),
+        'equipment_type': _clean(
+            values.get('equipment_type_ref__name')
+            or values.get('equipment_type')
+            or values.get('part_equipment_type')
+        ),
+        'condition': _clean(values.get('condition')),
+        'price': price_bucket(values.get('price_usd')),
+    }
+    country, ad_type = values.get('country') or '', values.get('ad_type') or ''
+    return {(country, ad_type, facet, value) for facet, value in facet_values.items() if value}
+
+
+def apply_facet_changes(old_keys, new_keys):
+    """Переносит объявление из old_keys в new_keys: +1 новым значениям, -1 старым"""
+    from ..models import FacetCount
+
+    added = new_keys - old_keys
+    removed = old_keys - new_keys
+    if not added and not removed:
+        return
+    with transaction.atomic():
+        if added:
+            # Строки могли ещё не существовать: создаём без гонки между процессами
+            FacetCount.objects.bulk_create(
+                [FacetCount(country=c, ad_type=t, facet=f, value=v, count=0) for c, t, f, v in added],
+                ignore_conflicts=True,
+            )
+        for (country, ad_type, facet, value), delta in [(k, 1) for k in added] + [(k, -1) for k in removed]:
+            rows = FacetCount.objects.filter(country=country, ad_type=ad_type, facet=facet, value=value)
+            if delta < 0:
+                rows = rows.filter(count__gt=0)
+            rows.update(count=F('count') + delta)
+
+
+def get_facets(ad_types, country=None, facets=FACETS):
+    """
+    Счётчики фасетов для ленты: {фасет: [(значение, число), ...]}.
+    Города — по алфавиту, цены — по возрастанию, остальное — по убыванию числа.
+    """
+    from ..models import FacetCount
+
+    rows = FacetCount.objects.filter(ad_type__in=ad_types, facet__in=facets, count__gt=0)
+    if country:
+        rows = rows.filter(country=country)
+    result = {facet: [] for facet in facets}
+    for row in rows.values('facet', 'value').annotate(total=Sum('count')):
+        result[row['facet']].append((row['value'], row['total']))
+
+    for facet, items in result.items():
+        if facet == 'city':
+            items.sort(key=lambda item: item[0])
+        elif facet == 'price':
+            items.sort(key=lambda item: _PRICE_BUCKET_ORDER.get(item[0], len(PRICE_BUCKETS)))
+        else:
+            items.sort(key=lambda item: (-item[1], item[0]))
+    return result
+
+
+def facets_payload(facets):
+    """Фасеты для JSON-ответа (с подписями диапазонов цены)"""
+    payload = {}
+    for facet, items in facets.items():
+        payload[facet] = [
+            {
+                'value': value,
+                'label': PRICE_BUCKET_LABELS.get(value, value) if facet == 'price' else value,
+                'count': count,
+            }
+            for value, count in items
+        ]
+    return payload
+
+
+def rebuild_facets(ad_model, facet_model, stdout=None):
+    """Полностью пересчитывает FacetCount по таблице объявлений. Возвращает число строк."""
+    counts = Counter()
+    # В старых миграциях у модели ещё может не быть ссылок на справочники
+    model_fields = {field.name for field in ad_model._meta.get_fields()}
+    fields = [field for field in FACET_SOURCE_FIELDS if field.split('__')[0] in model_fields]
+    ads = ad_model.objects.filter(is_active=True).values(*fields)
+    for values in ads.iterator(chunk_size=2000):
+        counts.update(facet_keys(values))
+
+    with transaction.atomic():
+        facet_model.objects.all().delete()
+        facet_model.objects.bulk_create(
+            [facet_model(country=c, ad_type=t, facet=f, value=v, count=n) for (c, t, f, v), n in counts.items()],
+            batch_size=1000,
+        )
+    if stdout:
+        stdout.write(f'Значений фасетов: {len(counts)}')
+    return len(counts)
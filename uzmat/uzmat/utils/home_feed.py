@@ -0,0 +1,216 @@
+"""
+Материализованные подборки главной страницы (горячие / популярные / свежие).
+
+Ранжированные списки ID считаются один раз для каждой комбинации
+страна/город и хранятся в кэше. При изменении объявлений или верификации
+пользователей версия подборок увеличивается, а пересчёт запускается в фоне.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db.models import Case, When, Value, IntegerField
+from django.utils import timezone
+
+from .bump_rank import FEED_AD_TYPES, latest_bumped_ids, with_bump_order
+from .dictionaries import filter_by_dictionary
+
+logger = logging.getLogger(__name__)
+
+FEED_VERSION_KEY = 'home_feed_version'
+FEED_RECENT_KEY = 'home_feed_recent_filters'
+FEED_REBUILD_LOCK_KEY = 'home_feed_rebuild_lock'
+# Продвижения истекают по времени, поэтому подборки живут недолго даже без изменений
+FEED_TIMEOUT = 120
+MAX_RECENT_FILTERS = 50
+
+HOT_LIMIT = 16
+HOT_FALLBACK_LIMIT = 7
+POPULAR_LIMIT = 10
+PREVIEW_LIMIT = 8
+
+# Поля, от которых зависит состав и порядок подборок
+FEED_FIELDS = {
+    'is_active', 'ad_type', 'country', 'city', 'slug', 'user',
+    'is_promoted', 'promoted_at', 'promotion_until', 'promotion_plan',
+}
+USER_FEED_FIELDS = {'is_verified', 'verified_until'}
+
+# GET-параметры, которые поддерживает материализованная главная
+FEED_FILTER_PARAMS = {'country', 'city'}
+
+
+def normalize_filters(country, city):
+    """Приводит фильтры к виду, который использует get_filtered_ads"""
+    country = (country or '').strip()
+    if country == 'all':
+        country = ''
+    city = (city or '').strip()
+    if city == 'all':
+        city = ''
+    return country, city
+
+
+def _base_queryset(country, city):
+    from ..models import Advertisement
+
+    qs = (Advertisement.objects
+          .filter(is_active=True, ad_type__in=FEED_AD_TYPES)
+          .exclude(slug='')
+          .exclude(slug__isnull=True))
+    if country:
+        qs = qs.filter(country=country)
+    if city:
+        qs = filter_by_dictionary(qs, 'city', city)
+    return with_bump_order(qs)
+
+
+def compute_feed(country, city):
+    """Считает подборки главной для фильтра страна/город"""
+    return compute_feed_for_queryset(_base_queryset(country, city))
+
+
+def compute_feed_for_queryset(base_active):
+    """
+    Считает подборки по базовому queryset (с аннотацией bump_order)
+    и возвращает словарь списков ID
+    """
+    now = timezone.now()
+
+    promoted_active = base_active.filter(is_promoted=True, promotion_until__gte=now)
+    verified_active = base_active.filter(user__is_verified=True, user__verified_until__gte=now)
+
+    plan_priority = Case(
+        When(promotion_plan='vip', then=Value(1)),
+        When(promotion_plan='premium', then=Value(2)),
+        When(promotion_plan='gold', then=Value(3)),
+        default=Value(4),
+        output_field=IntegerField()
+    )
+
+    # Горячие предложения: до 16 по приоритету тарифа, затем проверенные
+    hot_ids = list(
+        promoted_active.annotate(plan_priority=plan_priority)
+        .order_by('plan_priority', '-promoted_at', '-created_at')
+        .values_list('id', flat=True)[:HOT_LIMIT]
+    )
+    slots_left = HOT_LIMIT - len(hot_ids)
+    if slots_left > 0:
+        hot_ids += list(
+            verified_active.exclude(id__in=hot_ids)
+            .order_by('-user__verified_until', '-bump_order')
+            .values_list('id', flat=True)[:slots_left]
+        )
+    if not hot_ids:
+        hot_ids = latest_bumped_ids(base_active, HOT_FALLBACK_LIMIT, now, FEED_AD_TYPES)
+
+    # Популярные: GOLD держится в топ-4 первые 12 часов, далее VIP > PREMIUM > GOLD, затем проверенные
+    popular_ids = list(
+        promoted_active.filter(promotion_plan='gold', promoted_at__gte=now - timezone.timedelta(hours=12))
+        .order_by('-promoted_at')
+        .values_list('id', flat=True)[:4]
+    )
+    popular_ids += list(
+        promoted_active.exclude(id__in=popular_ids)
+        .annotate(plan_priority=plan_priority)
+        .order_by('plan_priority', '-promoted_at', '-created_at')
+        .values_list('id', flat=True)[:max(0, POPULAR_LIMIT - len(popular_ids))]
+    )
+    if len(popular_ids) < POPULAR_LIMIT:
+        popular_ids += list(
+            verified_active.exclude(id__in=popular_ids)
+            .order_by('-user__verified_until', '-bump_order')
+            .values_list('id', flat=True)[:POPULAR_LIMIT - len(popular_ids)]
+        )
+
+    preview_ids = latest_bumped_ids(base_active, PREVIEW_LIMIT, now, FEED_AD_TYPES)
+
+    return {
+        'hot': hot_ids,
+        'popular': popular_ids[:POPULAR_LIMIT],
+        'preview': preview_ids,
+    }
+
+
+def _feed_cache_key(country, city, version):
+    return f'home_feed:{version}:{country}:{city}'
+
+
+def _remember_filters(country, city):
+    recent = cache.get(FEED_RECENT_KEY) or []
+    entry = [country, city]
+    if entry in recent:
+        return
+    recent.append(entry)
+    cache.set(FEED_RECENT_KEY, recent[-MAX_RECENT_FILTERS:], None)
+
+
+def get_home_feed(country, city):
+    """
+    Возвращает подборки для фильтра (из кэша или с пересчётом)
+    """
+    country, city = normalize_filters(country, city)
+    version = cache.get(FEED_VERSION_KEY, 0)
+    key = _feed_cache_key(country, city, version)
+    feed = cache.get(key)
+    if feed is None:
+        feed = compute_feed(country, city)
+        cache.set(key, feed, FEED_TIMEOUT)
+        _remember_filters(country, city)
+    return feed
+
+
+def rebuild_home_feed():
+    """
+    Пересчитывает подборки для всех недавно запрошенных фильтров
+    Выполняется в фоновом потоке
+    """
+    if not cache.add(FEED_REBUILD_LOCK_KEY, True, 10):
+        # Пересчёт уже идёт; следующий запрос досчитает недостающее сам
+        return
+    try:
+        version = cache.get(FEED_VERSION_KEY, 0)
+        filters = cache.get(FEED_RECENT_KEY) or []
+        if ['', ''] not in filters:
+            filters.insert(0, ['', ''])
+        for country, city in filters:
+            cache.set(_feed_cache_key(country, city, version), compute_feed(country, city), FEED_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Ошибка при пересчёте подборок главной: {e}", exc_info=True)
+    finally:
+        cache.delete(FEED_REBUILD_LOCK_KEY)
+
+
+def invalidate_home_feed():
+    """
+    Сбрасывает подборки главной и запускает их пересчёт в фоне
+    """
+    from .background_tasks import run_in_background
+    from .page_cache import invalidate_tags
+
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        cache.set(FEED_VERSION_KEY, 1, None)
+    # И закэшированные страницы главной (utils/page_cache.py)
+    invalidate_tags('home')
+    if not run_in_background(rebuild_home_feed):
+        # Пул переполнен: подборки досчитает get_home_feed() при первом запросе
+        logger.error("Пересчёт подборок главной отброшен, посчитаются при запросе")
+
+
+def load_feed_ads(feed):
+    """
+    Загружает объявления всех подборок одним запросом id__in
+    и раскладывает их обратно по спискам в исходном порядке
+    """
+    from ..models import Advertisement
+
+    all_ids = set(feed['hot']) | set(feed['popular']) | set(feed['preview'])
+    ads_by_id = {}
+    if all_ids:
+        ads_by_id = Advertisement.objects.select_related('user').for_cards().in_bulk(all_ids)
+
+    def pick(ids):
+        return [ads_by_id[ad_id] for ad_id in ids if ad_id in ads_by_id]
+
+    return pick(feed['hot']), pick(feed['popular']), pick(feed['preview'])
@@ -0,0 +1,73 @@
+"""
+Простые счётчики для наблюдения за производительностью (попадания в кэш и т.п.)
+
+Хранятся только в общем кэше (L2 в utils/two_tier_cache.py, префикс в
+L2_ONLY_PREFIXES): счётчики общие для всех воркеров. Счётчики, которые
+растут на каждом запросе, копит в памяти процесса BufferedCounters.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = 'metrics:'
+
+
+def incr(name, delta=1):
+    key = METRICS_PREFIX + name
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Ключа ещё нет (или вытеснен): add не затрёт параллельный incr
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def get_values(names):
+    """{имя: значение} для перечисленных счётчиков (отсутствующие — 0)"""
+    values = cache.get_many([METRICS_PREFIX + name for name in names])
+    return {name: values.get(METRICS_PREFIX + name, 0) for name in names}
+
+
+def reset(names):
+    cache.delete_many([METRICS_PREFIX + name for name in names])
+
+
+class BufferedCounters:
+    """
+    Счётчики горячего пути: приросты копятся в памяти процесса и уходят в
+    общий кэш не чаще раза в flush_interval секунд (и при выходе процесса),
+    так что запрос не пишет в L2 ради статистики
+    """
+
+    def __init__(self, flush_interval=30):
+        self.flush_interval = flush_interval
+        self._pending = Counter()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def incr(self, name, delta=1):
+        """Копит прирост; True, если этим вызовом накопленное ушло в кэш"""
+        with self._lock:
+            self._pending[name] += delta
+            if time.monotonic() - self._flushed_at < self.flush_interval:
+                return False
+        self.flush()
+        return True
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+        try:
+            for name, delta in pending.items():
+                incr(name, delta)
+        except Exception as e:
+            # Статистика не должна ломать запрос: теряем только этот интервал
+            logger.warning(f"Не удалось сохранить счётчики {sorted(pending)}: {e}")
@@ -0,0 +1,256 @@
+"""
+Кэш готовых страниц для анонимных посетителей (главная, каталог, запчасти,
+логистика, страница объявления)
+
+Ключ — путь и нормализованная строка запроса (параметры отсортированы, пустые
+и рекламные utm_* отброшены). При попадании view не вызывается вообще.
+Инвалидация по тегам: view помечает страницу тегами (ad:<id>, user:<id>,
+feed:<тип>[:<фильтр>:<значение>]), в записи кэша хранятся версии тегов на момент
+сохранения; сохранение объявления увеличивает версии только его тегов, и
+страницы с устаревшей версией считаются промахом. Счётчики попаданий по каждой
+view копятся в памяти процесса (metrics.BufferedCounters) и раз в
+PAGE_CACHE_METRICS_FLUSH_INTERVAL секунд уходят в utils/metrics.py (см. page_cache_metrics).
+
+Счётчики фасетов в сайдбаре отфильтрованной ленты могут отставать на
+PAGE_CACHE_TIMEOUT секунд: страница сбрасывается по своему фильтру, а не по всей стране.
+"""
+import hashlib
+import logging
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.http import urlencode
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+PAGE_KEY_PREFIX = 'page_cache:'
+TAG_KEY_PREFIX = 'page_tag:'
+# Параметры, не влияющие на содержимое страницы
+IGNORED_PARAMS = {'fbclid', 'gclid', 'yclid', '_'}
+# Токен CSRF в форме у каждого посетителя свой: в кэше храним заглушку
+CSRF_PLACEHOLDER = '__page_cache_csrf_token__'
+_CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+# Порядок выбора тега ленты: чем уже фильтр, тем меньше страниц сбрасывает объявление
+FEED_TAG_FILTERS = ('brand', 'equipment_type', 'city', 'country')
+
+# view -> имя для счётчиков (заполняется декоратором)
+CACHED_VIEWS = []
+
+_counters = metrics.BufferedCounters(getattr(settings, 'PAGE_CACHE_METRICS_FLUSH_INTERVAL', 30))
+
+
+def page_cache_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 60)
+
+
+def normalized_query(request):
+    """Строка запроса без пустых и рекламных параметров, в стабильном порядке"""
+    items = []
+    for key in sorted(request.GET.keys()):
+        if key in IGNORED_PARAMS or key.startswith('utm_'):
+            continue
+        for value in sorted(request.GET.getlist(key)):
+            value = value.strip()
+            if value:
+                items.append((key, value))
+    return urlencode(items)
+
+
+def page_key(view_name, request):
+    raw = f'{request.path}?{normalized_query(request)}'
+    return f'{PAGE_KEY_PREFIX}{view_name}:{hashlib.md5(raw.encode("utf-8")).hexdigest()}'
+
+
+def add_page_tags(request, *tags):
+    """Помечает текущую страницу тегами (вызывается из view)"""
+    if not hasattr(request, '_page_cache_tags'):
+        request._page_cache_tags = set()
+    request._page_cache_tags.update(tag for tag in tags if tag)
+
+
+def set_page_meta(request, **meta):
+    """Данные, которые нужны при попадании в кэш (например, id объявления для счётчика просмотров)"""
+    request._page_cache_meta = meta
+
+
+def _tag_key(tag):
+    return TAG_KEY_PREFIX + tag
+
+
+def _current_versions(tags):
+    """Версии тегов; отсутствующие (новые или вытесненные) заводятся заново"""
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Время в мс: вытесненный тег не вернётся к старой версии
+            cache.add(key, int(time.time() * 1000), None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def tag_versions(tags):
+    """{тег: версия} одним чтением кэша (для ETag в utils/conditional.py)"""
+    tags = set(tags)
+    versions = _current_versions(tags)
+    return {tag: versions[_tag_key(tag)] for tag in tags}
+
+
+def invalidate_tags(*tags):
+    """Сбрасывает все страницы, помеченные любым из тегов"""
+    for tag in set(tags):
+        key = _tag_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+
+
+def ad_tags(ad, feed=True):
+    """Теги, которые сбрасывает изменение объявления"""
+    tags = {f'ad:{ad.pk}', f'user:{ad.user_id}'}
+    if feed:
+        tags.update(feed_tags_for_ad(ad.ad_type, ad.country, {
+            'city': ad.city_ref_id,
+            'brand': ad.brand_ref_id,
+            'equipment_type': ad.equipment_type_ref_id,
+        }))
+    return tags
+
+
+def feed_tags_for_ad(ad_type, country, refs):
+    tags = {f'feed:{ad_type}', 'home'}
+    if country:
+        tags.add(f'feed:{ad_type}:country:{country}')
+    for name, entry_id in refs.items():
+        if entry_id:
+            tags.add(f'feed:{ad_type}:{name}:{entry_id}')
+    return tags
+
+
+def feed_tags_for_filters(ad_types, params):
+    """
+    Теги ленты с фильтрами: по одному самому узкому фильтру на каждый тип.
+    Объявление с этим значением фильтра сбросит страницу, остальные — нет.
+    """
+    from .dictionaries import matching_entry_ids
+
+    for name in FEED_TAG_FILTERS:
+        value = (params.get(name) or '').strip()
+        if not value or value == 'all':
+            continue
+        if name == 'country':
+            values = [value]
+        else:
+            values = matching_entry_ids(name, value)
+            if not values:
+                # Фильтр ничего не нашёл: страницу «оживит» любое новое объявление типа
+                break
+        return {f'feed:{ad_type}:{name}:{v}' for ad_type in ad_types for v in values}
+    return {f'feed:{ad_type}' for ad_type in ad_types}
+
+
+def anonymous_page_request(request):
+    """Анонимный GET без непоказанных сообщений: страница одинакова для всех таких посетителей"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Есть непоказанные flash-сообщения — страницу собираем заново
+    if 'messages' in request.COOKIES:
+        return False
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key and session.get('_messages'):
+        return False
+    return True
+
+
+def _cacheable_response(response):
+    if response.status_code != 200 or response.streaming:
+        return False
+    # Ответ ставит свои cookie (кроме CSRF) — он персональный
+    return not any(name != settings.CSRF_COOKIE_NAME for name in response.cookies)
+
+
+def _response_from_entry(request, entry):
+    content = entry['content']
+    if CSRF_PLACEHOLDER.encode() in content:
+        # get_token также заставит CsrfViewMiddleware выставить cookie
+        content = content.replace(CSRF_PLACEHOLDER.encode(), get_token(request).encode())
+    response = HttpResponse(content, status=entry['status'], content_type=entry['content_type'])
+    response['X-Page-Cache'] = 'HIT'
+    return response
+
+
+def cache_anonymous_page(view_name, on_hit=None):
+    """
+    Декоратор view: анонимный GET отдаётся из кэша, если теги страницы не менялись.
+    on_hit(request, meta) — что нужно сделать и при попадании (счётчик просмотров).
+    """
+    CACHED_VIEWS.append(view_name)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not anonymous_page_request(request):
+                _counters.incr(f'page_cache:{view_name}:bypass')
+                return view_func(request, *args, **kwargs)
+
+            key = page_key(view_name, request)
+            entry = cache.get(key)
+            if entry is not None:
+                versions = _current_versions(entry['versions'])
+                if all(versions.get(_tag_key(tag)) == version for tag, version in entry['versions'].items()):
+                    _counters.incr(f'page_cache:{view_name}:hit')
+                    if on_hit:
+                        try:
+                            on_hit(request, entry.get('meta') or {})
+                        except Exception as e:
+                            logger.error(f"Кэш страниц ({view_name}): ошибка on_hit: {e}")
+                    return _response_from_entry(request, entry)
+
+            _counters.incr(f'page_cache:{view_name}:miss')
+            response = view_func(request, *args, **kwargs)
+            tags = getattr(request, '_page_cache_tags', None)
+            if tags and _cacheable_response(response):
+                if hasattr(response, 'render') and callable(response.render):
+                    response.render()
+                versions = _current_versions(tags)
+                content = _CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', response.content.decode(response.charset))
+                cache.set(key, {
+                    'content': content.encode(response.charset),
+                    'status': response.status_code,
+                    'content_type': response['Content-Type'],
+                    'versions': {tag: versions[_tag_key(tag)] for tag in tags},
+                    'meta': getattr(request, '_page_cache_meta', None),
+                }, page_cache_timeout())
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def page_cache_stats():
+    """{view: {'hit', 'miss', 'bypass', 'hit_ratio'}} по счётчикам этого процесса/кэша"""
+    _counters.flush()
+    names = [f'page_cache:{view}:{kind}' for view in CACHED_VIEWS for kind in ('hit', 'miss', 'bypass')]
+    values = metrics.get_values(names)
+    stats = {}
+    for view in CACHED_VIEWS:
+        hit = values[f'page_cache:{view}:hit']
+        miss = values[f'page_cache:{view}:miss']
+        stats[view] = {
+            'hit': hit,
+            'miss': miss,
+            'bypass': values[f'page_cache:{view}:bypass'],
+            'hit_ratio': round(hit / (hit + miss), 3) if hit + miss else None,
+        }
+    return stats
@@ -0,0 +1,138 @@
+"""
+Пагинация лент объявлений (каталог, запчасти, сервис)
+
+Первые MAX_NUMBERED_PAGES страниц — обычные номера (?page=N), дальше —
+keyset-пагинация по (created_at, id) с непрозрачным подписанным курсором
+(?cursor=...): WHERE (created_at, id) < (курсор) ORDER BY ... LIMIT N+1,
+поэтому глубокая страница стоит столько же, сколько первая.
+Общее число объявлений считается одним COUNT и кэшируется на
+LISTING_COUNT_CACHE_TIMEOUT секунд (приблизительное значение).
+Выдача поиска упорядочена по релевантности и листается только номерами.
+"""
+import hashlib
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+LISTING_PAGE_SIZE = 12
+# Дальше этой страницы OFFSET не используется — только курсор
+MAX_NUMBERED_PAGES = 10
+KEYSET_ORDERING = ('-created_at', '-id')
+CURSOR_SALT = 'uzmat.listing-cursor'
+
+
+def encode_cursor(ad):
+    """Непрозрачный курсор, указывающий на объявление (следующие — после него)"""
+    return signing.dumps([ad.created_at.isoformat(), ad.id], salt=CURSOR_SALT)
+
+
+def decode_cursor(token):
+    """(created_at, id) из курсора или None, если курсор битый/подделан"""
+    try:
+        created_at, ad_id = signing.loads(token, salt=CURSOR_SALT)
+        return datetime.fromisoformat(created_at), int(ad_id)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+
+
+def supports_keyset(queryset):
+    """Keyset возможен, если у queryset нет своей сортировки (например, по релевантности)"""
+    return not queryset.query.order_by
+
+
+def cached_count(queryset):
+    """COUNT(*) с кэшем по тексту SQL-запроса"""
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        # queryset.none() и фильтры, заведомо не дающие строк
+        return 0
+    key = 'listing_count:' + hashlib.md5(sql.encode('utf-8')).hexdigest()
+    total = cache.get(key)
+    if total is None:
+        total = queryset.count()
+        cache.set(key, total, getattr(settings, 'LISTING_COUNT_CACHE_TIMEOUT', 60))
+    return total
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator с заранее известным числом объектов (без повторного COUNT)"""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        # count — cached_property, подставляем готовое значение
+        self.__dict__['count'] = count
+
+
+class CursorPage:
+    """Страница keyset-пагинации; атрибуты совместимы с шаблоном пагинации"""
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        # Назад курсор не ходит: в шаблоне вместо этого «В начало»
+        return False
+
+    def has_other_pages(self):
+        return True
+
+
+def cursor_page(queryset, token, per_page=LISTING_PAGE_SIZE):
+    """Страница после курсора или None, если курсор невалиден"""
+    position = decode_cursor(token)
+    if position is None:
+        return None
+    created_at, ad_id = position
+    rows = list(
+        queryset.order_by(*KEYSET_ORDERING)
+        .filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=ad_id))[:per_page + 1]
+    )
+    ads = rows[:per_page]
+    next_cursor = encode_cursor(ads[-1]) if len(rows) > per_page else None
+    return CursorPage(ads, next_cursor)
+
+
+def paginate_listing(queryset, page_number=None, cursor=None, per_page=LISTING_PAGE_SIZE):
+    """
+    Возвращает (страница, общее число). Если передан валидный курсор — keyset-страница,
+    иначе номерная; у номерной страницы есть next_cursor для продолжения ленты.
+    """
+    total_count = cached_count(queryset)
+    keyset = supports_keyset(queryset)
+
+    if keyset and cursor:
+        page = cursor_page(queryset, cursor, per_page)
+        if page is not None:
+            return page, total_count
+
+    if keyset:
+        queryset = queryset.order_by(*KEYSET_ORDERING)
+        # Номера только до MAX_NUMBERED_PAGES, дальше листаем курсором
+        paginator = CachedCountPaginator(queryset, per_page, min(total_count, per_page * MAX_NUMBERED_PAGES))
+    else:
+        paginator = CachedCountPaginator(queryset, per_page, total_count)
+
+    page = paginator.get_page(page_number)
+    page.object_list = list(page.object_list)
+    page.is_cursor = False
+    page.next_cursor = None
+    if keyset and page.object_list and page.end_index() < total_count:
+        page.next_cursor = encode_cursor(page.object_list[-1])
+    return page, total_count
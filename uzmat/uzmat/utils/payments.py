@@ -0,0 +1,217 @@
+"""
+Платежи Click: создание, обработка webhook и просроченные платежи
+
+Состояние хранится в таблице Payment, а не в кэше: запись не вытесняется и
+одинаково видна любому воркеру. Webhook проверяет подпись до обращения к БД,
+затем находит платёж по первичному ключу (merchant_trans_id), блокирует строку
+и переводит статус created -> prepared -> completed/failed. Повтор запроса Click
+с тем же click_trans_id получает прежний ответ, оплата второй раз не применяется.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .click_payment import verify_click_signature
+
+logger = logging.getLogger(__name__)
+
+PROMOTION_DAYS = {
+    'gold': 3,
+    'premium': 14,
+    'vip': 30,
+}
+# Неоплаченный платёж через столько времени считается несостоявшимся (expire_payments)
+PAYMENT_TTL = timedelta(hours=24)
+
+ACTION_PREPARE = 0
+ACTION_COMPLETE = 1
+ACTION_CANCEL = -1
+
+
+def create_payment(user, payment_type, amount, **fields):
+    """Новый платёж в статусе created; его id передаётся в Click как merchant_trans_id"""
+    from ..models import Payment
+
+    return Payment.objects.create(user=user, payment_type=payment_type, amount=amount, **fields)
+
+
+def _error(code, note):
+    return {'error': code, 'error_note': note}
+
+
+def handle_click_webhook(data):
+    """Ответ на запрос Click (Prepare / Complete / Cancel) — словарь для JsonResponse"""
+    from ..models import Payment
+
+    merchant_trans_id = data.get('merchant_trans_id', '')
+    click_trans_id = data.get('click_trans_id', '')
+    merchant_prepare_id = data.get('merchant_prepare_id', '')
+    try:
+        action = int(data.get('action', ''))
+        amount = Decimal(data.get('amount', ''))
+    except (ValueError, TypeError, InvalidOperation):
+        return _error(-8, 'Error in request from click')
+
+    if not verify_click_signature(
+        merchant_trans_id=merchant_trans_id,
+        merchant_prepare_id=merchant_prepare_id or '',
+        amount=amount,
+        action=action,
+        sign_time=data.get('sign_time', ''),
+        sign_string=data.get('sign_string', ''),
+    ):
+        return _error(-1, 'Invalid signature')
+
+    try:
+        payment_id = int(merchant_trans_id)
+    except (ValueError, TypeError):
+        return _error(-5, 'Invalid merchant_trans_id')
+
+    if action not in (ACTION_PREPARE, ACTION_COMPLETE, ACTION_CANCEL):
+        return _error(-8, 'Action not found')
+
+    with transaction.atomic():
+        payment = Payment.objects.select_for_update().filter(pk=payment_id).first()
+        if payment is None:
+            return _error(-5, 'Invalid merchant_trans_id')
+        if action == ACTION_PREPARE:
+            result = _prepare(payment, click_trans_id, amount)
+        elif action == ACTION_COMPLETE:
+            result = _complete(payment, click_trans_id, merchant_prepare_id, amount, data.get('error'), data.get('error_note', ''))
+        else:
+            result = _cancel(payment)
+
+    if result['error'] == 0:
+        result = {'click_trans_id': click_trans_id, 'merchant_trans_id': merchant_trans_id, **result}
+    return result
+
+
+def _prepare(payment, click_trans_id, amount):
+    if payment.status == 'completed':
+        return _error(-4, 'Already paid')
+    if payment.status == 'failed':
+        return _error(-9, 'Transaction cancelled')
+    if amount != payment.amount:
+        return _error(-2, 'Invalid amount')
+
+    # Повторная попытка оплаты в Click приходит с новым click_trans_id — он заменяет прежний
+    payment.status = 'prepared'
+    payment.click_trans_id = click_trans_id or None
+    try:
+        with transaction.atomic():
+            payment.save(update_fields=['status', 'click_trans_id', 'updated_at'])
+    except IntegrityError:
+        return _error(-6, 'Transaction not found')
+    return {'merchant_prepare_id': str(payment.pk), 'error': 0, 'error_note': 'Success'}
+
+
+def _complete(payment, click_trans_id, merchant_prepare_id, amount, click_error, click_error_note):
+    if payment.status == 'completed':
+        if click_trans_id and click_trans_id == payment.click_trans_id:
+            # Повтор уже обработанного запроса
+            return {'merchant_confirm_id': str(payment.pk), 'error': 0, 'error_note': 'Success'}
+        return _error(-4, 'Already paid')
+    if payment.status == 'failed':
+        return _error(-9, 'Transaction cancelled')
+    # Complete допустим только после Prepare этой же транзакции
+    if (payment.status != 'prepared' or str(merchant_prepare_id) != str(payment.pk)
+            or (click_trans_id or None) != payment.click_trans_id):
+        return _error(-6, 'Transaction not found')
+    if amount != payment.amount:
+        logger.warning(f'Click webhook: Invalid amount. Expected: {payment.amount}, Got: {amount}, Payment ID: {payment.pk}')
+        return _error(-2, 'Invalid amount')
+
+    try:
+        click_failed = int(click_error or 0) < 0
+    except (ValueError, TypeError):
+        click_failed = False
+    if click_failed:
+        # Click сообщает, что оплата не прошла
+        payment.status = 'failed'
+        payment.error_note = (click_error_note or 'Оплата не прошла')[:255]
+        payment.save(update_fields=['status', 'error_note', 'updated_at'])
+        return _error(-9, 'Transaction cancelled')
+
+    logger.info(f'Click webhook: Processing payment complete. Payment ID: {payment.pk}, Type: {payment.payment_type}')
+    _apply(payment)
+    payment.status = 'completed'
+    payment.click_trans_id = click_trans_id or payment.click_trans_id
+    payment.completed_at = timezone.now()
+    payment.save(update_fields=['status', 'click_trans_id', 'completed_at', 'updated_at'])
+    return {'merchant_confirm_id': str(payment.pk), 'error': 0, 'error_note': 'Success'}
+
+
+def _cancel(payment):
+    if payment.status == 'completed':
+        return _error(-4, 'Already paid')
+    if payment.status != 'failed':
+        payment.status = 'failed'
+        payment.error_note = 'Отменён'
+        payment.save(update_fields=['status', 'error_note', 'updated_at'])
+    return {'error': 0, 'error_note': 'Success'}
+
+
+def _apply(payment):
+    """Что даёт оплата: продвижение объявления или заявка на верификацию"""
+    from ..models import VerificationRequest
+
+    if payment.payment_type == 'promotion':
+        ad = payment.advertisement
+        days = PROMOTION_DAYS.get(payment.plan, 0)
+        if ad is None:
+            logger.error(f'Click webhook: Advertisement not found. Payment ID: {payment.pk}')
+            return
+        if days > 0:
+            now = timezone.now()
+            ad.is_promoted = True
+            ad.promoted_at = now
+            ad.promotion_until = now + timedelta(days=days)
+            ad.promotion_plan = payment.plan
+            ad.save(update_fields=['is_promoted', 'promoted_at', 'promotion_until', 'promotion_plan'])
+            logger.info(f'Click webhook: Promotion activated. Ad ID: {ad.id}, Plan: {payment.plan}, Payment ID: {payment.pk}')
+
+    elif payment.payment_type == 'verification':
+        user = payment.user
+        v_type = payment.verification_type or 'individual'
+        VerificationRequest.objects.create(
+            user=user,
+            verification_type=v_type,
+            status='pending',
+        )
+        user.verification_type = v_type
+        user.verification_status = 'pending'
+        user.is_verified = False
+        user.verified_until = None
+        user.save(update_fields=['verification_type', 'verification_status', 'is_verified', 'verified_until'])
+        logger.info(f'Click webhook: Verification request created. User ID: {user.id}, Type: {v_type}, Payment ID: {payment.pk}')
+
+
+def payment_for_return(user, merchant_trans_id):
+    """Платёж пользователя по merchant_trans_id из ссылки возврата с Click (или None)"""
+    from ..models import Payment
+
+    try:
+        payment_id = int(merchant_trans_id)
+    except (ValueError, TypeError):
+        return None
+    return Payment.objects.filter(pk=payment_id, user=user).select_related('advertisement').first()
+
+
+def mark_result_shown(payment):
+    """True только при первом показе результата (обновление страницы сообщение не повторит)"""
+    from ..models import Payment
+
+    return bool(Payment.objects.filter(pk=payment.pk, result_shown=False).update(result_shown=True))
+
+
+def expire_stale_payments(ttl=PAYMENT_TTL):
+    """Неоплаченные за ttl платежи переводит в failed; возвращает их число"""
+    from ..models import Payment
+
+    now = timezone.now()
+    return (Payment.objects
+            .filter(status__in=['created', 'prepared'], created_at__lt=now - ttl)
+            .update(status='failed', error_note='Истёк срок оплаты', updated_at=now))
@@ -0,0 +1,305 @@
+"""
+Сохранённые поиски и уведомления о новых объявлениях
+
+Поиск хранит GET-параметры ленты (как их читает get_filtered_ads). Индексируемые
+условия — тип объявления, страна, пользователь и ссылки на справочники (город,
+марка, тип техники) — раскладываются в SavedSearchTerm (поле, значение).
+Значение, которого нет в справочнике, хранится как нормализованный текст
+(key:<normalize_key>): сохранение поиска не заводит записей справочника.
+Новое объявление превращается в такие же пары, и один запрос
+GROUP BY saved_search HAVING COUNT(DISTINCT field) = term_fields находит поиски,
+у которых совпали все условия, — работа пропорциональна подходящим поискам,
+а не всем. Цена и текст запроса проверяются уже только у кандидатов.
+Совпадения уходят сообщением в чат техподдержки и (по желанию) на email.
+"""
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.http import QueryDict
+from django.utils import timezone
+from django.utils.html import escape
+
+from .dictionaries import AD_DICTIONARY_FIELDS, matching_entry_ids, normalize_key
+
+logger = logging.getLogger(__name__)
+
+MAX_SAVED_SEARCHES_PER_USER = 20
+QUERY_MAX_LENGTH = 1000
+
+# Параметры ленты, которые имеют смысл в сохранённом поиске
+SEARCH_PARAMS = ('ad_type', 'country', 'city', 'equipment_type', 'brand', 'price_from', 'price_to', 'search', 'user')
+# Фильтры по справочникам: параметр -> поле-ссылка объявления
+DICTIONARY_PARAMS = {
+    'city': 'city_ref_id',
+    'brand': 'brand_ref_id',
+    'equipment_type': 'equipment_type_ref_id',
+}
+SECTION_AD_TYPES = {
+    'parts': ['parts'],
+    'logistics': ['service'],
+}
+
+
+def clean_query(query):
+    """Оставляет только параметры фильтров (без page/cursor и пустых значений)"""
+    params = QueryDict(query or '', mutable=True)
+    cleaned = QueryDict(mutable=True)
+    for key in SEARCH_PARAMS:
+        value = (params.get(key) or '').strip()
+        if value and value != 'all':
+            cleaned[key] = value
+    return cleaned.urlencode()[:QUERY_MAX_LENGTH]
+
+
+def section_ad_types(section, params):
+    """Типы объявлений ленты (как в _listing_ads); пустой список — лента всегда пуста"""
+    if section in SECTION_AD_TYPES:
+        return SECTION_AD_TYPES[section]
+    ad_type = params.get('ad_type')
+    if not ad_type:
+        return ['sale', 'rent']
+    return [ad_type] if ad_type in ('sale', 'rent') else []
+
+
+# Префикс значения-текста: id записей справочника — только цифры
+TEXT_TERM_PREFIX = 'key:'
+TERM_VALUE_MAX_LENGTH = 100
+
+
+def _text_term(key):
+    return f'{TEXT_TERM_PREFIX}{key}'[:TERM_VALUE_MAX_LENGTH]
+
+
+def _dictionary_values(kind, text):
+    # Как в фильтре ленты: точное совпадение или префикс. Незнакомое значение
+    # ищем по тексту — объявление с ним сравнится по normalize_key своего поля.
+    ids = matching_entry_ids(kind, text)
+    if ids:
+        return [str(entry_id) for entry_id in ids]
+    key = normalize_key(text)
+    return [_text_term(key)] if key else []
+
+
+def _ad_source_key(ad, kind):
+    """normalize_key текста, по которому объявлению назначена ссылка справочника"""
+    for field in AD_DICTIONARY_FIELDS[kind][1]:
+        value = (getattr(ad, field, '') or '').strip()
+        if value:
+            return normalize_key(value)
+    return ''
+
+
+def search_terms(section, params):
+    """Условия поиска для индекса: множество (поле, значение)"""
+    terms = {('ad_type', ad_type) for ad_type in section_ad_types(section, params)}
+    if params.get('country'):
+        terms.add(('country', params['country']))
+    if params.get('user'):
+        try:
+            terms.add(('user', str(int(params['user']))))
+        except (TypeError, ValueError):
+            pass
+    for kind in DICTIONARY_PARAMS:
+        if params.get(kind):
+            terms.update((kind, value) for value in _dictionary_values(kind, params[kind]))
+    return terms
+
+
+def ad_terms(ad):
+    """Те же пары (поле, значение) для объявления"""
+    terms = {('ad_type', ad.ad_type), ('user', str(ad.user_id))}
+    if ad.country:
+        terms.add(('country', ad.country))
+    for kind, ref_field in DICTIONARY_PARAMS.items():
+        entry_id = getattr(ad, ref_field)
+        if entry_id:
+            terms.add((kind, str(entry_id)))
+        key = _ad_source_key(ad, kind)
+        if key:
+            terms.add((kind, _text_term(key)))
+    return terms
+
+
+def describe_search(section, params):
+    """Название поиска для списка и уведомлений: «Каталог: Экскаватор, Komatsu, Ташкент»"""
+    from ..models import SavedSearch
+
+    section_label = dict(SavedSearch.SECTION_CHOICES).get(section, section)
+    parts = [params.get(key) for key in ('search', 'equipment_type', 'brand', 'city') if params.get(key)]
+    if params.get('price_from') or params.get('price_to'):
+        parts.append(f"цена {params.get('price_from') or '0'}–{params.get('price_to') or '∞'}")
+    return f"{section_label}: {', '.join(parts)}"[:200] if parts else section_label
+
+
+def index_saved_search(saved_search):
+    """Перестраивает записи индекса одного поиска"""
+    from ..models import SavedSearchTerm
+
+    params = QueryDict(saved_search.query)
+    terms = search_terms(saved_search.section, params)
+    with transaction.atomic():
+        SavedSearchTerm.objects.filter(saved_search=saved_search).delete()
+        SavedSearchTerm.objects.bulk_create([
+            SavedSearchTerm(saved_search=saved_search, field=field, value=value[:TERM_VALUE_MAX_LENGTH])
+            for field, value in terms
+        ])
+        saved_search.term_fields = len({field for field, _ in terms})
+        saved_search.save(update_fields=['term_fields'])
+    return terms
+
+
+def save_search(user, section, query, notify_email=False):
+    """
+    Сохраняет поиск пользователя (повторное сохранение того же фильтра
+    включает его обратно). Возвращает (поиск, ошибка).
+    """
+    from ..models import SavedSearch
+
+    query = clean_query(query)
+    params = QueryDict(query)
+    if not section_ad_types(section, params):
+        return None, 'По этому фильтру нет объявлений.'
+
+    saved_search = SavedSearch.objects.filter(user=user, section=section, query=query).first()
+    if saved_search is None:
+        if SavedSearch.objects.filter(user=user, is_active=True).count() >= MAX_SAVED_SEARCHES_PER_USER:
+            return None, f'Можно сохранить не больше {MAX_SAVED_SEARCHES_PER_USER} поисков.'
+        saved_search = SavedSearch.objects.create(
+            user=user,
+            section=section,
+            query=query,
+            title=describe_search(section, params),
+            notify_email=notify_email,
+        )
+    else:
+        saved_search.is_active = True
+        saved_search.notify_email = notify_email
+        saved_search.save(update_fields=['is_active', 'notify_email'])
+    index_saved_search(saved_search)
+    return saved_search, None
+
+
+def candidate_search_ids(ad):
+    """id активных поисков (чужих), у которых все индексируемые условия совпали с объявлением"""
+    from ..models import SavedSearchTerm
+
+    condition = Q()
+    for field, value in ad_terms(ad):
+        condition |= Q(field=field, value=value)
+    rows = (
+        SavedSearchTerm.objects
+        .filter(condition, saved_search__is_active=True)
+        .exclude(saved_search__user_id=ad.user_id)
+        .values('saved_search_id')
+        .annotate(matched=Count('field', distinct=True), needed=Max('saved_search__term_fields'))
+        .filter(matched=F('needed'))
+    )
+    return [row['saved_search_id'] for row in rows]
+
+
+def _decimal(value):
+    try:
+        return Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def matches_rest(params, ad):
+    """Условия, которых нет в индексе: цена и текстовый запрос"""
+    from ..models import Advertisement
+    from .search import apply_search
+    from .security import sanitize_search_query
+
+    price_from = _decimal(params.get('price_from'))
+    price_to = _decimal(params.get('price_to'))
+    if price_from is not None and (ad.price is None or ad.price < price_from):
+        return False
+    if price_to is not None and (ad.price is None or ad.price > price_to):
+        return False
+    search = sanitize_search_query(params.get('search') or '')
+    if search:
+        return apply_search(Advertisement.objects.filter(pk=ad.pk), search).exists()
+    return True
+
+
+def _support_sender():
+    from ..models import User
+
+    return User.objects.filter(is_staff=True, is_active=True).order_by('id').first()
+
+
+def _notification_text(saved_search, ad):
+    site_url = getattr(settings, 'SITE_URL', 'https://uzmat.uz').rstrip('/')
+    return (
+        f"Новое объявление по вашему поиску «{saved_search.title}»:\n"
+        f"{ad.title}\n"
+        f"{site_url}{ad.get_absolute_url()}"
+    )
+
+
+def _send_chat_notification(sender, user, text):
+    from ..models import ChatMessage, ChatThread
+
+    thread, _ = ChatThread.objects.get_or_create(
+        thread_type='support',
+        advertisement=None,
+        buyer=user,
+        seller=sender,
+        defaults={'last_message_at': timezone.now()},
+    )
+    message = ChatMessage(thread=thread, sender=sender)
+    message.set_text(text)
+    message.save()
+    thread.register_message(message)
+
+
+def _send_email_notification(user, text):
+    from .email_service import send_email_simple
+
+    if not user.email:
+        return
+    html_message = f"<html><body><p>{escape(text).replace(chr(10), '<br>')}</p></body></html>"
+    send_email_simple(user.email, 'Новое объявление по вашему поиску — Uzmat', text, html_message)
+
+
+def notify_saved_searches(ad_id):
+    """
+    Сверяет новое объявление с сохранёнными поисками и уведомляет владельцев.
+    Повторный запуск не дублирует уведомления (SavedSearchMatch). Возвращает число совпадений.
+    """
+    from ..models import Advertisement, SavedSearch, SavedSearchMatch
+
+    ad = Advertisement.objects.filter(id=ad_id, is_active=True).exclude(slug='').exclude(slug__isnull=True).first()
+    if ad is None:
+        return 0
+
+    search_ids = candidate_search_ids(ad)
+    if not search_ids:
+        return 0
+
+    sender = _support_sender()
+    matched = 0
+    for saved_search in SavedSearch.objects.filter(id__in=search_ids).select_related('user'):
+        user = saved_search.user
+        if not user.is_active or not matches_rest(QueryDict(saved_search.query), ad):
+            continue
+        text = _notification_text(saved_search, ad)
+        with transaction.atomic():
+            _, created = SavedSearchMatch.objects.get_or_create(saved_search=saved_search, advertisement=ad)
+            if not created:
+                continue
+            if saved_search.notify_chat and sender and sender.id != user.id:
+                _send_chat_notification(sender, user, text)
+            SavedSearch.objects.filter(id=saved_search.id).update(
+                matches_count=F('matches_count') + 1,
+                last_matched_at=timezone.now(),
+            )
+        matched += 1
+        if saved_search.notify_email:
+            # Письмо — после коммита и без повтора: ошибка почты не должна дублировать чат
+            _send_email_notification(user, text)
+    logger.info(f"Объявление {ad_id}: совпадений с сохранёнными поисками {matched}")
+    return matched
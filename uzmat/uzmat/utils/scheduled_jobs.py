@@ -0,0 +1,97 @@
+"""
+Плановые задачи (запускает python manage.py run_scheduler, см. utils/scheduler.py)
+
+Каждая задача — один проход по множеству строк (UPDATE / bulk_create), а не
+цикл по объектам; раньше то же самое выполнялось как побочный эффект
+просмотров главной и /chats/. Автоподнятие задач не требует — порядок ленты
+вычисляется из bump_phase (utils/bump_rank.py).
+"""
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .scheduler import scheduled_job
+
+logger = logging.getLogger(__name__)
+
+BADGE_REMIND_DAYS = 7
+
+
+@scheduled_job('expire_promotions', every=600)
+def expire_promotions():
+    """Снимает флаг продвижения с объявлений, у которых истёк срок"""
+    from ..models import Advertisement
+    from .home_feed import invalidate_home_feed
+    from .page_cache import invalidate_tags
+
+    now = timezone.now()
+    expired = Advertisement.objects.filter(is_promoted=True, promotion_until__lt=now)
+    ad_ids = list(expired.values_list('id', flat=True))
+    if not ad_ids:
+        return 'истекло: 0'
+    # Условие повторяем: между чтением и UPDATE продвижение могли продлить
+    expired_count = Advertisement.objects.filter(
+        id__in=ad_ids, is_promoted=True, promotion_until__lt=now,
+    ).update(is_promoted=False)
+    # Значок продвижения виден на странице объявления; ленты сбрасывает invalidate_home_feed
+    tags = [f'ad:{ad_id}' for ad_id in ad_ids]
+    invalidate_tags(*tags)
+    invalidate_home_feed()
+    return f'истекло: {expired_count}'
+
+
+@scheduled_job('badge_reminders', cron='0 * * * *')
+def badge_reminders():
+    """
+    Напоминание о продлении галочки за BADGE_REMIND_DAYS дней до окончания:
+    одно сообщение в чат техподдержки на каждый срок verified_until
+    """
+    from ..models import User
+    from .broadcasts import deliver_support_messages
+    from .chat_crypto import encrypt_text
+
+    support_agent = User.objects.filter(is_staff=True, is_active=True).order_by('id').first()
+    if support_agent is None:
+        return 'нет сотрудника поддержки'
+
+    now = timezone.now()
+    users = list(
+        User.objects
+        .filter(is_active=True, is_verified=True, verified_until__gte=now,
+                verified_until__lte=now + timezone.timedelta(days=BADGE_REMIND_DAYS))
+        .filter(Q(badge_expiry_notified_until__isnull=True) | ~Q(badge_expiry_notified_until=F('verified_until')))
+        .exclude(id=support_agent.id)
+        .values_list('id', 'verified_until')
+    )
+    if not users:
+        return 'напоминаний: 0'
+
+    # Текст зависит только от даты окончания — шифруем по разу на дату
+    by_date = defaultdict(list)
+    for user_id, verified_until in users:
+        by_date[timezone.localdate(verified_until)].append(user_id)
+
+    renew_url = reverse('uzmat:verify_renew')
+    with transaction.atomic():
+        for expires_on, user_ids in by_date.items():
+            text = f"Срок действия галочки истекает {expires_on.strftime('%d.%m.%Y')}. Продлите её, чтобы она не пропала."
+            deliver_support_messages(
+                support_agent.id, user_ids, encrypt_text(text), now,
+                system_action='renew_badge', system_url=renew_url,
+            )
+        User.objects.filter(id__in=[user_id for user_id, _ in users]).update(
+            badge_expiry_notified_until=F('verified_until'),
+        )
+    return f'напоминаний: {len(users)}'
+
+
+@scheduled_job('expire_payments', every=3600)
+def expire_payments():
+    """Неоплаченные платежи старше PAYMENT_TTL -> failed (как manage.py expire_payments)"""
+    from .payments import expire_stale_payments
+
+    return f'просрочено платежей: {expire_stale_payments()}'
@@ -0,0 +1,222 @@
+"""
+Планировщик периодических задач (без cron на хосте и без Celery beat)
+
+Задачи регистрируются декоратором @scheduled_job с интервалом (every=секунды)
+или cron-выражением из пяти полей (минута час день месяц день_недели, время —
+TIME_ZONE проекта). Время следующего запуска хранится в строке ScheduledJob;
+узел забирает задачу одним условным UPDATE (срок наступил и строка не занята),
+поэтому при нескольких запущенных run_scheduler каждый запуск выполняет
+ровно один из них. Аренда (lease) снимает блокировку с упавшего процесса.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.db import IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Реестр задач: имя -> Job
+JOB_REGISTRY = {}
+
+DEFAULT_LEASE = 600  # секунд
+
+
+class CronSpec:
+    """Cron-выражение: '*', числа, списки через запятую, диапазоны a-b и шаг */n"""
+    RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Cron-выражение должно содержать 5 полей: {expression!r}')
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        # Как в cron: если заданы и день месяца, и день недели — подходит любой из них
+        self._any_day = fields[2] == '*' or fields[4] == '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step = part.split('/', 1)
+                step = int(step)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(x) for x in part.split('-', 1))
+            else:
+                start = end = int(part)
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f'Недопустимое значение cron-поля: {field!r}')
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        # В cron воскресенье — 0, у Python — 6
+        weekday = (moment.weekday() + 1) % 7
+        if self._any_day:
+            return moment.day in self.days and weekday in self.weekdays
+        return moment.day in self.days or weekday in self.weekdays
+
+    def next_after(self, moment):
+        """Ближайшее подходящее время строго после moment"""
+        local = timezone.localtime(moment).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = local + timedelta(days=366 * 4)
+        while local < limit:
+            if local.month not in self.months or not self._day_matches(local):
+                local = (local + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if local.hour not in self.hours:
+                local = (local + timedelta(hours=1)).replace(minute=0)
+                continue
+            if local.minute not in self.minutes:
+                local += timedelta(minutes=1)
+                continue
+            # Нормализуем смещение (переходы на летнее время)
+            return timezone.localtime(local)
+        raise ValueError(f'Cron-выражение никогда не срабатывает: {self.expression!r}')
+
+
+class Job:
+    def __init__(self, name, func, every=None, cron=None, lease=DEFAULT_LEASE):
+        self.name = name
+        self.func = func
+        self.every = every
+        self.cron = CronSpec(cron) if cron else None
+        self.lease = lease
+
+    def next_run(self, after):
+        if self.cron is not None:
+            return self.cron.next_after(after)
+        return after + timedelta(seconds=self.every)
+
+    @property
+    def schedule(self):
+        return self.cron.expression if self.cron is not None else f'каждые {self.every} с'
+
+
+def scheduled_job(name, every=None, cron=None, lease=DEFAULT_LEASE):
+    """
+    Декоратор регистрирует функцию как плановую задачу.
+    every — интервал в секундах, cron — cron-выражение (ровно одно из двух).
+    Возвращаемое значение функции записывается в ScheduledJob.last_result.
+    """
+    if (every is None) == (cron is None):
+        raise ValueError('Укажите ровно одно из every / cron')
+
+    def decorator(func):
+        JOB_REGISTRY[name] = Job(name, func, every=every, cron=cron, lease=lease)
+        func.job_name = name
+        return func
+    return decorator
+
+
+def load_jobs():
+    # Задачи регистрируются при импорте модуля, где они объявлены
+    from . import scheduled_jobs  # noqa: F401
+    return JOB_REGISTRY
+
+
+def _worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'[:100]
+
+
+def _ensure_rows(jobs, now):
+    """Строки для новых задач; первый запуск — по расписанию (интервальные — сразу)"""
+    from ..models import ScheduledJob
+
+    known = set(ScheduledJob.objects.filter(name__in=jobs).values_list('name', flat=True))
+    for name in jobs:
+        if name in known:
+            continue
+        job = JOB_REGISTRY[name]
+        first_run = job.cron.next_after(now) if job.cron is not None else now
+        try:
+            ScheduledJob.objects.create(name=name, next_run_at=first_run)
+        except IntegrityError:
+            # Строку только что создал другой узел
+            pass
+
+
+def _claim(job, now):
+    """Атомарно занимает задачу, если срок наступил. True, если удалось."""
+    from ..models import ScheduledJob
+
+    return ScheduledJob.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        name=job.name,
+        next_run_at__lte=now,
+    ).update(
+        locked_until=now + timedelta(seconds=job.lease),
+        locked_by=_worker_id(),
+        last_started_at=now,
+    ) == 1
+
+
+def run_job(job, now=None):
+    """Выполняет задачу, если её удалось занять. Возвращает True, если выполнялась."""
+    from ..models import ScheduledJob
+
+    now = now or timezone.now()
+    if not _claim(job, now):
+        return False
+
+    result, error = '', ''
+    try:
+        result = job.func()
+    except Exception as e:
+        error = str(e)[:2000]
+        logger.error(f"Плановая задача {job.name} упала: {e}", exc_info=True)
+
+    finished = timezone.now()
+    # Следующий запуск — от момента старта: длительность задачи не сдвигает расписание
+    next_run_at = job.next_run(now)
+    if next_run_at <= finished:
+        next_run_at = job.next_run(finished)
+    ScheduledJob.objects.filter(name=job.name, locked_by=_worker_id()).update(
+        next_run_at=next_run_at,
+        locked_until=None,
+        locked_by='',
+        last_finished_at=finished,
+        last_result='' if result is None else str(result)[:255],
+        last_error=error,
+    )
+    if not error:
+        logger.info(f"Плановая задача {job.name}: {result}")
+    return True
+
+
+def run_due_jobs(names=None):
+    """Выполняет задачи, срок которых наступил. Возвращает имена выполненных."""
+    from ..models import ScheduledJob
+
+    jobs = load_jobs()
+    names = [name for name in (names or jobs) if name in jobs]
+    now = timezone.now()
+    _ensure_rows(names, now)
+    due = ScheduledJob.objects.filter(name__in=names, next_run_at__lte=now).values_list('name', flat=True)
+    return [name for name in sorted(due) if run_job(jobs[name])]
+
+
+def seconds_until_next(names=None, maximum=60):
+    """Сколько можно спать до ближайшей задачи (не больше maximum)"""
+    from ..models import ScheduledJob
+
+    jobs = load_jobs()
+    names = [name for name in (names or jobs) if name in jobs]
+    next_run_at = (ScheduledJob.objects
+                   .filter(name__in=names)
+                   .order_by('next_run_at')
+                   .values_list('next_run_at', flat=True)
+                   .first())
+    if next_run_at is None:
+        return 1.0
+    return max(1.0, min(maximum, (next_run_at - timezone.now()).total_seconds()))
@@ -0,0 +1,192 @@
+"""
+Полнотекстовый поиск по объявлениям через собственный инвертированный индекс.
+
+Каждое объявление раскладывается на нормализованные основы слов (язык
+определяется по каждому слову, см. utils/stemmers.py), которые хранятся в
+таблице AdSearchTerm. Поиск выполняется по индексу (term, advertisement) вместо
+полного сканирования таблицы через icontains.
+После изменения правил стемминга: python manage.py rebuild_search_index
+"""
+import re
+import logging
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum, Value, IntegerField, Q
+from django.db.models.functions import Coalesce
+
+from .stemmers import stem_word
+
+logger = logging.getLogger(__name__)
+
+
+# Поля объявления и их вес в ранжировании
+INDEXED_FIELDS = {
+    'title': 5,
+    'brand': 3,
+    'model': 3,
+    'equipment_type': 3,
+    'service_name': 3,
+    'part_name': 3,
+    'part_brand': 3,
+    'part_model': 2,
+    'part_equipment_type': 2,
+    'description': 1,
+}
+
+MAX_TERMS_PER_AD = 300
+MAX_QUERY_TERMS = 8
+MAX_TERM_LENGTH = 64
+
+STOP_WORDS = {
+    # Русский
+    'и', 'в', 'во', 'на', 'с', 'со', 'по', 'для', 'от', 'до', 'из', 'за', 'к', 'ко',
+    'о', 'об', 'у', 'не', 'а', 'но', 'или', 'что', 'как', 'это', 'при', 'без',
+    # Узбекский
+    'va', 'bilan', 'uchun', 'ham', 'бу', 'ва', 'билан', 'учун', 'ҳам',
+    # Казахский
+    'және', 'мен', 'үшін', 'бен', 'пен',
+}
+
+_APOSTROPHES_RE = re.compile(r"[ʻʼ’‘`']")
+_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def normalize_text(text):
+    """Приводит текст к нижнему регистру и унифицирует варианты букв"""
+    text = (text or '').lower().replace('ё', 'е')
+    # Узбекская латиница: o‘zbek / g'ildirak -> ozbek / gildirak
+    return _APOSTROPHES_RE.sub('', text)
+
+
+def stem(word):
+    """Основа слова по правилам его языка (utils/stemmers.py)"""
+    if any(ch.isdigit() for ch in word):
+        # Модели техники (PC200, 320D) не стеммим
+        return word
+    return stem_word(word)
+
+
+def tokenize(text):
+    """Разбивает текст на основы слов (без стоп-слов)"""
+    terms = []
+    for token in _TOKEN_RE.findall(normalize_text(text)):
+        if len(token) < 2 or token in STOP_WORDS:
+            continue
+        terms.append(stem(token)[:MAX_TERM_LENGTH])
+    return terms
+
+
+def build_terms(advertisement):
+    """
+    Возвращает словарь {основа: вес} для объявления
+    """
+    weights = {}
+    for field, field_weight in INDEXED_FIELDS.items():
+        value = getattr(advertisement, field, None)
+        if not value:
+            continue
+        for term in tokenize(value):
+            weights[term] = weights.get(term, 0) + field_weight
+    if len(weights) > MAX_TERMS_PER_AD:
+        # Оставляем самые значимые основы
+        top = sorted(weights.items(), key=lambda item: item[1], reverse=True)[:MAX_TERMS_PER_AD]
+        weights = dict(top)
+    return weights
+
+
+def index_advertisement(advertisement):
+    """
+    Перестраивает записи индекса для одного объявления (2 запроса)
+    """
+    from ..models import AdSearchTerm
+
+    terms = build_terms(advertisement)
+    with transaction.atomic():
+        AdSearchTerm.objects.filter(advertisement_id=advertisement.pk).delete()
+        AdSearchTerm.objects.bulk_create([
+            AdSearchTerm(advertisement_id=advertisement.pk, term=term, weight=min(weight, 32000))
+            for term, weight in terms.items()
+        ])
+
+
+def should_reindex(update_fields):
+    """Нужно ли переиндексировать объявление при save(update_fields=...)"""
+    if not update_fields:
+        return True
+    return bool(set(update_fields) & set(INDEXED_FIELDS))
+
+
+def parse_query(query):
+    """Основы слов поискового запроса (без дублей, с ограничением длины)"""
+    terms = []
+    for term in tokenize(query):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def _term_condition(term, is_last):
+    # Последнее слово запроса ищем по префиксу: пользователь мог не дописать его
+    if is_last:
+        return Q(term__startswith=term)
+    return Q(term=term)
+
+
+def apply_search(queryset, query):
+    """
+    Фильтрует queryset объявлений по запросу и добавляет аннотацию search_rank.
+
+    Все слова запроса обязательны (AND); каждое условие — отдельный подзапрос
+    по индексу (term, advertisement), поэтому стоимость зависит от числа
+    совпадений, а не от размера таблицы объявлений.
+    """
+    from ..models import AdSearchTerm
+
+    terms = parse_query(query)
+    if not terms:
+        return queryset
+
+    any_term = Q()
+    for position, term in enumerate(terms):
+        condition = _term_condition(term, position == len(terms) - 1)
+        any_term |= condition
+        queryset = queryset.filter(
+            id__in=AdSearchTerm.objects.filter(condition).values('advertisement_id')
+        )
+
+    rank = (AdSearchTerm.objects
+            .filter(any_term, advertisement_id=OuterRef('pk'))
+            .order_by()
+            .values('advertisement_id')
+            .annotate(total=Sum('weight'))
+            .values('total')[:1])
+    return (queryset
+            .annotate(search_rank=Coalesce(Subquery(rank, output_field=IntegerField()), Value(0)))
+            .order_by('-search_rank', '-created_at'))
+
+
+def rebuild_index(ad_model, term_model, batch_size=500, stdout=None):
+    """
+    Полная перестройка индекса пачками (management-команда и миграция 0023).
+    Каждая пачка заменяется в своей транзакции, поэтому поиск работает и во
+    время перестройки.
+    """
+    fields = ['id'] + list(INDEXED_FIELDS)
+    last_id = 0
+    total = 0
+    while True:
+        batch = list(ad_model.objects.filter(id__gt=last_id).order_by('id').only(*fields)[:batch_size])
+        if not batch:
+            break
+        rows = []
+        for ad in batch:
+            for term, weight in build_terms(ad).items():
+                rows.append(term_model(advertisement_id=ad.pk, term=term, weight=min(weight, 32000)))
+        with transaction.atomic():
+            term_model.objects.filter(advertisement_id__in=[ad.pk for ad in batch]).delete()
+            term_model.objects.bulk_create(rows, batch_size=2000)
+        last_id = batch[-1].id
+        total += len(batch)
+        if stdout:
+            stdout.write(f'Проиндексировано объявлений: {total}')
+    return total
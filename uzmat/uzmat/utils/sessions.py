@@ -0,0 +1,146 @@
+"""
+Хранилище сессий (SESSION_ENGINE = 'uzmat.utils.sessions'): кэш + БД без
+записи строки django_session на каждый запрос
+
+При SESSION_SAVE_EVERY_REQUEST Django сохраняет сессию после каждого ответа
+ради продления срока. Здесь сохранение пропускается, если данные сессии не
+изменились, а срок продлевается не чаще раза в SESSION_REFRESH_INTERVAL секунд
+(когда до истечения остаётся меньше SESSION_COOKIE_AGE - интервал).
+Изменённые данные пишутся в БД сразу: БД остаётся источником истины, и
+вытесненная из кэша сессия не теряет вход.
+
+Кэш держит сессию не дольше SESSION_CACHE_TIMEOUT секунд.
+Счётчики записей и пропусков копятся в памяти процесса и уходят в
+utils/metrics.py раз в SESSION_METRICS_FLUSH_INTERVAL секунд (см. session_stats).
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache import cache
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'uzmat.sessions.'
+# Время последнего сохранения в БД (хранится в самой сессии)
+REFRESHED_KEY = '_session_refreshed_at'
+METRIC_NAMES = ('sessions:write', 'sessions:skip')
+SINCE_KEY = 'sessions:since'
+
+_counters = metrics.BufferedCounters(getattr(settings, 'SESSION_METRICS_FLUSH_INTERVAL', 30))
+_since_marked = False
+
+
+def refresh_interval():
+    return getattr(settings, 'SESSION_REFRESH_INTERVAL', 24 * 60 * 60)
+
+
+def cache_timeout():
+    return getattr(settings, 'SESSION_CACHE_TIMEOUT', 60)
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded_payload = None
+
+    def _payload(self, data):
+        """Данные сессии без служебной отметки — для сравнения «изменилось ли»"""
+        return self.serializer().dumps({k: v for k, v in data.items() if k != REFRESHED_KEY})
+
+    def _cache_timeout(self, expiry=None):
+        return max(0, min(self.get_expiry_age(expiry=expiry), cache_timeout()))
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            # Как в cached_db: некорректный ключ для кэша — сессия заново
+            data = None
+
+        if data is None:
+            s = self._get_session_from_db()
+            if s:
+                data = self.decode(s.session_data)
+                self._cache.set(self.cache_key, data, self._cache_timeout(expiry=s.expire_date))
+            else:
+                data = {}
+        self._loaded_payload = self._payload(data)
+        return data
+
+    async def aload(self):
+        try:
+            data = await self._cache.aget(await self.acache_key())
+        except Exception:
+            data = None
+
+        if data is None:
+            s = await self._aget_session_from_db()
+            if s:
+                data = self.decode(s.session_data)
+                await self._cache.aset(await self.acache_key(), data, self._cache_timeout(expiry=s.expire_date))
+            else:
+                data = {}
+        self._loaded_payload = self._payload(data)
+        return data
+
+    def _needs_write(self, must_create):
+        if must_create or self._loaded_payload is None:
+            return True
+        if self._payload(self._session) != self._loaded_payload:
+            return True
+        refreshed_at = self._session.get(REFRESHED_KEY) or 0
+        return time.time() - refreshed_at >= refresh_interval()
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            # create() подберёт ключ и вызовет save(must_create=True)
+            return self.create()
+        if not self._needs_write(must_create):
+            _count('sessions:skip')
+            return
+        # Отметку кладём напрямую в словарь: через __setitem__ сессия стала бы «изменённой»
+        self._session[REFRESHED_KEY] = int(time.time())
+        super(CachedDBStore, self).save(must_create)
+        try:
+            self._cache.set(self.cache_key, self._session, self._cache_timeout())
+        except Exception:
+            logger.exception("Ошибка записи сессии в кэш")
+        self._loaded_payload = self._payload(self._session)
+        _count('sessions:write')
+
+
+def _count(name):
+    if _counters.incr(name):
+        _mark_since()
+
+
+def _mark_since():
+    # Начало отсчёта ставит первый сброс счётчиков после запуска (один раз на процесс)
+    global _since_marked
+    if not _since_marked:
+        _since_marked = True
+        cache.add(metrics.METRICS_PREFIX + SINCE_KEY, time.time(), None)
+
+
+def session_stats():
+    """Записи сессий в БД и пропуски с первого сохранения после запуска"""
+    _counters.flush()
+    _mark_since()
+    since = cache.get(metrics.METRICS_PREFIX + SINCE_KEY) or time.time()
+    values = metrics.get_values(METRIC_NAMES)
+    elapsed = max(time.time() - since, 1)
+    writes, skips = values['sessions:write'], values['sessions:skip']
+    return {
+        'writes': writes,
+        'skipped': skips,
+        'seconds': int(elapsed),
+        'writes_per_second': round(writes / elapsed, 3),
+        'skip_ratio': round(skips / (writes + skips), 3) if writes + skips else None,
+    }
+
@@ -0,0 +1,340 @@
+"""
+Похожие объявления для страницы объявления
+
+Офлайн-индекс: каждое объявление — хешированный вектор признаков (основы слов
+заголовка и описания, марка, модель, город, страна, диапазон цены и года)
+с весами TF-IDF, нормированный по L2. Соседи ищутся косинусной близостью
+(матричное умножение NumPy пачками) внутри блока «тип объявления + тип техники»,
+лучшие NEIGHBOURS сохраняются в SimilarAd. Страница объявления читает их одним запросом.
+
+Сборка: python manage.py build_similar_ads — инкрементально (новые и изменённые
+объявления), --full — всё заново, --benchmark N — замер на синтетических данных.
+"""
+import logging
+import math
+import random
+import time
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from .dictionaries import normalize_key
+from .search import MAX_TERM_LENGTH, STOP_WORDS, _TOKEN_RE, normalize_text, stem
+
+logger = logging.getLogger(__name__)
+
+NEIGHBOURS = 8
+HASH_DIM = 1024
+BATCH_SIZE = 512
+MIN_SCORE = 0.05
+DESCRIPTION_CHARS = 1000
+
+# Веса признаков (слова заголовка/описания — за каждое вхождение)
+TITLE_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+BRAND_WEIGHT = 4.0
+MODEL_WEIGHT = 4.0
+CITY_WEIGHT = 1.5
+COUNTRY_WEIGHT = 1.0
+PRICE_WEIGHT = 2.0
+YEAR_WEIGHT = 2.0
+# Шаг диапазона цены: соседние диапазоны отличаются в 1.5 раза
+PRICE_STEP = math.log(1.5)
+YEAR_STEP = 3
+
+ROW_FIELDS = (
+    'id', 'user_id', 'ad_type', 'title', 'country', 'city_ref_id', 'city',
+    'brand_ref_id', 'equipment_type_ref_id', 'model', 'part_model', 'price_usd', 'year',
+)
+
+
+# Основы слов повторяются из объявления в объявление — стеммим каждое слово один раз
+_cached_stem = lru_cache(maxsize=200000)(stem)
+
+
+def _terms(text):
+    """Как search.tokenize, но с кэшем основ (векторизация — самая долгая часть сборки)"""
+    for token in _TOKEN_RE.findall(normalize_text(text)):
+        if len(token) >= 2 and token not in STOP_WORDS:
+            yield _cached_stem(token)[:MAX_TERM_LENGTH]
+
+
+def _add(features, token, weight):
+    features[token] = features.get(token, 0.0) + weight
+
+
+def _add_range(features, prefix, bucket, weight):
+    # Соседний диапазон тоже немного похож: 9 000 и 11 000 $ не должны быть «чужими»
+    _add(features, f'{prefix}:{bucket}', weight)
+    _add(features, f'{prefix}:{bucket - 1}', weight / 2)
+    _add(features, f'{prefix}:{bucket + 1}', weight / 2)
+
+
+def ad_features(row):
+    """Признаки объявления {токен: вес} по строке ROW_FIELDS (+ description)"""
+    features = {}
+    for term in _terms(row.get('title')):
+        _add(features, f'w:{term}', TITLE_WEIGHT)
+    for term in _terms(row.get('description')):
+        _add(features, f'w:{term}', DESCRIPTION_WEIGHT)
+    if row.get('brand_ref_id'):
+        _add(features, f"brand:{row['brand_ref_id']}", BRAND_WEIGHT)
+    model = normalize_key(row.get('model') or row.get('part_model'))
+    if model:
+        _add(features, f'model:{model}', MODEL_WEIGHT)
+    city = row.get('city_ref_id') or normalize_key(row.get('city'))
+    if city:
+        _add(features, f'city:{city}', CITY_WEIGHT)
+    if row.get('country'):
+        _add(features, f"country:{row['country']}", COUNTRY_WEIGHT)
+    price = row.get('price_usd')
+    if price and price > 0:
+        _add_range(features, 'price', int(math.log(float(price)) / PRICE_STEP), PRICE_WEIGHT)
+    if row.get('year'):
+        _add_range(features, 'year', int(row['year']) // YEAR_STEP, YEAR_WEIGHT)
+    return features
+
+
+@lru_cache(maxsize=200000)
+def _hash_index(token):
+    # crc32, а не hash(): индекс должен совпадать между процессами и запусками
+    return zlib.crc32(token.encode('utf-8')) % HASH_DIM
+
+
+def vectorize(rows):
+    """Матрица (объявления x HASH_DIM) с весами TF-IDF, строки нормированы по L2"""
+    matrix = np.zeros((len(rows), HASH_DIM), dtype=np.float32)
+    if not rows:
+        return matrix
+    row_index, columns, weights = [], [], []
+    for i, row in enumerate(rows):
+        features = ad_features(row)
+        row_index.extend([i] * len(features))
+        columns.extend(_hash_index(token) for token in features)
+        weights.extend(features.values())
+    # Одна векторная операция вместо поэлементной записи (коллизии хешей складываются)
+    np.add.at(matrix, (np.asarray(row_index), np.asarray(columns)), np.asarray(weights, dtype=np.float32))
+    df = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1 + len(rows)) / (1 + df)).astype(np.float32) + 1
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    matrix /= norms
+    return matrix
+
+
+def top_neighbours(matrix, user_ids, query_rows, k=NEIGHBOURS):
+    """
+    Для строк query_rows — список [(строка соседа, близость), ...] по убыванию.
+    Объявления того же продавца (и само объявление) не рекомендуются.
+    """
+    result = {}
+    n = matrix.shape[0]
+    if n < 2:
+        return {row: [] for row in query_rows}
+    kk = min(k, n)
+    for start in range(0, len(query_rows), BATCH_SIZE):
+        batch = np.asarray(query_rows[start:start + BATCH_SIZE])
+        scores = matrix[batch] @ matrix.T
+        scores[user_ids[batch][:, None] == user_ids[None, :]] = -1.0
+        top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        for i, row in enumerate(batch.tolist()):
+            result[row] = [
+                (int(top[i, j]), float(top_scores[i, j]))
+                for j in order[i]
+                if top_scores[i, j] >= MIN_SCORE
+            ]
+    return result
+
+
+def block_key(row):
+    """Соседей ищем среди объявлений того же типа и того же типа техники"""
+    return row['ad_type'], row.get('equipment_type_ref_id') or 0
+
+
+def neighbours_for_block(rows, query_ids=None):
+    """{id объявления: [(id соседа, близость), ...]} для query_ids (по умолчанию — все)"""
+    if not rows:
+        return {}
+    matrix = vectorize(rows)
+    user_ids = np.asarray([row['user_id'] or 0 for row in rows])
+    ids = [row['id'] for row in rows]
+    position = {ad_id: i for i, ad_id in enumerate(ids)}
+    wanted = ids if query_ids is None else [ad_id for ad_id in query_ids if ad_id in position]
+    found = top_neighbours(matrix, user_ids, [position[ad_id] for ad_id in wanted])
+    return {ids[row]: [(ids[j], score) for j, score in pairs] for row, pairs in found.items()}
+
+
+def _active(queryset):
+    return queryset.filter(is_active=True).exclude(slug='').exclude(slug__isnull=True)
+
+
+def _block_rows(queryset):
+    rows = list(
+        _active(queryset)
+        .annotate(description_head=Substr('description', 1, DESCRIPTION_CHARS))
+        .order_by('id')
+        .values(*ROW_FIELDS, 'description_head')
+    )
+    for row in rows:
+        row['description'] = row.pop('description_head')
+    return rows
+
+
+def _replace_neighbours(neighbours):
+    """Перезаписывает списки соседей у объявлений из neighbours"""
+    from ..models import SimilarAd
+
+    with transaction.atomic():
+        SimilarAd.objects.filter(advertisement_id__in=list(neighbours)).delete()
+        SimilarAd.objects.bulk_create([
+            SimilarAd(advertisement_id=ad_id, similar_id=similar_id, score=score)
+            for ad_id, pairs in neighbours.items()
+            for similar_id, score in pairs
+        ], batch_size=2000)
+
+
+def _merge_reverse(neighbours):
+    """
+    Новое/изменённое объявление попадает и в списки своих соседей, если оно
+    ближе их текущего худшего соседа (иначе старые объявления его не «увидят»
+    до полной пересборки)
+    """
+    from ..models import SimilarAd
+
+    incoming = defaultdict(dict)
+    for ad_id, pairs in neighbours.items():
+        for similar_id, score in pairs:
+            if similar_id not in neighbours:
+                incoming[similar_id][ad_id] = score
+    if not incoming:
+        return 0
+
+    current = defaultdict(dict)
+    rows = SimilarAd.objects.filter(advertisement_id__in=list(incoming)).values_list('advertisement_id', 'similar_id', 'score')
+    for ad_id, similar_id, score in rows:
+        current[ad_id][similar_id] = score
+
+    changed = {}
+    for ad_id, candidates in incoming.items():
+        merged = dict(current[ad_id])
+        merged.update(candidates)
+        best = sorted(merged.items(), key=lambda item: -item[1])[:NEIGHBOURS]
+        if dict(best) != current[ad_id]:
+            changed[ad_id] = best
+    if changed:
+        _replace_neighbours(changed)
+    return len(changed)
+
+
+def build_similar_ads(full=False, stdout=None):
+    """
+    Пересчитывает соседей. full=False — только объявления, созданные или
+    изменённые после прошлого расчёта (similar_indexed_at). Возвращает число пересчитанных.
+    """
+    from ..models import Advertisement, SimilarAd
+
+    started_at = timezone.now()
+    ads = Advertisement.objects.all()
+    targets = _active(ads)
+    changed_ids = None
+    if not full:
+        targets = targets.filter(Q(similar_indexed_at__isnull=True) | Q(updated_at__gt=F('similar_indexed_at')))
+        changed_ids = set(targets.values_list('id', flat=True))
+        if not changed_ids:
+            return 0
+        targets = targets.filter(id__in=changed_ids)
+    blocks = {
+        (ad_type, equipment_type_ref_id or 0)
+        for ad_type, equipment_type_ref_id in targets.values_list('ad_type', 'equipment_type_ref_id').distinct()
+    }
+
+    # Блоки обрабатываем по одному: в памяти только матрица текущего блока
+    processed = 0
+    for ad_type, equipment_type_ref_id in sorted(blocks):
+        block = ads.filter(ad_type=ad_type)
+        if equipment_type_ref_id:
+            block = block.filter(equipment_type_ref_id=equipment_type_ref_id)
+        else:
+            block = block.filter(equipment_type_ref__isnull=True)
+        rows = _block_rows(block)
+        block_started = time.monotonic()
+        query_ids = None if changed_ids is None else [row['id'] for row in rows if row['id'] in changed_ids]
+        neighbours = neighbours_for_block(rows, query_ids)
+        _replace_neighbours(neighbours)
+        if changed_ids is not None:
+            _merge_reverse(neighbours)
+        processed += len(neighbours)
+        if stdout:
+            stdout.write(
+                f'Блок {ad_type}/{equipment_type_ref_id or "-"}: объявлений {len(rows)}, '
+                f'пересчитано {len(neighbours)} за {time.monotonic() - block_started:.2f} с'
+            )
+
+    # update(), а не save(): не трогаем updated_at и сигналы
+    targets.update(similar_indexed_at=started_at)
+    if full:
+        SimilarAd.objects.filter(advertisement__is_active=False).delete()
+    return processed
+
+
+def synthetic_rows(count, seed=42):
+    """Синтетические объявления для замера скорости (без БД)"""
+    rng = random.Random(seed)
+    syllables = ['ка', 'то', 'ре', 'ми', 'ло', 'ску', 'вар', 'на', 'ги', 'дро', 'пет', 'сон']
+    vocabulary = list({''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(5000)})
+    models = [f'M{i}' for i in range(400)]
+    rows = []
+    for i in range(count):
+        rows.append({
+            'id': i + 1,
+            'user_id': rng.randint(1, max(1, count // 5)),
+            'ad_type': rng.choice(('sale', 'rent', 'parts', 'service')),
+            'equipment_type_ref_id': rng.randint(1, 13),
+            'brand_ref_id': rng.randint(1, 40),
+            'model': rng.choice(models),
+            'part_model': None,
+            'city_ref_id': rng.randint(1, 30),
+            'city': '',
+            'country': rng.choice(('uz', 'kz', 'ru')),
+            'price_usd': round(rng.lognormvariate(9, 1.2), 2),
+            'year': rng.randint(1995, 2025),
+            'title': ' '.join(rng.choices(vocabulary[:300], k=5)),
+            'description': ' '.join(rng.choices(vocabulary, k=60)),
+        })
+    return rows
+
+
+def benchmark(count=100000, stdout=None):
+    """Замер полной сборки на count синтетических объявлениях. Возвращает секунды."""
+    rows = synthetic_rows(count)
+    blocks = defaultdict(list)
+    for row in rows:
+        blocks[block_key(row)].append(row)
+
+    started = time.monotonic()
+    vectorize_time = 0.0
+    pairs = 0
+    for block_rows in blocks.values():
+        t = time.monotonic()
+        matrix = vectorize(block_rows)
+        vectorize_time += time.monotonic() - t
+        user_ids = np.asarray([row['user_id'] for row in block_rows])
+        found = top_neighbours(matrix, user_ids, list(range(len(block_rows))))
+        pairs += sum(len(items) for items in found.values())
+    total = time.monotonic() - started
+    if stdout:
+        stdout.write(
+            f'Объявлений: {count}, блоков: {len(blocks)}, пар соседей: {pairs}\n'
+            f'Векторизация: {vectorize_time:.1f} с, поиск соседей: {total - vectorize_time:.1f} с, '
+            f'всего: {total:.1f} с ({total / count * 1000:.2f} мс на объявление)'
+        )
+    return total
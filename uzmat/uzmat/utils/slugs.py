@@ -0,0 +1,98 @@
+"""
+URL объявлений (slug): транслитерация кириллицы и уникальность одним запросом
+
+slugify() отбрасывает кириллицу, поэтому русские, узбекские и казахские
+заголовки сначала переводятся в латиницу. К основе добавляется короткий
+суффикс (base36 от id или хэш для ещё не сохранённого объявления), так что
+совпадения почти исключены; оставшиеся разрешаются одним запросом по префиксу
+вместо перебора -1, -2, ... по запросу на каждый номер.
+"""
+import hashlib
+import time
+
+from django.utils.text import slugify
+
+# Максимальная длина основы (SlugField объявления — 200 символов)
+MAX_BASE_LENGTH = 60
+
+TRANSLIT = {
+    # Русский
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    # Узбекский
+    'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+    # Казахский
+    'ә': 'a', 'ң': 'ng', 'ө': 'o', 'ұ': 'u', 'ү': 'u', 'һ': 'h', 'і': 'i',
+}
+_TRANSLIT_TABLE = str.maketrans({
+    **TRANSLIT,
+    **{k.upper(): v.capitalize() for k, v in TRANSLIT.items()},
+})
+
+_BASE36 = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def transliterate(text):
+    return (text or '').translate(_TRANSLIT_TABLE)
+
+
+def base36(number):
+    digits = ''
+    while True:
+        number, rest = divmod(number, 36)
+        digits = _BASE36[rest] + digits
+        if not number:
+            return digits
+
+
+def slug_base(title, ad_type=''):
+    """Основа slug: транслитерированный заголовок, обрезанный по границе слова"""
+    base = slugify(transliterate(title))
+    if len(base) > MAX_BASE_LENGTH:
+        base = base[:MAX_BASE_LENGTH].rsplit('-', 1)[0] or base[:MAX_BASE_LENGTH]
+    return base or f'ad-{ad_type or "item"}'
+
+
+def slug_suffix(ad):
+    """Короткий суффикс: от id, а для нового объявления — хэш заголовка, автора и времени"""
+    if ad.pk:
+        return base36(ad.pk)
+    raw = f'{ad.title}|{ad.user_id}|{time.time_ns()}'
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=4).hexdigest()[:6]
+
+
+def unique_slug(ad):
+    """Свободный slug для объявления: основа + суффикс, занятые — одним запросом по префиксу"""
+    from ..models import Advertisement
+
+    candidate = f'{slug_base(ad.title, ad.ad_type)}-{slug_suffix(ad)}'
+    taken = set(
+        Advertisement.objects
+        .filter(slug__startswith=candidate)
+        .exclude(pk=ad.pk)
+        .values_list('slug', flat=True)
+    )
+    slug = candidate
+    counter = 2
+    while slug in taken:
+        slug = f'{candidate}-{counter}'
+        counter += 1
+    return slug
+
+
+def slug_matches_title(ad):
+    """slug уже построен из текущего заголовка (менять не нужно)"""
+    return bool(ad.slug) and ad.slug.startswith(f'{slug_base(ad.title, ad.ad_type)}-')
+
+
+def change_slug(ad):
+    """Новый slug по изменившемуся заголовку; старый адрес ведёт на объявление (SlugRedirect)"""
+    from ..models import SlugRedirect
+
+    old_slug = ad.slug
+    ad.slug = unique_slug(ad)
+    if old_slug and ad.pk and old_slug != ad.slug:
+        SlugRedirect.objects.update_or_create(old_slug=old_slug, defaults={'advertisement': ad})
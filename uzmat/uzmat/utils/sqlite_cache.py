@@ -0,0 +1,163 @@
+"""
+Общий для процессов кэш в файле SQLite (второй уровень TwoTierCache)
+
+Файл лежит на хосте (в docker — в смонтированном каталоге проекта), поэтому
+его видят все воркеры gunicorn и ASGI-процесс. add/incr атомарны
+(BEGIN IMMEDIATE), журнал WAL не блокирует чтение на время записи.
+Каждая запись — транзакция, а пишет в файл одновременно только один процесс:
+set_many и delete_many укладываются в одну транзакцию, add сначала проверяет
+ключ без блокировки. Заменяется Redis без изменений кода: см. CACHES в settings.py.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """LOCATION — путь к файлу базы; MAX_ENTRIES / CULL_FREQUENCY как у остальных бэкендов"""
+
+    # Чистка просроченных и лишних записей — раз в столько записей в кэш
+    CULL_EVERY = 500
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        # После fork (воркеры gunicorn) соединение родителя не используем
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entry ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _live(expires):
+        return expires is None or expires > time.time()
+
+    def _read(self, conn, key):
+        row = conn.execute('SELECT value, expires FROM cache_entry WHERE key = ?', (key,)).fetchone()
+        if row is None or not self._live(row[1]):
+            return None
+        return row[0]
+
+    def _write(self, conn, key, value, timeout):
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self.get_backend_timeout(timeout)),
+        )
+        self._writes += 1
+        if self._writes % self.CULL_EVERY == 0:
+            self._cull(conn)
+
+    def _cull(self, conn):
+        conn.execute('DELETE FROM cache_entry WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        count = conn.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+        if count > self._max_entries:
+            conn.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                'SELECT key FROM cache_entry ORDER BY expires IS NULL, expires LIMIT ?)',
+                (max(count // self._cull_frequency, count - self._max_entries),),
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        value = self._read(self._connection(), key)
+        return default if value is None else pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not made:
+            return {}
+        placeholders = ','.join('?' * len(made))
+        rows = self._connection().execute(
+            f'SELECT key, value, expires FROM cache_entry WHERE key IN ({placeholders})', list(made)
+        ).fetchall()
+        return {made[key]: pickle.loads(value) for key, value, expires in rows if self._live(expires)}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(self._connection(), key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for key, value in data.items():
+                self._write(conn, self.make_and_validate_key(key, version=version), value, timeout)
+        finally:
+            conn.execute('COMMIT')
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        # Обычно ключ уже есть: отвечаем без блокировки записи
+        if self._read(conn, key) is not None:
+            return False
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self._read(conn, key) is not None:
+                return False
+            self._write(conn, key, value, timeout)
+            return True
+        finally:
+            conn.execute('COMMIT')
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT value, expires FROM cache_entry WHERE key = ?', (key,)).fetchone()
+            if row is None or not self._live(row[1]):
+                raise ValueError(f"Key '{key}' not found")
+            new_value = pickle.loads(row[0]) + delta
+            conn.execute(
+                'UPDATE cache_entry SET value = ? WHERE key = ?',
+                (pickle.dumps(new_value, pickle.HIGHEST_PROTOCOL), key),
+            )
+            return new_value
+        finally:
+            conn.execute('COMMIT')
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            'UPDATE cache_entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._read(self._connection(), key) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute('DELETE FROM cache_entry WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            placeholders = ','.join('?' * len(keys))
+            self._connection().execute(f'DELETE FROM cache_entry WHERE key IN ({placeholders})', keys)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entry')
@@ -0,0 +1,177 @@
+"""
+Стемминг для поискового индекса (utils/search.py)
+
+Язык определяется по каждому слову отдельно: кириллица с буквами ә ө ұ ү і ң һ —
+казахский, с ў ҳ қ ғ — узбекский, остальная кириллица — русский, латиница —
+узбекская латиница. Русские слова стеммятся алгоритмом Snowball (Russian),
+так что «погрузчик» / «погрузчика» / «погрузчики» дают одну основу.
+Для узбекского и казахского — осторожные правила: снимается одно окончание
+из списка и только с достаточно длинного слова.
+"""
+import re
+
+LANG_RU = 'ru'
+LANG_KZ = 'kz'
+LANG_UZ = 'uz'
+LANG_LATIN = 'latin'
+
+_KAZAKH_LETTERS = set('әөұүіңһ')
+_UZBEK_LETTERS = set('ўҳқғ')
+_CYRILLIC_RE = re.compile('[а-яё]')
+
+
+def detect_language(token):
+    """Язык слова по алфавиту (слово уже в нижнем регистре)"""
+    letters = set(token)
+    if letters & _KAZAKH_LETTERS:
+        return LANG_KZ
+    if letters & _UZBEK_LETTERS:
+        return LANG_UZ
+    if _CYRILLIC_RE.search(token):
+        return LANG_RU
+    return LANG_LATIN
+
+
+# --- Русский: Snowball (https://snowballstem.org/algorithms/russian/stemmer.html) ---
+
+_RU_VOWELS = set('аеиоуыэюя')
+
+# Окончания группы 1 допустимы только после «а» / «я»
+_PERFECTIVE_GERUND_1 = ('в', 'вши', 'вшись')
+_PERFECTIVE_GERUND_2 = ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')
+_ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+_PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')
+_PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+_REFLEXIVE = ('ся', 'сь')
+_VERB_1 = ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно')
+_VERB_2 = (
+    'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен',
+    'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+)
+_NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий',
+    'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю',
+    'ия', 'ья', 'я',
+)
+_DERIVATIONAL = ('ост', 'ость')
+_SUPERLATIVE = ('ейш', 'ейше')
+
+
+def _regions(word):
+    """RV — после первой гласной; R2 — R1 от R1 (R1 — после первой пары гласная+согласная)"""
+    rv = next((i + 1 for i, ch in enumerate(word) if ch in _RU_VOWELS), len(word))
+
+    def after_vowel_consonant(start):
+        for i in range(max(start, 1), len(word)):
+            if word[i] not in _RU_VOWELS and word[i - 1] in _RU_VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = after_vowel_consonant(0)
+    return rv, after_vowel_consonant(r1 + 1)
+
+
+def _match(word, limit, group1=(), group2=()):
+    """
+    Самое длинное окончание из групп, целиком лежащее не левее limit (как among
+    в Snowball). Для группы 1 нужна «а» / «я» перед ним, тоже в регионе.
+    Возвращает длину окончания или 0.
+    """
+    best, best_group = '', 0
+    for group, endings in ((1, group1), (2, group2)):
+        for ending in endings:
+            if len(ending) > len(best) and word.endswith(ending) and len(word) - len(ending) >= limit:
+                best, best_group = ending, group
+    if not best:
+        return 0
+    if best_group == 1:
+        before = len(word) - len(best) - 1
+        if before < limit or word[before] not in 'ая':
+            return 0
+    return len(best)
+
+
+def _cut(word, length):
+    return word[:-length] if length else word
+
+
+def stem_russian(word):
+    rv, r2 = _regions(word)
+
+    # Шаг 1
+    length = _match(word, rv, _PERFECTIVE_GERUND_1, _PERFECTIVE_GERUND_2)
+    if length:
+        word = _cut(word, length)
+    else:
+        word = _cut(word, _match(word, rv, group2=_REFLEXIVE))
+        length = _match(word, rv, group2=_ADJECTIVE)
+        if length:
+            word = _cut(word, length)
+            word = _cut(word, _match(word, rv, _PARTICIPLE_1, _PARTICIPLE_2))
+        else:
+            length = _match(word, rv, _VERB_1, _VERB_2) or _match(word, rv, group2=_NOUN)
+            word = _cut(word, length)
+
+    # Шаг 2
+    word = _cut(word, _match(word, rv, group2=('и',)))
+
+    # Шаг 3
+    word = _cut(word, _match(word, r2, group2=_DERIVATIONAL))
+
+    # Шаг 4
+    length = _match(word, rv, group2=_SUPERLATIVE)
+    if length:
+        word = _cut(word, length)
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        word = word[:-1]
+    elif not length and word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+# --- Узбекский и казахский: одно окончание из списка ---
+
+_KAZAKH_SUFFIXES = sorted({
+    'лардың', 'лердің', 'дардың', 'дердің', 'тардың', 'тердің',
+    'лар', 'лер', 'дар', 'дер', 'тар', 'тер',
+    'ның', 'нің', 'дың', 'дің', 'тың', 'тің',
+    'дан', 'ден', 'тан', 'тен', 'нан', 'нен',
+    'ға', 'ге', 'қа', 'ке', 'да', 'де', 'та', 'те',
+    'ны', 'ні', 'ды', 'ді', 'ты', 'ті',
+}, key=len, reverse=True)
+
+_UZBEK_CYRILLIC_SUFFIXES = sorted({
+    'ларнинг', 'ларни', 'лари', 'ларга', 'ларда', 'лардан', 'лар',
+    'нинг', 'даги', 'дан', 'га', 'ка', 'қа', 'да', 'ни',
+}, key=len, reverse=True)
+
+_UZBEK_LATIN_SUFFIXES = sorted({
+    'larning', 'larni', 'lari', 'larga', 'larda', 'lardan', 'lar',
+    'ning', 'dagi', 'dan', 'ga', 'ka', 'qa', 'da', 'ni',
+}, key=len, reverse=True)
+
+# Короче не снимаем: «кран», «katok», «moto» остаются как есть
+_TURKIC_MIN_STEM = 4
+
+
+def _strip_one(word, suffixes):
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _TURKIC_MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+_STEMMERS = {
+    LANG_RU: stem_russian,
+    LANG_KZ: lambda word: _strip_one(word, _KAZAKH_SUFFIXES),
+    LANG_UZ: lambda word: _strip_one(word, _UZBEK_CYRILLIC_SUFFIXES),
+    LANG_LATIN: lambda word: _strip_one(word, _UZBEK_LATIN_SUFFIXES),
+}
+
+
+def stem_word(word):
+    """Основа слова (в нижнем регистре) по правилам его языка"""
+    return _STEMMERS[detect_language(word)](word)
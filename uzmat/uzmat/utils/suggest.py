@@ -0,0 +1,206 @@
+"""
+Подсказки при вводе (марка, модель, тип техники, город) для /api/suggest/
+
+Индекс живёт в памяти процесса: отсортированный массив ключей и bisect по
+префиксу, без запросов к БД на каждое нажатие клавиши. Ключ — транслитерация
+(utils/dictionaries.normalize_key), поэтому «таш» и «tash» находят «Ташкент»;
+каждое слово значения тоже становится ключом («погр» -> «Фронтальный погрузчик»).
+Вес подсказки — число активных объявлений с этим значением.
+
+Обновление: раз в SUGGEST_REFRESH_INTERVAL секунд в фоне добавляются значения
+из объявлений, созданных после прошлого обновления (инкрементально), и раз в
+SUGGEST_FULL_REBUILD_INTERVAL секунд индекс пересобирается целиком (чтобы
+учесть правки и снятые объявления). Запросы в это время читают старую копию.
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .dictionaries import normalize_key
+
+logger = logging.getLogger(__name__)
+
+# Поле подсказки -> поля объявления, из которых берутся значения
+SUGGEST_FIELDS = {
+    'brand': ('brand', 'part_brand'),
+    'model': ('model', 'part_model'),
+    'equipment_type': ('equipment_type', 'part_equipment_type'),
+    'city': ('city',),
+}
+# Для этих полей вместо свободного текста берём канонические названия справочника
+DICTIONARY_REFS = {
+    'brand': 'brand_ref',
+    'equipment_type': 'equipment_type_ref',
+    'city': 'city_ref',
+}
+MAX_SUGGESTIONS = 10
+# Сколько ключей с подходящим префиксом просматривать (для 1-2 букв их много)
+MAX_SCAN = 3000
+MIN_QUERY_LENGTH = 1
+
+
+class PrefixIndex:
+    """
+    Неизменяемый снимок индекса: keys — отсортированные ключи, items — пары
+    (поле, значение) с теми же индексами, weights — {(поле, значение): вес}
+    """
+
+    def __init__(self, weights, aliases=None):
+        self.weights = weights
+        pairs = set()
+        for field, value in weights:
+            for key in _value_keys(value):
+                pairs.add((key, field, value))
+        for key, field, value in aliases or ():
+            if (field, value) in weights:
+                pairs.add((key, field, value))
+        ordered = sorted(pairs)
+        self.keys = [key for key, _, _ in ordered]
+        self.items = [(field, value) for _, field, value in ordered]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, query, field=None, limit=MAX_SUGGESTIONS):
+        prefix = normalize_key(query)
+        if len(prefix) < MIN_QUERY_LENGTH:
+            return []
+        start = bisect_left(self.keys, prefix)
+        found = {}
+        for i in range(start, min(start + MAX_SCAN, len(self.keys))):
+            if not self.keys[i].startswith(prefix):
+                break
+            item = self.items[i]
+            if field and item[0] != field:
+                continue
+            found[item] = self.weights.get(item, 0)
+        best = heapq.nlargest(limit, found.items(), key=lambda entry: (entry[1], -len(entry[0][1])))
+        return [{'field': f, 'value': value, 'count': count} for (f, value), count in best]
+
+    def with_added(self, weights_delta):
+        """Новый снимок с прибавленными весами (инкрементальное обновление)"""
+        weights = dict(self.weights)
+        for item, delta in weights_delta.items():
+            weights[item] = weights.get(item, 0) + delta
+        return PrefixIndex(weights, self._alias_triples())
+
+    def _alias_triples(self):
+        # Ключи-синонимы, которые не выводятся из самого значения
+        triples = []
+        for key, item in zip(self.keys, self.items):
+            if key not in _value_keys(item[1]):
+                triples.append((key,) + item)
+        return triples
+
+
+def _value_keys(value):
+    """Ключи значения: весь текст и каждое слово с его позиции"""
+    key = normalize_key(value)
+    if not key:
+        return set()
+    words = key.split(' ')
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+def _count_values(queryset):
+    """{(поле, значение): число объявлений} по queryset объявлений"""
+    weights = {}
+    for field, source_fields in SUGGEST_FIELDS.items():
+        ref = DICTIONARY_REFS.get(field)
+        columns = [f'{ref}__name'] if ref else list(source_fields)
+        for column in columns:
+            rows = (queryset.exclude(**{f'{column}__isnull': True}).exclude(**{column: ''})
+                    .order_by().values(column).annotate(n=Count('id')))
+            for row in rows:
+                value = (row[column] or '').strip()
+                if value:
+                    weights[(field, value)] = weights.get((field, value), 0) + row['n']
+    return weights
+
+
+def _dictionary_aliases():
+    """Синонимы справочников как дополнительные ключи: «toshkent» -> Ташкент"""
+    from ..models import DictionaryAlias
+
+    rows = DictionaryAlias.objects.values_list('key', 'kind', 'entry__name')
+    return [(key, kind, name) for key, kind, name in rows.iterator(chunk_size=5000)]
+
+
+def _active_ads():
+    from ..models import Advertisement
+
+    return Advertisement.objects.filter(is_active=True)
+
+
+class SuggestIndexHolder:
+    """Индекс процесса и его фоновое обновление"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._index = None
+        self._watermark = None
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        self._refreshing = False
+
+    def build(self):
+        """Полная сборка индекса из БД"""
+        ads = _active_ads()
+        watermark = ads.aggregate(last=Max('id'))['last'] or 0
+        index = PrefixIndex(_count_values(ads), _dictionary_aliases())
+        now = time.monotonic()
+        with self._lock:
+            self._index, self._watermark = index, watermark
+            self._refreshed_at = self._rebuilt_at = now
+        return index
+
+    def refresh(self):
+        """Добавляет в индекс объявления, появившиеся после прошлого обновления"""
+        try:
+            if time.monotonic() - self._rebuilt_at >= getattr(settings, 'SUGGEST_FULL_REBUILD_INTERVAL', 3600):
+                self.build()
+                return
+            new_ads = _active_ads().filter(id__gt=self._watermark)
+            watermark = new_ads.aggregate(last=Max('id'))['last']
+            if watermark:
+                index = self._index.with_added(_count_values(new_ads))
+                with self._lock:
+                    self._index, self._watermark = index, watermark
+            self._refreshed_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении индекса подсказок: {e}", exc_info=True)
+        finally:
+            self._refreshing = False
+
+    def get(self):
+        index = self._index
+        if index is None:
+            # Первый запрос процесса: собираем синхронно (один поток, остальные ждут)
+            with self._build_lock:
+                if self._index is None:
+                    self.build()
+            return self._index
+
+        interval = getattr(settings, 'SUGGEST_REFRESH_INTERVAL', 60)
+        if not self._refreshing and time.monotonic() - self._refreshed_at >= interval:
+            self._refreshing = True
+            from .background_tasks import run_in_background
+            if not run_in_background(self.refresh):
+                self._refreshing = False
+        return index
+
+
+_holder = SuggestIndexHolder()
+
+
+def suggest(query, field=None, limit=MAX_SUGGESTIONS):
+    """Подсказки для введённого текста: [{'field', 'value', 'count'}, ...]"""
+    if field and field not in SUGGEST_FIELDS:
+        return []
+    return _holder.get().lookup(query, field=field, limit=limit)
@@ -0,0 +1,203 @@
+"""
+Надёжная очередь задач в БД (без Redis/Celery)
+
+Задачи, которые нельзя потерять при перезапуске процесса (отправка в Telegram,
+уведомления), сохраняются в таблицу QueuedTask. После коммита транзакции задача
+сразу передаётся в пул фоновых потоков, а всё, что не успело выполниться или
+упало, подбирает воркер: python manage.py run_task_worker
+Выполняющаяся задача держит аренду (lease в @durable_task); долгие задачи
+продлевают её через heartbeat(), просроченную аренду воркер считает брошенной.
+Захват помечается locked_by: heartbeat() и запись результата проходят только
+у владельца, поэтому воркер с истёкшей арендой не затрёт чужой результат.
+"""
+import logging
+import random
+import threading
+import uuid
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Реестр задач: имя -> (функция, максимум попыток, аренда в секундах)
+TASK_REGISTRY = {}
+
+RETRY_BASE_DELAY = 30  # секунд
+RETRY_MAX_DELAY = 3600  # секунд
+DEFAULT_LEASE = 600  # секунд
+
+# Задача, которую выполняет текущий поток: (id, аренда, метка захвата) — для heartbeat()
+_current = threading.local()
+
+
+def durable_task(name, max_attempts=5, lease=DEFAULT_LEASE):
+    """
+    Декоратор регистрирует функцию как задачу надёжной очереди.
+    Исключение внутри задачи означает неудачную попытку (будет повтор с backoff).
+    lease — сколько секунд задача может выполняться без heartbeat(), прежде чем
+    её сочтут брошенной упавшим процессом и отдадут другому воркеру.
+    """
+    def decorator(func):
+        TASK_REGISTRY[name] = (func, max_attempts, lease)
+        func.task_name = name
+        return func
+    return decorator
+
+
+def heartbeat():
+    """
+    Продлевает аренду выполняемой задачи (долгие задачи вызывают между пачками).
+    False — задачу уже отдали другому воркеру, продолжать не нужно.
+    """
+    from ..models import QueuedTask
+
+    task = getattr(_current, 'task', None)
+    if task is None:
+        return True
+    task_id, lease, token = task
+    return QueuedTask.objects.filter(id=task_id, status=QueuedTask.STATUS_RUNNING, locked_by=token).update(
+        lease_until=timezone.now() + timezone.timedelta(seconds=lease),
+    ) == 1
+
+
+def _load_registry():
+    # Задачи регистрируются при импорте модулей, где они объявлены
+    from . import background_tasks  # noqa: F401
+
+
+def enqueue_task(name, *args, run_after=None, **kwargs):
+    """
+    Ставит задачу в очередь БД и после коммита пытается выполнить её в пуле потоков
+    """
+    from ..models import QueuedTask
+    from .background_tasks import run_in_background
+
+    _load_registry()
+    if name not in TASK_REGISTRY:
+        raise ValueError(f'Неизвестная задача: {name}')
+
+    _, max_attempts, _ = TASK_REGISTRY[name]
+    task = QueuedTask.objects.create(
+        name=name,
+        payload={'args': list(args), 'kwargs': kwargs},
+        max_attempts=max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+    if run_after is None:
+        transaction.on_commit(lambda: run_in_background(process_task, task.id))
+    return task
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед повтором (с небольшим разбросом)"""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** max(0, attempts - 1)))
+    return timezone.timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _claim(task_id, lease):
+    """Атомарно забирает задачу (pending -> running). Метка захвата или None."""
+    from ..models import QueuedTask
+
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    claimed = QueuedTask.objects.filter(
+        id=task_id,
+        status=QueuedTask.STATUS_PENDING,
+        run_after__lte=now,
+    ).update(
+        status=QueuedTask.STATUS_RUNNING,
+        locked_at=now,
+        locked_by=token,
+        lease_until=now + timezone.timedelta(seconds=lease),
+        attempts=F('attempts') + 1,
+    )
+    return token if claimed == 1 else None
+
+
+def _finish(task, token, **fields):
+    """Записывает результат, только если задача всё ещё за этим захватом. True, если записан."""
+    from ..models import QueuedTask
+
+    updated = QueuedTask.objects.filter(id=task.id, status=QueuedTask.STATUS_RUNNING, locked_by=token).update(
+        locked_at=None, locked_by='', lease_until=None, updated_at=timezone.now(), **fields,
+    )
+    if not updated:
+        logger.warning(f"Задача {task.id} ({task.name}): аренда истекла и задачу забрал другой воркер, результат отброшен")
+    return bool(updated)
+
+
+def process_task(task_id):
+    """
+    Выполняет одну задачу, если её ещё никто не забрал.
+    Возвращает True, если задача была выполнена (успешно или с ошибкой).
+    """
+    from ..models import QueuedTask
+
+    _load_registry()
+    name = QueuedTask.objects.filter(id=task_id).values_list('name', flat=True).first()
+    entry = TASK_REGISTRY.get(name)
+    token = _claim(task_id, entry[2] if entry else DEFAULT_LEASE)
+    if token is None:
+        return False
+
+    task = QueuedTask.objects.get(id=task_id)
+    if entry is None:
+        _finish(task, token, status=QueuedTask.STATUS_FAILED, last_error='Задача не зарегистрирована')
+        logger.error(f"Задача {task.id}: неизвестное имя {task.name}")
+        return True
+
+    func, _, lease = entry
+    payload = task.payload or {}
+    _current.task = (task.id, lease, token)
+    try:
+        func(*payload.get('args', []), **payload.get('kwargs', {}))
+    except Exception as e:
+        last_error = str(e)[:2000]
+        if task.attempts >= task.max_attempts:
+            if _finish(task, token, status=QueuedTask.STATUS_FAILED, last_error=last_error):
+                logger.error(f"Задача {task.id} ({task.name}) окончательно провалена после {task.attempts} попыток: {e}")
+        else:
+            run_after = timezone.now() + retry_delay(task.attempts)
+            if _finish(task, token, status=QueuedTask.STATUS_PENDING, last_error=last_error, run_after=run_after):
+                logger.warning(f"Задача {task.id} ({task.name}) упала (попытка {task.attempts}), повтор в {run_after}: {e}")
+        return True
+    finally:
+        _current.task = None
+
+    _finish(task, token, status=QueuedTask.STATUS_DONE)
+    return True
+
+
+def release_stale_tasks():
+    """
+    Возвращает в очередь задачи, «зависшие» в статусе running: аренда истекла
+    без heartbeat() (процесс, который их выполнял, был перезапущен)
+    """
+    from ..models import QueuedTask
+
+    return QueuedTask.objects.filter(
+        status=QueuedTask.STATUS_RUNNING,
+        lease_until__lt=timezone.now(),
+    ).update(status=QueuedTask.STATUS_PENDING, locked_at=None, locked_by='', lease_until=None)
+
+
+def process_due_tasks(batch_size=50):
+    """
+    Выполняет готовые к запуску задачи (для воркера). Возвращает число выполненных.
+    """
+    from ..models import QueuedTask
+
+    release_stale_tasks()
+    due_ids = list(
+        QueuedTask.objects
+        .filter(status=QueuedTask.STATUS_PENDING, run_after__lte=timezone.now())
+        .order_by('run_after', 'id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    processed = 0
+    for task_id in due_ids:
+        if process_task(task_id):
+            processed += 1
+    return processed
@@ -0,0 +1,202 @@
+"""
+Очередь публикаций в Telegram-канал (таблица TelegramOutbox)
+
+Создание объявления и send_ads_to_telegram только ставят публикацию в очередь
+(enqueue_ad). Отправляет один процесс — python manage.py run_telegram_outbox:
+общий HTTP-сеанс (utils/telegram_service.py) и «ведро токенов» под лимит
+Telegram на канал (около 20 сообщений в минуту). Ответ 429 с retry_after
+приостанавливает всю отправку на указанное время и не считается попыткой;
+сетевые и серверные ошибки повторяются с экспоненциальной задержкой,
+ошибки запроса (400) — сразу в failed. Счётчики — outbox_stats().
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F, Min
+from django.utils import timezone
+
+from . import metrics
+from .task_queue import retry_delay
+
+logger = logging.getLogger(__name__)
+
+STALE_SENDING_AFTER = timezone.timedelta(minutes=10)
+METRIC_NAMES = ('telegram:sent', 'telegram:retry', 'telegram:rate_limited', 'telegram:failed')
+
+
+class TokenBucket:
+    """Не больше rate запросов в секунду в среднем и capacity подряд"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now <= self._updated:
+            # Пауза после 429 ещё не кончилась
+            return
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self):
+        """Сколько секунд ждать до следующего токена (0 — можно сейчас)"""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            wait = max(0.0, self._paused_until - now)
+            if self._tokens < 1:
+                wait = max(wait, (1 - self._tokens) / self.rate)
+            return wait
+
+    def acquire(self, sleep=time.sleep):
+        while True:
+            wait = self.wait_time()
+            if wait <= 0:
+                with self._lock:
+                    self._tokens -= 1
+                return
+            sleep(wait)
+
+    def pause(self, seconds):
+        """retry_after от Telegram: ни одного запроса seconds секунд, затем один и далее по rate"""
+        with self._lock:
+            now = self._clock()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 1.0
+            self._updated = self._paused_until
+
+
+def default_bucket():
+    per_minute = getattr(settings, 'TELEGRAM_RATE_PER_MINUTE', 20)
+    return TokenBucket(per_minute / 60.0, getattr(settings, 'TELEGRAM_BURST', 3))
+
+
+def enqueue_ad(ad_id, force=False):
+    """
+    Ставит публикацию объявления в очередь. Без force пропускает уже
+    отправленные и уже стоящие в очереди. Возвращает TelegramOutbox или None.
+    """
+    from ..models import Advertisement, TelegramOutbox
+
+    if not force:
+        if Advertisement.objects.filter(id=ad_id, sent_to_telegram=True).exists():
+            return None
+        if TelegramOutbox.objects.filter(
+            advertisement_id=ad_id,
+            status__in=[TelegramOutbox.STATUS_PENDING, TelegramOutbox.STATUS_SENDING],
+        ).exists():
+            return None
+    return TelegramOutbox.objects.create(advertisement_id=ad_id)
+
+
+def _claim(entry_id):
+    from ..models import TelegramOutbox
+
+    now = timezone.now()
+    return TelegramOutbox.objects.filter(
+        id=entry_id,
+        status=TelegramOutbox.STATUS_PENDING,
+        run_after__lte=now,
+    ).update(status=TelegramOutbox.STATUS_SENDING, locked_at=now, attempts=F('attempts') + 1) == 1
+
+
+def release_stale():
+    """Возвращает в очередь публикации, зависшие в sending (процесс перезапущен)"""
+    from ..models import TelegramOutbox
+
+    return TelegramOutbox.objects.filter(
+        status=TelegramOutbox.STATUS_SENDING,
+        locked_at__lt=timezone.now() - STALE_SENDING_AFTER,
+    ).update(status=TelegramOutbox.STATUS_PENDING, locked_at=None)
+
+
+def send_entry(entry_id, bucket, client=None):
+    """Отправляет одну публикацию, если её удалось забрать. True, если была попытка."""
+    from ..models import Advertisement, TelegramOutbox
+    from .telegram_service import TelegramError, publish_ad
+
+    if not _claim(entry_id):
+        return False
+    entry = TelegramOutbox.objects.select_related('advertisement').get(id=entry_id)
+    fields = ['status', 'attempts', 'run_after', 'locked_at', 'last_error', 'updated_at']
+    entry.locked_at = None
+
+    bucket.acquire()
+    try:
+        message_id = publish_ad(entry.advertisement, client)
+    except TelegramError as e:
+        entry.last_error = str(e)[:2000]
+        if e.retry_after:
+            # Лимит Telegram: ждём сколько сказано, попытку не засчитываем
+            bucket.pause(e.retry_after)
+            entry.status = TelegramOutbox.STATUS_PENDING
+            entry.attempts -= 1
+            entry.run_after = timezone.now() + timezone.timedelta(seconds=e.retry_after)
+            metrics.incr('telegram:rate_limited')
+            logger.warning(f"Telegram: лимит, пауза {e.retry_after} с (публикация {entry.id})")
+        elif e.permanent or entry.attempts >= entry.max_attempts:
+            entry.status = TelegramOutbox.STATUS_FAILED
+            metrics.incr('telegram:failed')
+            logger.error(f"Telegram: публикация {entry.id} (объявление {entry.advertisement_id}) не отправлена: {e}")
+        else:
+            entry.status = TelegramOutbox.STATUS_PENDING
+            entry.run_after = timezone.now() + retry_delay(entry.attempts)
+            metrics.incr('telegram:retry')
+            logger.warning(f"Telegram: публикация {entry.id} упала (попытка {entry.attempts}), повтор в {entry.run_after}: {e}")
+        entry.save(update_fields=fields)
+        return True
+
+    now = timezone.now()
+    entry.status = TelegramOutbox.STATUS_SENT
+    entry.message_id = message_id
+    entry.sent_at = now
+    entry.last_error = ''
+    entry.save(update_fields=fields + ['message_id', 'sent_at'])
+    # update(): поля видны только в админке, страницы объявления не меняются
+    Advertisement.objects.filter(id=entry.advertisement_id).update(sent_to_telegram=True, telegram_message_id=message_id)
+    metrics.incr('telegram:sent')
+    logger.info(f"Telegram: объявление {entry.advertisement_id} опубликовано, message_id={message_id}")
+    return True
+
+
+def drain(bucket, batch_size=20, client=None):
+    """Отправляет готовые публикации (не больше batch_size). Возвращает число попыток."""
+    from ..models import TelegramOutbox
+    from .telegram_service import configuration_error
+
+    error = configuration_error()
+    if error:
+        logger.warning(f"Telegram: очередь не разбирается — {error}")
+        return 0
+
+    release_stale()
+    due_ids = list(
+        TelegramOutbox.objects
+        .filter(status=TelegramOutbox.STATUS_PENDING, run_after__lte=timezone.now())
+        .order_by('run_after', 'id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    return sum(1 for entry_id in due_ids if send_entry(entry_id, bucket, client))
+
+
+def outbox_stats():
+    """Счётчики отправки и состояние очереди"""
+    from ..models import TelegramOutbox
+
+    now = timezone.now()
+    pending = TelegramOutbox.objects.filter(status=TelegramOutbox.STATUS_PENDING)
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        **{name.split(':', 1)[1]: value for name, value in metrics.get_values(METRIC_NAMES).items()},
+        'pending': pending.count(),
+        'due': pending.filter(run_after__lte=now).count(),
+        'failed_total': TelegramOutbox.objects.filter(status=TelegramOutbox.STATUS_FAILED).count(),
+        'oldest_pending_seconds': int((now - oldest).total_seconds()) if oldest else 0,
+    }
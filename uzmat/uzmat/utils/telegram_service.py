@@ -1,70 +1,155 @@
 """
-Утилита для отправки объявлений в Telegram канал
+Отправка объявлений в Telegram-канал (Bot API)
+
+Все запросы процесса идут через один requests.Session (keep-alive, пул
+соединений) с короткими таймаутами. Ошибка API поднимается как TelegramError:
+retry_after — пауза, которую Telegram требует при 429, permanent — повтор не
+поможет. Очередь отправки и ограничение частоты — utils/telegram_outbox.py.
 """
+import logging
 import os
+from functools import lru_cache
+
 import requests
-import logging
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 from django.urls import reverse
 
 logger = logging.getLogger(__name__)
 
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+UPLOAD_READ_TIMEOUT = 30
 
-def send_ad_to_telegram(advertisement):
-    """
-    Отправляет объявление в Telegram канал
-    
-    Args:
-        advertisement: Экземпляр модели Advertisement
-        
-    Returns:
-        tuple: (success: bool, message_id: str or None, error: str or None)
-    """
-    logger.info(f"=== НАЧАЛО ОТПРАВКИ ОБЪЯВЛЕНИЯ {advertisement.id} В TELEGRAM ===")
-    logger.info(f"TELEGRAM_ENABLED={settings.TELEGRAM_ENABLED}")
-    logger.info(f"TELEGRAM_BOT_TOKEN={'установлен' if settings.TELEGRAM_BOT_TOKEN else 'НЕ установлен'}")
-    logger.info(f"TELEGRAM_CHANNEL_ID={settings.TELEGRAM_CHANNEL_ID}")
-    
+
+class TelegramError(Exception):
+    def __init__(self, description, status=None, retry_after=None):
+        super().__init__(description)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def permanent(self):
+        # 400: битое фото, слишком длинная подпись и т.п. — тот же запрос снова не пройдёт
+        return self.status == 400
+
+
+class TelegramClient:
+    """Клиент Bot API поверх одного requests.Session"""
+
+    def __init__(self, token, api_url, pool_size=4):
+        self.base_url = f"{api_url.rstrip('/')}/bot{token}/"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def call(self, method, data, files=None, read_timeout=READ_TIMEOUT):
+        """Результат метода API (поле result) или TelegramError"""
+        try:
+            response = self.session.post(
+                self.base_url + method, data=data, files=files, timeout=(CONNECT_TIMEOUT, read_timeout),
+            )
+        except requests.RequestException as e:
+            raise TelegramError(f'Ошибка сети: {e}') from e
+        try:
+            body = response.json()
+        except ValueError:
+            raise TelegramError(f'HTTP {response.status_code}: ответ не JSON', status=response.status_code)
+        if body.get('ok'):
+            return body.get('result') or {}
+        parameters = body.get('parameters') or {}
+        raise TelegramError(
+            body.get('description') or f'HTTP {response.status_code}',
+            status=body.get('error_code') or response.status_code,
+            retry_after=parameters.get('retry_after'),
+        )
+
+
+@lru_cache(maxsize=1)
+def _client(token, api_url):
+    return TelegramClient(token, api_url)
+
+
+def get_client():
+    """Клиент процесса (пересоздаётся, если сменились токен или адрес API)"""
+    return _client(settings.TELEGRAM_BOT_TOKEN, getattr(settings, 'TELEGRAM_API_URL', 'https://api.telegram.org'))
+
+
+def configuration_error():
+    """Причина, по которой отправка невозможна, или None"""
     if not settings.TELEGRAM_ENABLED:
-        logger.warning("Telegram отправка отключена в настройках")
-        return False, None, "Telegram отправка отключена"
-    
+        return 'Telegram отправка отключена'
     if not settings.TELEGRAM_BOT_TOKEN:
-        logger.error("TELEGRAM_BOT_TOKEN не настроен")
-        return False, None, "TELEGRAM_BOT_TOKEN не настроен"
-    
+        return 'TELEGRAM_BOT_TOKEN не настроен'
     if not settings.TELEGRAM_CHANNEL_ID:
-        logger.error("TELEGRAM_CHANNEL_ID не настроен")
-        return False, None, "TELEGRAM_CHANNEL_ID не настроен"
-    
+        return 'TELEGRAM_CHANNEL_ID не настроен'
+    return None
+
+
+def _site_url():
+    base_url = getattr(settings, 'SITE_URL', 'https://uzmat.uz').rstrip('/')
+    if not base_url.startswith('http'):
+        base_url = f"https://{base_url}"
+    return base_url
+
+
+def _main_image(advertisement):
+    image = advertisement.images.filter(is_main=True).first() or advertisement.images.first()
+    if image:
+        return image.image
+    return advertisement.image or None
+
+
+def _local_path(image_file):
     try:
-        # Получаем базовый URL сайта из настроек
-        base_url = getattr(settings, 'SITE_URL', 'https://uzmat.uz')
-        if not base_url.startswith('http'):
-            base_url = f"https://{base_url}"
-        
-        # Формируем ссылку на объявление
-        ad_url = f"{base_url}{reverse('uzmat:ad_detail', kwargs={'slug': advertisement.slug})}"
-        
-        # Формируем текст сообщения
-        message_text = format_ad_message(advertisement, ad_url)
-        
-        # Отправляем сообщение
-        has_images = advertisement.images.exists() or advertisement.image
-        logger.info(f"Объявление {advertisement.id}: has_images={has_images}, images.exists()={advertisement.images.exists()}, image={bool(advertisement.image)}")
-        
-        if has_images:
-            # Если есть изображение, отправляем с фото
-            logger.info(f"Пытаемся отправить объявление {advertisement.id} с фото")
-            return send_photo_message(advertisement, message_text)
-        else:
-            # Если нет изображения, отправляем только текст
-            logger.info(f"Объявление {advertisement.id} без изображений, отправляем только текст")
-            return send_text_message(message_text)
-            
-    except Exception as e:
-        logger.error(f"Ошибка при отправке объявления в Telegram: {str(e)}", exc_info=True)
-        return False, None, str(e)
+        path = image_file.path
+    except (ValueError, AttributeError, NotImplementedError):
+        # Файл в облачном хранилище
+        return None
+    return path if os.path.exists(path) else None
+
+
+def publish_ad(advertisement, client=None):
+    """
+    Публикует объявление в канал: с фото (файлом или по URL), иначе текстом.
+    Возвращает message_id; ошибки — TelegramError.
+    """
+    client = client or get_client()
+    channel_id = settings.TELEGRAM_CHANNEL_ID
+    ad_url = f"{_site_url()}{reverse('uzmat:ad_detail', kwargs={'slug': advertisement.slug})}"
+    message_text = format_ad_message(advertisement, ad_url)
+
+    image_file = _main_image(advertisement)
+    if image_file:
+        data = {'chat_id': channel_id, 'caption': message_text, 'parse_mode': 'HTML'}
+        try:
+            path = _local_path(image_file)
+            if path:
+                with open(path, 'rb') as photo:
+                    result = client.call(
+                        'sendPhoto', data, files={'photo': ('image.jpg', photo, 'image/jpeg')},
+                        read_timeout=UPLOAD_READ_TIMEOUT,
+                    )
+            else:
+                image_url = image_file.url
+                if not image_url.startswith('http'):
+                    image_url = f"{_site_url()}{image_url}"
+                result = client.call('sendPhoto', {**data, 'photo': image_url})
+            return str(result['message_id'])
+        except TelegramError as e:
+            if not e.permanent:
+                raise
+            # Фото не принято (формат, размер, длина подписи) — публикуем текстом
+            logger.warning(f"Telegram не принял фото объявления {advertisement.id}: {e}; отправляем текст")
+
+    result = client.call('sendMessage', {
+        'chat_id': channel_id,
+        'text': message_text,
+        'parse_mode': 'HTML',
+        'disable_web_page_preview': 'false',
+    })
+    return str(result['message_id'])
 
 
 def format_ad_message(advertisement, ad_url):
@@ -151,246 +236,3 @@ def format_ad_message(advertisement, ad_url):
     lines.append(f"🔗 <a href='{ad_url}'>Смотреть объявление</a>")
     
     return "\n".join(lines)
-
-
-def send_text_message(message_text):
-    """
-    Отправляет текстовое сообщение в Telegram канал
-    
-    Args:
-        message_text: Текст сообщения (HTML форматирование)
-        
-    Returns:
-        tuple: (success: bool, message_id: str or None, error: str or None)
-    """
-    bot_token = settings.TELEGRAM_BOT_TOKEN
-    channel_id = settings.TELEGRAM_CHANNEL_ID
-    
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    
-    payload = {
-        'chat_id': channel_id,
-        'text': message_text,
-        'parse_mode': 'HTML',
-        'disable_web_page_preview': False,
-    }
-    
-    try:
-        response = requests.post(url, json=payload, timeout=10)
-        response.raise_for_status()
-        
-        result = response.json()
-        if result.get('ok'):
-            message_id = str(result['result']['message_id'])
-            logger.info(f"Сообщение успешно отправлено в Telegram. Message ID: {message_id}")
-            return True, message_id, None
-        else:
-            error = result.get('description', 'Unknown error')
-            logger.error(f"Ошибка при отправке сообщения в Telegram: {error}")
-            return False, None, error
-            
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка сети при отправке в Telegram: {str(e)}")
-        return False, None, str(e)
-    except Exception as e:
-        logger.error(f"Неожиданная ошибка при отправке в Telegram: {str(e)}", exc_info=True)
-        return False, None, str(e)
-
-
-def send_photo_message(advertisement, message_text):
-    """
-    Отправляет сообщение с фото в Telegram канал
-    
-    Args:
-        advertisement: Экземпляр модели Advertisement
-        message_text: Текст сообщения (HTML форматирование)
-        
-    Returns:
-        tuple: (success: bool, message_id: str or None, error: str or None)
-    """
-    bot_token = settings.TELEGRAM_BOT_TOKEN
-    channel_id = settings.TELEGRAM_CHANNEL_ID
-    
-    # Получаем главное изображение
-    image_file = None
-    if advertisement.images.exists():
-        # Сначала ищем главное изображение
-        main_image = advertisement.images.filter(is_main=True).first()
-        if not main_image:
-            # Если главного нет, берем первое изображение
-            main_image = advertisement.images.first()
-        if main_image:
-            image_file = main_image.image
-            logger.info(f"Найдено изображение из advertisement.images: {image_file.name if image_file else 'None'}")
-    elif advertisement.image:
-        # Используем старое поле image, если нет связанных изображений
-        image_file = advertisement.image
-        logger.info(f"Найдено изображение из advertisement.image: {image_file.name if image_file else 'None'}")
-    
-    if not image_file:
-        # Если изображение не найдено, отправляем только текст
-        logger.warning(f"Изображение не найдено для объявления {advertisement.id}, отправляем только текст")
-        return send_text_message(message_text)
-    
-    logger.info(f"Найдено изображение для отправки: {image_file.name}")
-    
-    # ВАЖНО: Сначала пробуем отправить файл напрямую (наиболее надежный метод)
-    # Это работает только если файл доступен локально
-    file_result = send_photo_as_file(advertisement, message_text, image_file)
-    if file_result[0]:  # Если успешно
-        logger.info(f"Фото успешно отправлено как файл для объявления {advertisement.id}")
-        return file_result
-    
-    # Если не получилось отправить файл, пробуем по URL
-    logger.warning(f"Отправка файла не удалась для объявления {advertisement.id}, пробуем отправить по URL. Ошибка: {file_result[2]}")
-    
-    try:
-        # Получаем URL изображения
-        image_url = image_file.url
-        logger.info(f"Исходный URL изображения: {image_url}")
-        
-        # Если URL относительный, формируем полный URL
-        if not image_url.startswith('http'):
-            # Получаем базовый URL сайта
-            base_url = getattr(settings, 'SITE_URL', 'https://uzmat.uz')
-            
-            # Для локальной разработки используем localhost
-            if settings.DEBUG:
-                base_url = 'http://127.0.0.1:8000'
-                logger.info(f"Используется локальный URL для разработки: {base_url}")
-            elif not base_url.startswith('http'):
-                base_url = f"https://{base_url}"
-            
-            logger.info(f"Базовый URL для изображения: {base_url}")
-            
-            # Получаем MEDIA_URL из настроек
-            media_url = getattr(settings, 'MEDIA_URL', '/media/')
-            
-            # Если image_url уже содержит /media/, используем его как есть
-            # Если нет, добавляем MEDIA_URL
-            if image_url.startswith('/media/'):
-                # URL уже правильный, просто добавляем базовый URL
-                image_url = f"{base_url}{image_url}"
-            elif image_url.startswith('media/'):
-                # URL без начального слэша
-                image_url = f"{base_url}/{image_url}"
-            else:
-                # Формируем полный путь с MEDIA_URL
-                if not media_url.startswith('/'):
-                    media_url = '/' + media_url
-                if image_url.startswith('/'):
-                    image_url = image_url[1:]
-                image_url = f"{base_url}{media_url}{image_url}"
-        
-        logger.info(f"Пытаемся отправить фото по URL: {image_url}")
-        
-        # Проверяем доступность URL (опционально, для отладки)
-        try:
-            check_response = requests.head(image_url, timeout=5, allow_redirects=True)
-            if check_response.status_code != 200:
-                logger.warning(f"URL изображения возвращает статус {check_response.status_code}: {image_url}")
-        except Exception as e:
-            logger.warning(f"Не удалось проверить доступность URL изображения: {str(e)}")
-        
-        url = f"https://api.telegram.org/bot{bot_token}/sendPhoto"
-        
-        # Отправляем фото по URL
-        data = {
-            'chat_id': channel_id,
-            'photo': image_url,
-            'caption': message_text,
-            'parse_mode': 'HTML',
-        }
-        
-        # ВАЖНО: Telegram API требует отправку через form-data, а не JSON для sendPhoto с URL
-        # Используем data вместо json
-        response = requests.post(url, data=data, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
-        if result.get('ok'):
-            message_id = str(result['result']['message_id'])
-            logger.info(f"Сообщение с фото успешно отправлено в Telegram по URL. Message ID: {message_id}")
-            return True, message_id, None
-        else:
-            error = result.get('description', 'Unknown error')
-            logger.error(f"Ошибка при отправке фото в Telegram по URL: {error}")
-            logger.error(f"Полный ответ от Telegram API: {result}")
-            # Если не получилось, возвращаем ошибку
-            return False, None, error
-                
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка сети при отправке фото по URL: {str(e)}")
-        return False, None, str(e)
-    except Exception as e:
-        logger.error(f"Неожиданная ошибка при отправке фото в Telegram: {str(e)}", exc_info=True)
-        return False, None, str(e)
-
-
-def send_photo_as_file(advertisement, message_text, image_file):
-    """
-    Отправляет фото как файл (наиболее надежный метод)
-    """
-    bot_token = settings.TELEGRAM_BOT_TOKEN
-    channel_id = settings.TELEGRAM_CHANNEL_ID
-    
-    # Получаем полный путь к файлу
-    if not image_file:
-        logger.warning("Изображение не указано")
-        return False, None, "Изображение не указано"
-    
-    # Проверяем, существует ли файл
-    if not image_file.name:
-        logger.warning("Имя файла изображения не указано")
-        return False, None, "Имя файла изображения не указано"
-    
-    try:
-        image_path = image_file.path
-    except (ValueError, AttributeError, NotImplementedError) as e:
-        # Если файл хранится в облаке (S3 и т.д.), используем URL
-        logger.info(f"Файл не доступен локально ({str(e)}), используем URL метод")
-        return False, None, "Файл не доступен локально"
-    
-    # Проверяем существование файла
-    if not os.path.exists(image_path):
-        logger.warning(f"Файл изображения не найден: {image_path}")
-        return False, None, f"Файл не найден: {image_path}"
-    
-    try:
-        url = f"https://api.telegram.org/bot{bot_token}/sendPhoto"
-        
-        logger.info(f"Открываем файл для отправки: {image_path}")
-        logger.info(f"Размер файла: {os.path.getsize(image_path) / 1024:.2f} KB")
-        
-        with open(image_path, 'rb') as photo:
-            files = {'photo': ('image.jpg', photo, 'image/jpeg')}
-            data = {
-                'chat_id': channel_id,
-                'caption': message_text,
-                'parse_mode': 'HTML',
-            }
-            
-            logger.info(f"Отправляем фото в Telegram канал {channel_id}")
-            response = requests.post(url, files=files, data=data, timeout=60)
-            response.raise_for_status()
-            
-            result = response.json()
-            logger.info(f"Ответ от Telegram API: {result}")
-            
-            if result.get('ok'):
-                message_id = str(result['result']['message_id'])
-                logger.info(f"✅ Сообщение с фото успешно отправлено в Telegram (как файл). Message ID: {message_id}")
-                return True, message_id, None
-            else:
-                error = result.get('description', 'Unknown error')
-                logger.error(f"❌ Ошибка при отправке фото в Telegram: {error}")
-                logger.error(f"Полный ответ: {result}")
-                return False, None, error
-                
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка сети при отправке фото в Telegram: {str(e)}")
-        return False, None, str(e)
-    except Exception as e:
-        logger.error(f"Неожиданная ошибка при отправке фото в Telegram: {str(e)}", exc_info=True)
-        return False, None, str(e)
-
@@ -0,0 +1,166 @@
+"""
+Уменьшенные копии фотографий (WebP/JPEG) для карточек и srcset
+
+Для каждого оригинала AdvertisementImage / ChatImage рядом с ним сохраняются
+копии фиксированной ширины: advertisements/photo.jpg ->
+advertisements/photo_w320.webp, advertisements/photo_w320.jpg и т.д.
+Пути хранятся в поле thumbnails модели. Генерация идёт в фоне через
+очередь задач; для уже загруженных фото: python manage.py generate_thumbnails
+Копии удаляются вместе с записью фото (сигнал post_delete).
+"""
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = (320, 640, 1024)
+THUMBNAIL_FORMATS = {
+    # формат: (расширение, параметры сохранения Pillow)
+    'webp': ('webp', {'format': 'WEBP', 'quality': 78, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Ширина для обычной карточки каталога
+CARD_WIDTH = 320
+
+
+def derivative_name(original_name, width, fmt):
+    """Имя файла копии рядом с оригиналом"""
+    stem, _ = os.path.splitext(original_name)
+    return f'{stem}_w{width}.{THUMBNAIL_FORMATS[fmt][0]}'
+
+
+def _target_widths(original_width):
+    # Не увеличиваем: берём ширины меньше оригинала, а для маленьких фото — одну копию
+    widths = [w for w in THUMBNAIL_WIDTHS if w < original_width]
+    return widths or [min(THUMBNAIL_WIDTHS[0], original_width)]
+
+
+def generate_derivatives(field_file):
+    """
+    Создаёт копии для файла изображения и возвращает словарь для поля thumbnails:
+    {'width': ..., 'height': ..., 'webp': {'320': путь, ...}, 'jpeg': {...}}
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as fh:
+        with Image.open(fh) as source:
+            image = ImageOps.exif_transpose(source)
+            image = image.convert('RGB')
+
+    result = {'width': image.width, 'height': image.height}
+    for width in _target_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt, (_, save_kwargs) in THUMBNAIL_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, **save_kwargs)
+            name = derivative_name(field_file.name, width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            saved_name = storage.save(name, ContentFile(buffer.getvalue()))
+            result.setdefault(fmt, {})[str(width)] = saved_name
+    return result
+
+
+def thumbnail_paths(thumbnails):
+    """Пути всех копий из значения поля thumbnails"""
+    thumbnails = thumbnails or {}
+    return [path for fmt in THUMBNAIL_FORMATS for path in (thumbnails.get(fmt) or {}).values()]
+
+
+def delete_derivatives(storage, thumbnails):
+    """Удаляет файлы копий; ошибки хранилища только пишутся в лог"""
+    for path in thumbnail_paths(thumbnails):
+        try:
+            storage.delete(path)
+        except Exception as e:
+            logger.warning(f"Не удалось удалить копию {path}: {e}")
+
+
+def source_fields(model):
+    """Поля для .only() при генерации копий: фото объявления сбрасывает кэш его страницы"""
+    fields = ['id', 'image', 'thumbnails']
+    if any(field.name == 'advertisement' for field in model._meta.fields):
+        fields.append('advertisement_id')
+    return fields
+
+
+def _invalidate_pages(instance):
+    # UPDATE сигналов не вызывает: страницу объявления сбрасываем сами,
+    # иначе она до истечения кэша показывает оригинал вместо копий
+    ad_id = getattr(instance, 'advertisement_id', None)
+    if not ad_id:
+        return
+    from .page_cache import invalidate_tags
+
+    try:
+        invalidate_tags(f'ad:{ad_id}')
+    except Exception as e:
+        logger.error(f"Ошибка при сбросе кэша страниц для объявления {ad_id}: {e}")
+
+
+def build_thumbnails(instance):
+    """
+    Генерирует копии для объекта с полями image и thumbnails и сохраняет пути
+    (UPDATE без сигналов). Возвращает True, если копии созданы.
+    """
+    if not instance.image:
+        return False
+    thumbnails = generate_derivatives(instance.image)
+    if not type(instance).objects.filter(pk=instance.pk).update(thumbnails=thumbnails):
+        # Фото удалили, пока делались копии: post_delete о них не знал
+        delete_derivatives(instance.image.storage, thumbnails)
+        return False
+    instance.thumbnails = thumbnails
+    _invalidate_pages(instance)
+    return True
+
+
+def schedule_thumbnails(model, ids):
+    """Ставит генерацию копий в очередь задач (после коммита транзакции)"""
+    from .task_queue import enqueue_task
+
+    ids = [pk for pk in ids if pk]
+    if ids:
+        enqueue_task('generate_thumbnails', model._meta.label, ids)
+
+
+class ThumbnailsMixin:
+    """URL копий и srcset для моделей с полями image и thumbnails"""
+
+    def _thumbnail_urls(self, fmt):
+        paths = (self.thumbnails or {}).get(fmt) or {}
+        storage = self.image.storage
+        return sorted((int(width), storage.url(path)) for width, path in paths.items())
+
+    def thumbnail_url(self, width=CARD_WIDTH, fmt='jpeg'):
+        """Наименьшая копия не уже width (или оригинал, если копий ещё нет)"""
+        urls = self._thumbnail_urls(fmt)
+        if not urls:
+            return self.image.url if self.image else ''
+        for w, url in urls:
+            if w >= width:
+                return url
+        return urls[-1][1]
+
+    def srcset(self, fmt='jpeg'):
+        return ', '.join(f'{url} {w}w' for w, url in self._thumbnail_urls(fmt))
+
+    @property
+    def has_thumbnails(self):
+        return bool((self.thumbnails or {}).get('jpeg'))
+
+    @property
+    def card_url(self):
+        return self.thumbnail_url(CARD_WIDTH)
+
+    @property
+    def webp_srcset(self):
+        return self.srcset('webp')
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('jpeg')
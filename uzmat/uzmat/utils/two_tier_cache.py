@@ -0,0 +1,285 @@
+"""
+Двухуровневый кэш: L1 — небольшой LRU в памяти процесса, L2 — общий для
+всех воркеров кэш (SQLite-файл на хосте или Redis, алиас из LOCATION)
+
+Горячие ключи читаются из памяти процесса. Согласованность между воркерами —
+через журнал инвалидации в L2: каждая запись ключа увеличивает счётчик
+SEQ_KEY и кладёт в журнал запись «номер -> ключ». Процесс не чаще раза в
+SYNC_INTERVAL секунд сверяет счётчик и выбрасывает из L1 изменённые ключи;
+пропуск в журнале (вытеснение, clear) — сброс всего L1. Значение в L1 живёт не
+дольше L1_TIMEOUT секунд.
+
+Ключи с префиксами из L2_ONLY_PREFIXES (счётчики, попытки входа) в L1 не
+попадают и журнал не пишут: они часто меняются и должны быть строго общими.
+
+Цена записи: значение — одна запись в L2; журнал — incr счётчика и пачка
+записей «номер -> ключ». Во время HTTP-запроса изменённые ключи копятся и
+публикуются одной пачкой в конце (close() по request_finished), так что
+запрос платит за журнал две записи в L2, сколько бы ключей он ни изменил;
+другие воркеры видят изменение на время запроса позже. Вне запросов (очередь
+задач, планировщик) ключи публикуются сразу. В SQLite каждая запись —
+транзакция, и пишет в файл один процесс за раз: при нескольких воркерах
+gunicorn и заметной доле записей L2 лучше вынести в Redis (REDIS_URL).
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_started
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+SEQ_KEY = 'two_tier:seq'
+LOG_KEY_PREFIX = 'two_tier:log:'
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self._l1_timeout = options.get('L1_TIMEOUT', 30)
+        self._sync_interval = options.get('SYNC_INTERVAL', 1.0)
+        self._log_size = options.get('LOG_SIZE', 1000)
+        self._l2_only_prefixes = tuple(options.get('L2_ONLY_PREFIXES', ()))
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._seen_seq = None
+        self._synced_at = 0.0
+        # Ключи запроса, ещё не записанные в журнал (None — публикуем сразу)
+        self._batch = None
+        self._batch_started = 0.0
+
+    @cached_property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # --- L1 ---
+
+    def _local_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def _in_l1(self, key):
+        return not key.startswith(self._l2_only_prefixes)
+
+    def _l1_get(self, local_key):
+        with self._lock:
+            entry = self._l1.get(local_key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._l1[local_key]
+                return None
+            self._l1.move_to_end(local_key)
+            return entry[1]
+
+    def _l1_set(self, local_key, value, timeout=DEFAULT_TIMEOUT):
+        lifetime = self._l1_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            lifetime = min(lifetime, timeout)
+        if lifetime <= 0:
+            self._l1_discard(local_key)
+            return
+        # Как LocMemCache: храним pickle, чтобы изменение полученного объекта не портило кэш
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1[local_key] = (time.monotonic() + lifetime, data)
+            self._l1.move_to_end(local_key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_discard(self, *local_keys):
+        with self._lock:
+            for local_key in local_keys:
+                self._l1.pop(local_key, None)
+
+    def _l1_clear(self):
+        with self._lock:
+            self._l1.clear()
+
+    # --- журнал инвалидации ---
+
+    def _sync(self):
+        """Выбрасывает из L1 ключи, изменённые другими процессами"""
+        now = time.monotonic()
+        if now - self._synced_at < self._sync_interval:
+            return
+        self._synced_at = now
+        seq = self.shared.get(SEQ_KEY, 0)
+        seen = self._seen_seq
+        self._seen_seq = seq
+        if seen is None or seq == seen:
+            if seen is None:
+                self._l1_clear()
+            return
+        if seq < seen or seq - seen > self._log_size:
+            self._l1_clear()
+            return
+        log = self.shared.get_many([f'{LOG_KEY_PREFIX}{n}' for n in range(seen + 1, seq + 1)])
+        if len(log) < seq - seen:
+            # Запись журнала ещё не дописана или вытеснена
+            self._l1_clear()
+            return
+        self._l1_discard(*log.values())
+
+    def begin_batch(self):
+        """Ключи, изменённые до flush_batch(), публикуются одной пачкой"""
+        self.flush_batch()
+        self._batch = {}
+        self._batch_started = time.monotonic()
+
+    def flush_batch(self):
+        batch, self._batch = self._batch, None
+        if batch:
+            self._publish_now(*batch)
+
+    def _publish(self, *local_keys):
+        if self._batch is None:
+            self._publish_now(*local_keys)
+            return
+        self._batch.update(dict.fromkeys(local_keys))
+        if time.monotonic() - self._batch_started > self._sync_interval:
+            # Долгий запрос (или конец запроса не пришёл): чужие L1 не отстают
+            # больше, чем на интервал сверки
+            self.begin_batch()
+
+    def _publish_now(self, *local_keys):
+        """Сообщает остальным процессам об изменении ключей (один incr на пачку)"""
+        if not local_keys:
+            return
+        count = len(local_keys)
+        try:
+            last = self.shared.incr(SEQ_KEY, count)
+        except ValueError:
+            last = count if self.shared.add(SEQ_KEY, count, None) else self.shared.incr(SEQ_KEY, count)
+        first = last - count + 1
+        self.shared.set_many(
+            {f'{LOG_KEY_PREFIX}{first + i}': local_key for i, local_key in enumerate(local_keys)},
+            self._log_timeout(),
+        )
+        if self._seen_seq is not None and first == self._seen_seq + 1:
+            # Только свои изменения: L1 этого процесса уже обновлён
+            self._seen_seq = last
+
+    def _log_timeout(self):
+        return max(60, int(self._sync_interval * 10))
+
+    # --- API кэша ---
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        if self._in_l1(key):
+            self._sync()
+            data = self._l1_get(local_key)
+            if data is not None:
+                return pickle.loads(data)
+        value = self.shared.get(key, default, version=version)
+        if value is not default and self._in_l1(key):
+            self._l1_set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        self._sync()
+        for key in keys:
+            data = self._l1_get(self._local_key(key, version)) if self._in_l1(key) else None
+            if data is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(data)
+        if missing:
+            shared_values = self.shared.get_many(missing, version=version)
+            for key, value in shared_values.items():
+                if self._in_l1(key):
+                    self._l1_set(self._local_key(key, version), value)
+            found.update(shared_values)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        if self._in_l1(key):
+            local_key = self._local_key(key, version)
+            self._l1_set(local_key, value, timeout)
+            self._publish(local_key)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        local_keys = []
+        for key, value in data.items():
+            if self._in_l1(key) and key not in failed:
+                local_key = self._local_key(key, version)
+                self._l1_set(local_key, value, timeout)
+                local_keys.append(local_key)
+        self._publish(*local_keys)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added and self._in_l1(key):
+            local_key = self._local_key(key, version)
+            self._l1_set(local_key, value, timeout)
+            self._publish(local_key)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        if self._in_l1(key):
+            local_key = self._local_key(key, version)
+            self._l1_set(local_key, value)
+            self._publish(local_key)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = self.shared.touch(key, timeout, version=version)
+        if self._in_l1(key):
+            # Новый срок мог стать короче срока в L1
+            local_key = self._local_key(key, version)
+            self._l1_discard(local_key)
+            self._publish(local_key)
+        return touched
+
+    def has_key(self, key, version=None):
+        if self._in_l1(key):
+            self._sync()
+            if self._l1_get(self._local_key(key, version)) is not None:
+                return True
+        return self.shared.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        deleted = self.shared.delete(key, version=version)
+        if self._in_l1(key):
+            local_key = self._local_key(key, version)
+            self._l1_discard(local_key)
+            self._publish(local_key)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version=version)
+        local_keys = [self._local_key(key, version) for key in keys if self._in_l1(key)]
+        self._l1_discard(*local_keys)
+        self._publish(*local_keys)
+
+    def clear(self):
+        # Счётчик журнала тоже пропадёт — остальные процессы сбросят свой L1
+        self.shared.clear()
+        self._l1_clear()
+        self._seen_seq = None
+        self._batch = None
+
+    def close(self, **kwargs):
+        # Django вызывает close() у кэшей по request_finished: конец пачки запроса
+        self.flush_batch()
+
+
+def _begin_request_batches(**kwargs):
+    for alias, config in settings.CACHES.items():
+        if config.get('BACKEND') == f'{__name__}.{TwoTierCache.__name__}':
+            caches[alias].begin_batch()
+
+
+request_started.connect(_begin_request_batches, dispatch_uid='two_tier_cache_begin_batch')
@@ -0,0 +1,183 @@
+"""
+Буферизованный счётчик просмотров объявлений
+
+Просмотры копятся в памяти процесса (с дедупликацией по IP) и раз в
+VIEW_COUNTER_FLUSH_INTERVAL секунд сбрасываются в БД одним UPDATE ... CASE WHEN
+по объявлениям и одним по дневной статистике AdViewDaily (в одной транзакции).
+Так популярные объявления не превращаются в горячие точки блокировок строк.
+Сброс запускает и новый просмотр, и таймер процесса — иначе на «тихом» воркере
+просмотры лежали бы в памяти до следующего; при SIGKILL теряется не больше
+одного интервала.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, When, F, IntegerField
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Повторный просмотр с того же IP не засчитывается 5-10 минут
+DEDUP_WINDOW = 300
+MAX_DEDUP_ENTRIES = 200000
+
+
+class ViewCounter:
+    """
+    Накопитель просмотров одного процесса.
+    Дедупликация — два поколения множеств хэшей (ad_id, ip): текущее и предыдущее,
+    поколения меняются раз в DEDUP_WINDOW секунд.
+    """
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # {(ad_id, дата): [прирост, id владельца]}
+        self._pending = {}
+        self._seen = set()
+        self._seen_previous = set()
+        self._rotated_at = time.monotonic()
+        self._flushed_at = time.monotonic()
+        self._flush_scheduled = False
+        self._timer = None
+
+    def start_timer(self):
+        """Фоновый поток, сбрасывающий накопленное раз в flush_interval секунд"""
+        if self._timer is not None:
+            return
+        self._timer = threading.Thread(target=self._timer_loop, name='uzmat-view-counter', daemon=True)
+        self._timer.start()
+
+    def _timer_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if not self._pending:
+                continue
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def _rotate_if_needed(self, now):
+        if now - self._rotated_at >= DEDUP_WINDOW or len(self._seen) >= MAX_DEDUP_ENTRIES:
+            self._seen_previous = self._seen
+            self._seen = set()
+            self._rotated_at = now
+
+    def record(self, ad_id, owner_id, ip):
+        """
+        Засчитывает просмотр. Возвращает True, если просмотр новый (не дубль по IP).
+        """
+        now = time.monotonic()
+        fingerprint = hash((ad_id, ip))
+        with self._lock:
+            self._rotate_if_needed(now)
+            if fingerprint in self._seen or fingerprint in self._seen_previous:
+                return False
+            self._seen.add(fingerprint)
+
+            key = (ad_id, timezone.localdate())
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = [1, owner_id]
+            else:
+                entry[0] += 1
+
+            schedule = not self._flush_scheduled and now - self._flushed_at >= self.flush_interval
+            if schedule:
+                self._flush_scheduled = True
+
+        if schedule:
+            from .background_tasks import run_in_background
+            if not run_in_background(self.flush):
+                with self._lock:
+                    self._flush_scheduled = False
+        return True
+
+    def flush(self):
+        """Сбрасывает накопленные приросты в БД. Возвращает число объявлений."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._flushed_at = time.monotonic()
+                self._flush_scheduled = False
+            if not pending:
+                return 0
+            try:
+                write_deltas(pending)
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении просмотров: {e}", exc_info=True)
+                # Возвращаем приросты обратно, чтобы не потерять их
+                with self._lock:
+                    for key, (delta, owner_id) in pending.items():
+                        entry = self._pending.setdefault(key, [0, owner_id])
+                        entry[0] += delta
+                return 0
+            return len({ad_id for ad_id, _ in pending})
+
+
+def write_deltas(pending):
+    """
+    Записывает приросты {(ad_id, дата): [прирост, id владельца]} в БД:
+    один UPDATE по объявлениям и по два запроса на каждую дату в AdViewDaily.
+    Всё в одной транзакции: при ошибке flush() вернёт приросты в буфер,
+    и views_count не должен оказаться уже увеличенным.
+    """
+    from ..models import Advertisement, AdViewDaily
+
+    totals = {}
+    by_date = {}
+    for (ad_id, day), (delta, owner_id) in pending.items():
+        totals[ad_id] = totals.get(ad_id, 0) + delta
+        by_date.setdefault(day, {})[ad_id] = (delta, owner_id)
+
+    with transaction.atomic():
+        Advertisement.objects.filter(id__in=totals).update(views_count=Case(
+            *[When(id=ad_id, then=F('views_count') + delta) for ad_id, delta in totals.items()],
+            default=F('views_count'),
+            output_field=IntegerField(),
+        ))
+
+        existing_ads = set(Advertisement.objects.filter(id__in=totals).values_list('id', flat=True))
+        for day, deltas in by_date.items():
+            deltas = {ad_id: value for ad_id, value in deltas.items() if ad_id in existing_ads}
+            if not deltas:
+                continue
+            # Сначала гарантируем наличие строк (без гонки между процессами), затем прибавляем
+            AdViewDaily.objects.bulk_create(
+                [AdViewDaily(advertisement_id=ad_id, user_id=owner_id, date=day, views=0)
+                 for ad_id, (_, owner_id) in deltas.items()],
+                ignore_conflicts=True,
+            )
+            AdViewDaily.objects.filter(date=day, advertisement_id__in=deltas).update(views=Case(
+                *[When(advertisement_id=ad_id, then=F('views') + delta) for ad_id, (delta, _) in deltas.items()],
+                default=F('views'),
+                output_field=IntegerField(),
+            ))
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_view_counter():
+    """Накопитель просмотров текущего процесса (создаётся лениво)"""
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                _counter = ViewCounter(getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 10))
+                # Не теряем накопленное при штатной остановке процесса
+                atexit.register(_counter.flush)
+                _counter.start_timer()
+    return _counter
+
+
+def record_view(ad_id, owner_id, ip):
+    """Засчитывает просмотр объявления (без запросов к БД)"""
+    return get_view_counter().record(ad_id, owner_id, ip)
@@ -3,30 +3,36 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.urls import reverse
-from django.db.models import Q, Count, Sum, F
-from django.db.models.functions import Coalesce
-from django.core.paginator import Paginator
-from django.utils.text import slugify
+from django.db.models import Q, Count, Sum
+from django.template.loader import render_to_string
 from django.utils import timezone
-from django.db import transaction
-from django.db.models import Case, When, Value, IntegerField
+from django.db import close_old_connections, transaction
 from django.conf import settings as django_settings
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.views.decorators.http import require_http_methods
+from django.utils.cache import patch_cache_control
 import os
+import json
+import asyncio
 import logging
+from asgiref.sync import sync_to_async
 from .models import (
     User,
     Advertisement,
+    AdViewDaily,
     Favorite,
+    SavedSearch,
     Category,
     AdvertisementImage,
     VerificationRequest,
     ChatThread,
     ChatMessage,
     ChatImage,
+    Broadcast,
+    SlugRedirect,
 )
 from .utils.currency import (
     convert_usd_to_uzs,
@@ -35,7 +41,15 @@ from .utils.currency import (
     get_currency_for_country,
     convert_currency,
 )
-from .utils.click_payment import verify_click_signature, generate_click_payment_url
+from .utils.click_payment import generate_click_payment_url
+from .utils.slugs import change_slug, slug_matches_title
+from .utils.payments import (
+    PROMOTION_DAYS,
+    create_payment,
+    handle_click_webhook,
+    mark_result_shown,
+    payment_for_return,
+)
 from .utils.security import (
     sanitize_string,
     validate_email,
@@ -43,168 +57,58 @@ from .utils.security import (
     sanitize_search_query,
     check_sql_injection_patterns,
 )
+from .utils.search import apply_search
+from .utils.pagination import paginate_listing
+from .utils.facets import get_facets, facets_payload
+from .utils.dictionaries import filter_by_dictionary
+from .utils.suggest import suggest, MAX_SUGGESTIONS
+from .utils.page_cache import (
+    add_page_tags,
+    cache_anonymous_page,
+    feed_tags_for_filters,
+    normalized_query,
+    page_cache_stats,
+    set_page_meta,
+)
+from .utils.sessions import session_stats
+from .utils.conditional import conditional_page, content_validators, make_validators, not_modified, set_validators
+from .utils.chat_pubsub import broker as chat_broker
+from .utils.chat_crypto import decrypt_many
+from .utils.thumbnails import schedule_thumbnails
+from .utils.home_feed import (
+    FEED_FILTER_PARAMS,
+    get_home_feed,
+    compute_feed_for_queryset,
+    with_bump_order,
+    load_feed_ads,
+)
 from decimal import Decimal, InvalidOperation
 from itertools import chain
 
 
+@cache_anonymous_page('index')
 def index(request):
     """Главная страница со списком объявлений (только продажа и аренда)"""
-    from django.core.cache import cache
-    from .utils.background_tasks import run_in_background, bump_ads_async
-    
-    now = timezone.now()
-    
-    # Автоподнятие каждые 3 часа (выполняется АСИНХРОННО в фоновом потоке)
-    # Используем кэш для предотвращения частых обновлений
-    last_bump_key = 'last_bump_update'
-    last_bump_time = cache.get(last_bump_key)
-    
-    if not last_bump_time or (now - last_bump_time).total_seconds() > 300:  # Каждые 5 минут максимум
-        # Запускаем обновление в фоновом потоке (НЕ блокирует ответ)
-        run_in_background(bump_ads_async)
-        cache.set(last_bump_key, now, 300)  # Кэшируем на 5 минут
-    
-    # На /catalog/ фильтрация работает через get_filtered_ads(). На главной тоже применяем те же GET-фильтры
-    # (в первую очередь country/city из селектора), но оставляем только sale/rent.
-    # Оптимизация: используем select_related и only для загрузки только нужных полей
-    base_active = (get_filtered_ads(request)
-                   .filter(ad_type__in=['sale', 'rent'])
-                   .select_related('user')
-                   .prefetch_related('images')
-                   .annotate(bump_order=Coalesce('last_bumped_at', 'created_at')))
-    
-    promoted_active = base_active.filter(
-        is_promoted=True,
-        promotion_until__gte=now
-    )
-    
-    verified_active = base_active.filter(
-        user__is_verified=True,
-        user__verified_until__gte=now
-    )
-    
-    plan_priority = Case(
-        When(promotion_plan='vip', then=Value(1)),
-        When(promotion_plan='premium', then=Value(2)),
-        When(promotion_plan='gold', then=Value(3)),
-        default=Value(4),
-        output_field=IntegerField()
-    )
-    
-    HOT_LIMIT = 16
-    POPULAR_LIMIT = 10
-    
-    # Горячие предложения: до 16 по приоритету тарифа, затем по времени продвижения; дальше проверенные
-    # Оптимизация: используем only для загрузки только нужных полей
-    hot_promoted = list(
-        promoted_active.annotate(plan_priority=plan_priority)
-        .only('id', 'title', 'slug', 'price', 'currency', 'city', 'country', 'ad_type', 
-              'promoted_at', 'created_at', 'promotion_plan', 'user_id', 'image')
-        .order_by('plan_priority', '-promoted_at', '-created_at')[:HOT_LIMIT]
-    )
-    hot_ids = [ad.id for ad in hot_promoted]
-    slots_left = max(0, HOT_LIMIT - len(hot_promoted))
-    hot_verified = []
-    if slots_left > 0:
-        hot_verified = list(
-            verified_active.exclude(id__in=hot_ids)
-            .only('id', 'title', 'slug', 'price', 'currency', 'city', 'country', 'ad_type',
-                  'created_at', 'user_id', 'image')
-            .order_by('-user__verified_until', '-bump_order')[:slots_left]
+    # Подборки главной (горячие / популярные / превью) — списки ID.
+    # Для фильтра только по стране/городу они материализованы в кэше (utils/home_feed.py),
+    # для остальных GET-фильтров (поиск и т.д.) считаются по get_filtered_ads().
+    if set(request.GET.keys()) <= FEED_FILTER_PARAMS:
+        feed = get_home_feed(request.GET.get('country'), request.GET.get('city'))
+    else:
+        feed = compute_feed_for_queryset(
+            with_bump_order(get_filtered_ads(request).filter(ad_type__in=['sale', 'rent']))
         )
-        hot_ids.extend([ad.id for ad in hot_verified])
-    hot_offers = hot_promoted + hot_verified
-    
-    if not hot_offers:
-        hot_offers = list(base_active.only('id', 'title', 'slug', 'price', 'currency', 'city', 
-                                          'country', 'ad_type', 'created_at', 'user_id', 'image')
-                         .order_by('-bump_order')[:7])
-    
-    # Популярные: до 10, GOLD держится в топ-4 первые 12 часов, далее общий приоритет VIP > PREMIUM > GOLD, затем проверенные
-    # Оптимизация: используем only для загрузки только нужных полей
-    fresh_gold = list(
-        promoted_active.filter(
-            promotion_plan='gold',
-            promoted_at__gte=now - timezone.timedelta(hours=12)
-        ).only('id', 'title', 'slug', 'price', 'currency', 'city', 'country', 'ad_type',
-               'promoted_at', 'created_at', 'user_id', 'image')
-        .order_by('-promoted_at')[:4]
-    )
-    
-    exclude_ids = [ad.id for ad in fresh_gold]
-    rest_popular = list(
-        promoted_active.exclude(id__in=exclude_ids)
-        .annotate(plan_priority=plan_priority)
-        .only('id', 'title', 'slug', 'price', 'currency', 'city', 'country', 'ad_type',
-              'promoted_at', 'created_at', 'promotion_plan', 'user_id', 'image')
-        .order_by('plan_priority', '-promoted_at', '-created_at')[: max(0, POPULAR_LIMIT - len(fresh_gold))]
-    )
-    exclude_ids.extend([ad.id for ad in rest_popular])
-    
-    verified_popular = list(
-        verified_active.exclude(id__in=exclude_ids)
-        .only('id', 'title', 'slug', 'price', 'currency', 'city', 'country', 'ad_type',
-              'created_at', 'user_id', 'image')
-        .order_by('-user__verified_until', '-bump_order')[: max(0, POPULAR_LIMIT - len(fresh_gold) - len(rest_popular))]
-    )
-    
-    popular_ads = (fresh_gold + rest_popular + verified_popular)[:POPULAR_LIMIT]
     
-    # Общая подборка на главной (превью)
-    ads = list(base_active.only('id', 'title', 'slug', 'price', 'currency', 'city', 'country', 
-                                'ad_type', 'created_at', 'user_id', 'image')
-              .order_by('-bump_order')[:8])
+    # Одна выборка id__in для всех подборок
+    hot_offers, popular_ads, ads = load_feed_ads(feed)
     
-    # Подсчитываем непрочитанные сообщения для авторизованных пользователей
-    # Оптимизация: используем кэширование и ограничиваем количество запросов
+    # Непрочитанные сообщения: сумма денормализованных счётчиков тредов (один запрос)
     unread_count = 0
     if request.user.is_authenticated:
-        me = request.user
-        cache_key = f'unread_count_{me.id}'
-        cached_unread = cache.get(cache_key)
-        
-        if cached_unread is not None:
-            unread_count = cached_unread
-        else:
-            # Оптимизированный подсчет: получаем только нужные треды
-            threads = ChatThread.objects.filter(
-                Q(buyer=me) | Q(seller=me)
-            ).select_related('buyer', 'seller')[:100]  # Ограничиваем количество
-            
-            thread_ids = [t.id for t in threads]
-            if thread_ids:
-                # Получаем все непрочитанные сообщения одним запросом
-                buyer_threads = [t.id for t in threads if t.buyer_id == me.id]
-                seller_threads = [t.id for t in threads if t.seller_id == me.id]
-                
-                # Подсчитываем непрочитанные для покупателя
-                if buyer_threads:
-                    buyer_unread = ChatMessage.objects.filter(
-                        thread_id__in=buyer_threads
-                    ).exclude(sender=me).filter(
-                        Q(thread__buyer_last_read_at__isnull=True) |
-                        Q(created_at__gt=F('thread__buyer_last_read_at'))
-                    ).count()
-                    unread_count += buyer_unread
-                
-                # Подсчитываем непрочитанные для продавца
-                if seller_threads:
-                    seller_unread = ChatMessage.objects.filter(
-                        thread_id__in=seller_threads
-                    ).exclude(sender=me).filter(
-                        Q(thread__seller_last_read_at__isnull=True) |
-                        Q(created_at__gt=F('thread__seller_last_read_at'))
-                    ).count()
-                    unread_count += seller_unread
-            
-            # Кэшируем результат на 30 секунд (асинхронно)
-            from .utils.background_tasks import run_in_background, update_unread_count_cache_async
-            run_in_background(update_unread_count_cache_async, me.id, unread_count)
+        unread_count = ChatThread.total_unread_for(request.user)
     
     # Получаем список ID избранных объявлений для текущего пользователя
-    favorited_ad_ids = []
-    if request.user.is_authenticated:
-        favorited_ad_ids = list(Favorite.objects.filter(user=request.user).values_list('advertisement_id', flat=True))
+    favorited_ad_ids = _favorited_ad_ids(request)
     
     context = {
         'user': request.user,
@@ -214,13 +118,42 @@ def index(request):
         'unread_messages_count': unread_count,
         'favorited_ad_ids': favorited_ad_ids,
     }
+    # Подборки главной зависят от всех объявлений (продвижение, поднятие) — общий тег
+    add_page_tags(request, 'home')
     return render(request, 'uzmat/index.html', context)
 
 
+SIMILAR_ADS_ON_PAGE = 4
+
+
+def _record_cached_ad_view(request, meta):
+    """Страница объявления из кэша: просмотр всё равно засчитываем"""
+    from .utils.view_counter import record_view
+
+    if meta.get('ad_id'):
+        record_view(meta['ad_id'], meta['owner_id'], request.META.get("REMOTE_ADDR", "unknown"))
+
+
+def _ad_detail_validators(request, slug):
+    """Версия страницы объявления: само объявление и другие объявления продавца"""
+    row = Advertisement.objects.filter(slug=slug, is_active=True).values_list('id', 'user_id').first()
+    if row is None:
+        return None
+    ad_id, owner_id = row
+    set_page_meta(request, ad_id=ad_id, owner_id=owner_id)
+    return content_validators([f'ad:{ad_id}', f'user:{owner_id}'])
+
+
+@conditional_page(_ad_detail_validators, on_not_modified=_record_cached_ad_view)
+@cache_anonymous_page('ad_detail', on_hit=_record_cached_ad_view)
 def ad_detail(request, slug):
     """Страница детального просмотра объявления"""
     # Получаем объявление без фильтра по is_active
-    ad = get_object_or_404(Advertisement, slug=slug)
+    ad = Advertisement.objects.filter(slug=slug).first()
+    if ad is None:
+        # Прежний адрес (заголовок меняли) — постоянный редирект на текущий
+        moved = get_object_or_404(SlugRedirect.objects.select_related('advertisement'), old_slug=slug)
+        return redirect(moved.advertisement, permanent=True)
     
     # Проверяем доступ: если объявление неактивно, только владелец может его просматривать
     if not ad.is_active:
@@ -229,15 +162,14 @@ def ad_detail(request, slug):
             raise Http404("Объявление не найдено")
     
     # Увеличиваем счетчик просмотров только для активных объявлений или для владельца
-    # Оптимизация: выполняем АСИНХРОННО в фоновом потоке (не блокирует запрос)
+    # Оптимизация: просмотры копятся в памяти и пачкой сбрасываются в БД (utils/view_counter.py)
     if ad.is_active or (request.user.is_authenticated and ad.user == request.user):
-        from .utils.background_tasks import run_in_background, increment_ad_views_async
+        from .utils.view_counter import record_view
         
         user_ip = request.META.get("REMOTE_ADDR", "unknown")
-        # Запускаем обновление счетчика в фоновом потоке
-        run_in_background(increment_ad_views_async, ad.id, user_ip)
-        # Обновляем объект в памяти (может быть немного устаревшим, но это нормально)
-        ad.refresh_from_db()
+        if record_view(ad.id, ad.user_id, user_ip):
+            # Показываем счётчик с учётом текущего просмотра без повторного запроса к БД
+            ad.views_count += 1
     
     # Проверяем, добавлено ли в избранное
     is_favorited = False
@@ -263,13 +195,24 @@ def ad_detail(request, slug):
     else:
         user_ads_count = Advertisement.objects.filter(user=ad.user, is_active=True).count()
     
+    # Похожие объявления: соседи предрассчитаны командой build_similar_ads (один запрос)
+    similar_ads = (Advertisement.objects
+                   .filter(similar_for__advertisement=ad, is_active=True)
+                   .exclude(slug='')
+                   .exclude(slug__isnull=True)
+                   .for_cards()
+                   .order_by('-similar_for__score')[:SIMILAR_ADS_ON_PAGE])
+    
     context = {
         'ad': ad,
         'user': request.user,
         'is_favorited': is_favorited,
         'other_ads': other_ads,
         'user_ads_count': user_ads_count,
+        'similar_ads': similar_ads,
     }
+    add_page_tags(request, f'ad:{ad.id}', f'user:{ad.user_id}', *(f'ad:{similar.id}' for similar in similar_ads))
+    set_page_meta(request, ad_id=ad.id, owner_id=ad.user_id)
     return render(request, 'uzmat/ad_detail.html', context)
 
 
@@ -500,15 +443,19 @@ def profile(request):
         return redirect('uzmat:profile')
     
     # Получаем объявления пользователя (включая неактивные - они видны только в профиле)
-    user_ads = Advertisement.objects.filter(user=request.user).exclude(slug='').exclude(slug__isnull=True).select_related('user').order_by('-created_at')
+    user_ads = Advertisement.objects.filter(user=request.user).exclude(slug='').exclude(slug__isnull=True).select_related('user').for_cards().order_by('-created_at')
     
     # Получаем избранные объявления
     favorites = Favorite.objects.filter(user=request.user).select_related('advertisement', 'advertisement__user').order_by('-created_at')
     
+    # Сохранённые поиски (уведомления о новых объявлениях)
+    saved_searches = SavedSearch.objects.filter(user=request.user, is_active=True)
+    
     context = {
         'user': request.user,
         'user_ads': user_ads,
         'favorites': favorites,
+        'saved_searches': saved_searches,
         'now_dt': timezone.now(),
     }
     return render(request, 'uzmat/profile.html', context)
@@ -522,15 +469,16 @@ def user_profile(request, user_id):
     user_ads = Advertisement.objects.filter(
         user=profile_user, 
         is_active=True
-    ).exclude(slug='').exclude(slug__isnull=True).select_related('user').order_by('-created_at')
+    ).exclude(slug='').exclude(slug__isnull=True).select_related('user').for_cards().order_by('-created_at')
     
     # Количество объявлений
     ads_count = user_ads.count()
     
-    # Общее количество просмотров всех объявлений
-    total_views = Advertisement.objects.filter(user=profile_user, is_active=True).aggregate(
-        total=Sum('views_count')
-    )['total'] or 0
+    # Общее количество просмотров всех объявлений (по дневной статистике)
+    total_views = AdViewDaily.objects.filter(
+        user=profile_user,
+        advertisement__is_active=True
+    ).aggregate(total=Sum('views'))['total'] or 0
     
     context = {
         'profile_user': profile_user,
@@ -580,50 +528,12 @@ def chats(request):
                         msg.set_text('Превью: срок действия галочки скоро истекает. Продлите её, чтобы она не пропала.')
                         msg.save()
 
-                        support_thread.last_message_at = msg.created_at
-                        support_thread.save(update_fields=['last_message_at'])
+                        support_thread.register_message(msg)
                     request.session['preview_badge_renew_sent'] = True
             except Exception as e:
                 logger = logging.getLogger('django.request')
                 logger.error(f'Ошибка в preview_badge_renew: {str(e)}', exc_info=True)
 
-        # Напоминание о продлении галочки: срабатывает при заходе в /chats/
-        try:
-            if me.is_verified_active and me.verified_until:
-                remind_days = 7
-                now = timezone.now()
-                if me.verified_until <= now + timezone.timedelta(days=remind_days):
-                    if not me.badge_expiry_notified_until or me.badge_expiry_notified_until != me.verified_until:
-                        support_agent = User.objects.filter(is_staff=True, is_active=True).order_by('id').first()
-                        if support_agent:
-                            support_thread = (ChatThread.objects
-                                              .filter(thread_type='support', advertisement__isnull=True, buyer=me, seller=support_agent)
-                                              .order_by('id')
-                                              .first())
-                            if not support_thread:
-                                support_thread = ChatThread.objects.create(
-                                    thread_type='support',
-                                    advertisement=None,
-                                    buyer=me,
-                                    seller=support_agent,
-                                    last_message_at=now,
-                                )
-
-                            txt = f"Срок действия галочки истекает {me.verified_until.strftime('%d.%m.%Y')}. Продлите её, чтобы она не пропала."
-                            msg = ChatMessage(thread=support_thread, sender=support_agent, system_action='renew_badge', system_url=reverse('uzmat:verify_renew'))
-                            msg.set_text(txt)
-                            msg.save()
-
-                            support_thread.last_message_at = msg.created_at
-                            support_thread.save(update_fields=['last_message_at'])
-
-                            me.badge_expiry_notified_until = me.verified_until
-                            me.save(update_fields=['badge_expiry_notified_until'])
-        except Exception as e:
-            # Не ломаем /chats/ из-за напоминаний
-            logger = logging.getLogger('django.request')
-            logger.error(f'Ошибка в напоминании о продлении галочки: {str(e)}', exc_info=True)
-        
         # Получаем список тредов
         try:
             threads_qs = (ChatThread.objects
@@ -657,7 +567,7 @@ def chats(request):
                                .select_related('sender')
                                .prefetch_related('images')
                                .order_by('-created_at')[:60])
-                active_messages = list(reversed(active_messages))
+                active_messages = decrypt_many(list(reversed(active_messages)))
             except Exception as e:
                 logger = logging.getLogger('django.request')
                 logger.error(f'Ошибка при получении сообщений для треда {active_thread.id}: {str(e)}', exc_info=True)
@@ -665,45 +575,17 @@ def chats(request):
             
             # Помечаем тред как прочитанный при открытии
             try:
-                now = timezone.now()
-                if me.id == active_thread.buyer_id:
-                    active_thread.buyer_last_read_at = now
-                    active_thread.save(update_fields=['buyer_last_read_at'])
-                elif me.id == active_thread.seller_id:
-                    active_thread.seller_last_read_at = now
-                    active_thread.save(update_fields=['seller_last_read_at'])
+                active_thread.mark_read(me)
             except Exception as e:
                 logger = logging.getLogger('django.request')
                 logger.error(f'Ошибка при обновлении времени прочтения треда: {str(e)}', exc_info=True)
 
-        # Подсчитываем непрочитанные сообщения для каждого треда
+        # Непрочитанные по тредам: денормализованные счётчики, без запросов
         unread_counts = {}
-        try:
-            for thread in threads:
-                try:
-                    last_read = thread.buyer_last_read_at if me.id == thread.buyer_id else thread.seller_last_read_at
-                    if last_read and thread.last_message_at and thread.last_message_at > last_read:
-                        unread = ChatMessage.objects.filter(
-                            thread=thread,
-                            created_at__gt=last_read
-                        ).exclude(sender=me).count()
-                        if unread > 0:
-                            unread_counts[thread.id] = unread
-                    elif not last_read and thread.last_message_at:
-                        # Если никогда не читал, считаем все сообщения не от себя
-                        unread = ChatMessage.objects.filter(
-                            thread=thread
-                        ).exclude(sender=me).count()
-                        if unread > 0:
-                            unread_counts[thread.id] = unread
-                except Exception as e:
-                    # Пропускаем проблемный тред, но продолжаем обработку остальных
-                    logger = logging.getLogger('django.request')
-                    logger.error(f'Ошибка при подсчете непрочитанных для треда {thread.id}: {str(e)}', exc_info=True)
-                    continue
-        except Exception as e:
-            logger = logging.getLogger('django.request')
-            logger.error(f'Ошибка при подсчете непрочитанных сообщений: {str(e)}', exc_info=True)
+        for thread in threads:
+            unread = thread.unread_for(me)
+            if unread > 0:
+                unread_counts[thread.id] = unread
 
         context = {
             'user': me,
@@ -808,21 +690,20 @@ def chat_send(request, thread_id: int):
             if image:
                 ChatImage.objects.create(message=msg, image=image)
 
-            thread.last_message_at = timezone.now()
-            thread.save(update_fields=['last_message_at'])
+            # Открытые SSE-соединения (chat_stream) узнают о сообщении по thread.last_message_at
+            thread.register_message(msg)
+
+        payload = {
+            'id': msg.id,
+            'sender_id': msg.sender_id,
+            'text': msg.text,
+            'created_at': msg.created_at.strftime('%H:%M'),
+            'images': [img.image.url for img in msg.images.all()],
+            'system_action': msg.system_action,
+            'system_url': msg.system_url,
+        }
 
-        return JsonResponse({
-            'ok': True,
-            'message': {
-                'id': msg.id,
-                'sender_id': msg.sender_id,
-                'text': msg.text,
-                'created_at': msg.created_at.strftime('%H:%M'),
-                'images': [img.image.url for img in msg.images.all()],
-                'system_action': msg.system_action,
-                'system_url': msg.system_url,
-            }
-        })
+        return JsonResponse({'ok': True, 'message': payload})
     except Exception as e:
         # Обрабатываем любые ошибки, связанные с размером файла
         error_msg = str(e).lower()
@@ -838,6 +719,63 @@ def chat_send(request, thread_id: int):
         }, status=500)
 
 
+def _chat_messages_after(thread_id, after_id):
+    """Новые сообщения треда после after_id в формате chat_poll (до 100 штук)"""
+    qs = (ChatMessage.objects
+          .filter(thread_id=thread_id, id__gt=after_id)
+          .select_related('sender')
+          .prefetch_related('images')
+          .order_by('id')[:100])
+
+    data = []
+    for m in decrypt_many(list(qs)):
+        try:
+            # Безопасное получение текста (может быть зашифрован)
+            text = ''
+            try:
+                text = m.text if hasattr(m, 'text') else ''
+            except Exception:
+                # Если ошибка при расшифровке, оставляем пустой текст
+                text = ''
+
+            # Безопасное форматирование времени
+            created_at_str = ''
+            try:
+                if m.created_at:
+                    created_at_str = m.created_at.strftime('%H:%M')
+                else:
+                    created_at_str = ''
+            except (AttributeError, ValueError, TypeError):
+                created_at_str = ''
+
+            # Безопасное получение URL изображений
+            image_urls = []
+            try:
+                for img in m.images.all():
+                    if img.image:
+                        image_urls.append(img.image.url)
+            except Exception:
+                # Если ошибка при получении изображений, пропускаем
+                pass
+
+            data.append({
+                'id': m.id,
+                'sender_id': m.sender_id,
+                'text': text,
+                'created_at': created_at_str,
+                'images': image_urls,
+                'system_action': m.system_action or '',
+                'system_url': m.system_url or '',
+            })
+        except Exception as e:
+            # Логируем ошибку, но продолжаем обработку других сообщений
+            logger = logging.getLogger('django.request')
+            logger.error(f'Ошибка при обработке сообщения {m.id} в chat_poll: {str(e)}', exc_info=True)
+            continue
+
+    return data
+
+
 @login_required
 def chat_poll(request, thread_id: int):
     """Получение новых сообщений (AJAX polling)"""
@@ -853,59 +791,15 @@ def chat_poll(request, thread_id: int):
         except (ValueError, TypeError):
             after_id = 0
 
-        qs = (ChatMessage.objects
-              .filter(thread=thread, id__gt=after_id)
-              .select_related('sender')
-              .prefetch_related('images')
-              .order_by('id')[:100])
-
-        data = []
-        for m in qs:
-            try:
-                # Безопасное получение текста (может быть зашифрован)
-                text = ''
-                try:
-                    text = m.text if hasattr(m, 'text') else ''
-                except Exception:
-                    # Если ошибка при расшифровке, оставляем пустой текст
-                    text = ''
-                
-                # Безопасное форматирование времени
-                created_at_str = ''
-                try:
-                    if m.created_at:
-                        created_at_str = m.created_at.strftime('%H:%M')
-                    else:
-                        created_at_str = ''
-                except (AttributeError, ValueError, TypeError):
-                    created_at_str = ''
-                
-                # Безопасное получение URL изображений
-                image_urls = []
-                try:
-                    for img in m.images.all():
-                        if img.image:
-                            image_urls.append(img.image.url)
-                except Exception:
-                    # Если ошибка при получении изображений, пропускаем
-                    pass
-                
-                data.append({
-                    'id': m.id,
-                    'sender_id': m.sender_id,
-                    'text': text,
-                    'created_at': created_at_str,
-                    'images': image_urls,
-                    'system_action': m.system_action or '',
-                    'system_url': m.system_url or '',
-                })
-            except Exception as e:
-                # Логируем ошибку, но продолжаем обработку других сообщений
-                logger = logging.getLogger('django.request')
-                logger.error(f'Ошибка при обработке сообщения {m.id} в chat_poll: {str(e)}', exc_info=True)
-                continue
+        # Новых сообщений нет — 304 без запроса сообщений и расшифровки
+        last_message_at = thread.last_message_at.timestamp() if thread.last_message_at else 0
+        etag, _ = make_validators([me.id, thread.id, after_id, last_message_at], periodic=False)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
 
-        return JsonResponse({'ok': True, 'messages': data})
+        data = _chat_messages_after(thread.id, after_id)
+        return set_validators(JsonResponse({'ok': True, 'messages': data}), etag)
     except Exception as e:
         # Логируем общую ошибку
         logger = logging.getLogger('django.request')
@@ -913,6 +807,81 @@ def chat_poll(request, thread_id: int):
         return JsonResponse({'ok': False, 'error': 'Ошибка сервера'}, status=500)
 
 
+CHAT_STREAM_PING_SECONDS = 25
+CHAT_STREAM_MAX_SECONDS = 300
+
+
+@login_required
+async def chat_stream(request, thread_id: int):
+    """
+    Доставка новых сообщений через Server-Sent Events (только под ASGI).
+    Пока сообщений нет, соединение ждёт сигнала наблюдателя (utils/chat_pubsub.py)
+    без собственных запросов к БД. Под WSGI отвечает 204 — клиент переходит на chat_poll.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    thread = await ChatThread.objects.filter(id=thread_id).only('id', 'buyer_id', 'seller_id').afirst()
+    if thread is None:
+        return JsonResponse({'ok': False, 'error': 'Чат не найден'}, status=404)
+    if user.id not in (thread.buyer_id, thread.seller_id):
+        return JsonResponse({'ok': False, 'error': 'Нет доступа'}, status=403)
+
+    # При переподключении браузер присылает Last-Event-ID: догоняем пропущенное одним запросом
+    after_id = request.headers.get('Last-Event-ID') or request.GET.get('after_id')
+    try:
+        after_id = int(after_id) if after_id else 0
+    except (ValueError, TypeError):
+        after_id = 0
+
+    def sse(message):
+        return f"id: {message['id']}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
+
+    def read_messages(after):
+        try:
+            return _chat_messages_after(thread.id, after)
+        finally:
+            # Поток исполнителя не закрывает соединение сам, как обычный запрос
+            close_old_connections()
+
+    # Не на единственном sync-потоке процесса: потоки чатов не должны ждать друг друга
+    messages_after = sync_to_async(read_messages, thread_sensitive=False)
+
+    async def events():
+        subscription = chat_broker.subscribe(thread.id)
+        _, new_messages = subscription
+        last_id = after_id
+        try:
+            yield "retry: 3000\n\n"
+            if last_id:
+                for message in await messages_after(last_id):
+                    last_id = message['id']
+                    yield sse(message)
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + CHAT_STREAM_MAX_SECONDS
+            while loop.time() < deadline:
+                try:
+                    await asyncio.wait_for(new_messages.wait(), timeout=CHAT_STREAM_PING_SECONDS)
+                except asyncio.TimeoutError:
+                    # Комментарий-пинг держит соединение через прокси
+                    yield ": ping\n\n"
+                    continue
+                new_messages.clear()
+                for message in await messages_after(last_id):
+                    last_id = message['id']
+                    yield sse(message)
+        finally:
+            chat_broker.unsubscribe(thread.id, subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Отключаем буферизацию в nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def chat_message_edit(request, message_id: int):
     """Редактирование сообщения (только автор)"""
@@ -951,7 +920,9 @@ def chat_message_delete(request, message_id: int):
         return JsonResponse({'ok': False, 'error': 'Можно удалять только свои сообщения'}, status=403)
 
     thread_id = thread.id
-    msg.delete()
+    with transaction.atomic():
+        thread.unregister_message(msg)
+        msg.delete()
 
     # Обновим last_message_at после удаления (если надо)
     last = ChatMessage.objects.filter(thread_id=thread_id).order_by('-created_at').first()
@@ -990,7 +961,7 @@ def get_filtered_ads(request, limit=None, ad_type_filter=None):
            .exclude(slug='')
            .exclude(slug__isnull=True)
            .select_related('user')
-           .prefetch_related('images'))
+           .for_cards())
     
     # Фильтр по пользователю (для просмотра объявлений конкретного пользователя)
     user_id = request.GET.get('user')
@@ -1013,36 +984,30 @@ def get_filtered_ads(request, limit=None, ad_type_filter=None):
     if country:
         country = country.strip()
         if country and country != 'all' and country != '':
-            # Отладочная информация
-            print(f"DEBUG: Фильтрация по стране: '{country}'")
             ads = ads.filter(country=country)
-            print(f"DEBUG: Количество объявлений после фильтрации по стране: {ads.count()}")
             
             # Фильтр по городу - ТОЛЬКО если выбрана страна И выбран город
             city = request.GET.get('city')
             if city and city != 'all' and city.strip():
                 city = city.strip()
-                print(f"DEBUG: Дополнительная фильтрация по городу: '{city}'")
-                ads = ads.filter(city__icontains=city)
-                print(f"DEBUG: Количество объявлений после фильтрации по стране и городу: {ads.count()}")
+                ads = filter_by_dictionary(ads, 'city', city)
     else:
         # Если страна НЕ выбрана, можно фильтровать только по городу
         city = request.GET.get('city')
         if city and city != 'all' and city.strip():
             city = city.strip()
-            print(f"DEBUG: Фильтрация только по городу (страна не выбрана): '{city}'")
-            ads = ads.filter(city__icontains=city)
-            print(f"DEBUG: Количество объявлений после фильтрации по городу: {ads.count()}")
+            ads = filter_by_dictionary(ads, 'city', city)
     
     # Фильтр по типу техники
     equipment_type = request.GET.get('equipment_type')
     if equipment_type:
-        ads = ads.filter(Q(equipment_type__icontains=equipment_type) | Q(part_equipment_type__icontains=equipment_type))
+        # По справочнику: индексное IN по equipment_type_ref вместо icontains
+        ads = filter_by_dictionary(ads, 'equipment_type', equipment_type)
     
     # Фильтр по марке
     brand = request.GET.get('brand')
     if brand:
-        ads = ads.filter(Q(brand__icontains=brand) | Q(part_brand__icontains=brand))
+        ads = filter_by_dictionary(ads, 'brand', brand)
     
     # Фильтр по цене
     price_from = request.GET.get('price_from')
@@ -1064,15 +1029,8 @@ def get_filtered_ads(request, limit=None, ad_type_filter=None):
         # Санитизируем поисковый запрос
         search = sanitize_search_query(search)
         if search:  # Проверяем, что после санитизации запрос не пустой
-            # Django ORM автоматически защищает от SQL инъекций через параметризованные запросы
-            ads = ads.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(equipment_type__icontains=search) |
-                Q(brand__icontains=search) |
-                Q(part_name__icontains=search) |
-                Q(service_name__icontains=search)
-            )
+            # Поиск по инвертированному индексу (AdSearchTerm) с ранжированием по релевантности
+            ads = apply_search(ads, search)
     
     # Если нужен лимит, применяем его, но возвращаем QuerySet для пагинации
     if limit:
@@ -1081,52 +1039,176 @@ def get_filtered_ads(request, limit=None, ad_type_filter=None):
     return ads
 
 
+def _listing_ads(request, section):
+    """Отфильтрованные объявления ленты: catalog, parts или logistics"""
+    if section == 'parts':
+        return get_filtered_ads(request, ad_type_filter='parts')
+    if section == 'logistics':
+        return get_filtered_ads(request, ad_type_filter='service')
+
+    ad_type_param = request.GET.get('ad_type')
+    if not ad_type_param:
+        # Если ad_type не указан - показываем ВСЕ объявления по продаже И аренде вместе
+        return get_filtered_ads(request).filter(ad_type__in=['sale', 'rent'])
+    if ad_type_param in ['sale', 'rent']:
+        # Если указан конкретный тип (sale или rent) - показываем только его
+        return get_filtered_ads(request, ad_type_filter=ad_type_param)
+    # Если указан другой тип (service, parts) - пустой список
+    return get_filtered_ads(request).none()
+
+
+def _listing_ad_types(request, section):
+    """Типы объявлений ленты (для фасетов и тегов кэша страниц)"""
+    if section == 'parts':
+        return ['parts']
+    if section == 'logistics':
+        return ['service']
+    if request.GET.get('ad_type') in ['sale', 'rent']:
+        return [request.GET['ad_type']]
+    return ['sale', 'rent']
+
+
+def _listing_facets(request, section):
+    """Счётчики фасетов ленты с учётом выбранной страны (и типа в каталоге)"""
+    country = (request.GET.get('country') or '').strip()
+    return get_facets(_listing_ad_types(request, section), country if country and country != 'all' else None)
+
+
+def _tag_listing_page(request, section, page_obj):
+    """Теги кэша страниц: фильтр ленты и показанные объявления"""
+    add_page_tags(
+        request,
+        *feed_tags_for_filters(_listing_ad_types(request, section), request.GET),
+        *(f'ad:{ad.id}' for ad in page_obj),
+    )
+
+
+def _listing_validators(section):
+    """Версия ленты по тем же тегам фильтра, что и у кэша страниц"""
+    def validators(request):
+        tags = feed_tags_for_filters(_listing_ad_types(request, section), request.GET)
+        return content_validators(tags, section, normalized_query(request))
+    return validators
+
+
+def _paginate_listing(request, ads):
+    """Страница ленты по ?page= или ?cursor= и приблизительное общее число"""
+    return paginate_listing(
+        ads,
+        page_number=request.GET.get('page', 1),
+        cursor=request.GET.get('cursor'),
+    )
+
+
+def _listing_query(request):
+    """GET-параметры фильтров без page/cursor (для ссылок пагинации)"""
+    query = request.GET.copy()
+    query.pop('page', None)
+    query.pop('cursor', None)
+    return query.urlencode()
+
+
+def _favorited_ad_ids(request):
+    if not request.user.is_authenticated:
+        return []
+    return list(Favorite.objects.filter(user=request.user).values_list('advertisement_id', flat=True))
+
+
+LISTING_SECTIONS = ('catalog', 'parts', 'logistics')
+
+
+def listing_feed(request, section):
+    """
+    JSON для бесконечной прокрутки ленты: следующие карточки после курсора
+    (те же фильтры, что у страницы) — {ok, html, next_cursor, has_next, total};
+    для первой страницы (без курсора) ещё и facets со счётчиками фильтров
+    """
+    if section not in LISTING_SECTIONS:
+        return JsonResponse({'ok': False, 'error': 'Неизвестный раздел'}, status=404)
+
+    ads = _listing_ads(request, section)
+    page_obj, total_count = _paginate_listing(request, ads)
+    html = render_to_string('uzmat/ad-card-list.html', {
+        'ads': page_obj,
+        'favorited_ad_ids': _favorited_ad_ids(request),
+    }, request=request)
+    data = {
+        'ok': True,
+        'html': html,
+        'next_cursor': page_obj.next_cursor,
+        'has_next': page_obj.next_cursor is not None,
+        'total': total_count,
+    }
+    if not request.GET.get('cursor'):
+        data['facets'] = facets_payload(_listing_facets(request, section))
+    return JsonResponse(data)
+
+
+def suggest_api(request):
+    """
+    Подсказки при вводе: /api/suggest/?q=кома&field=brand
+    Отвечает из индекса в памяти процесса (utils/suggest.py), без запросов к БД
+    """
+    query = (request.GET.get('q') or '').strip()[:100]
+    field = request.GET.get('field') or None
+    try:
+        limit = max(1, min(int(request.GET.get('limit', MAX_SUGGESTIONS)), MAX_SUGGESTIONS))
+    except (TypeError, ValueError):
+        limit = MAX_SUGGESTIONS
+    response = JsonResponse({'ok': True, 'suggestions': suggest(query, field=field, limit=limit)})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+@staff_member_required(login_url='/auth/')
+def page_cache_metrics(request):
+    """Попадания в кэш страниц по каждой view (счётчики utils/metrics.py)"""
+    return JsonResponse({'ok': True, 'views': page_cache_stats()})
+
+
+@staff_member_required(login_url='/auth/')
+def session_metrics(request):
+    """Записи сессий в БД в секунду и доля пропущенных сохранений (utils/sessions.py)"""
+    return JsonResponse({'ok': True, 'sessions': session_stats()})
+
+
+@staff_member_required(login_url='/auth/')
+def telegram_metrics(request):
+    """Отправки в Telegram, повторы, 429 и размер очереди (utils/telegram_outbox.py)"""
+    from uzmat.utils.telegram_outbox import outbox_stats
+
+    return JsonResponse({'ok': True, 'telegram': outbox_stats()})
+
+
+@conditional_page(_listing_validators('parts'))
+@cache_anonymous_page('parts_repair')
 def parts_repair(request):
     """Страница с запчастями"""
-    # Всегда показываем только запчасти
-    ad_type = 'parts'
+    # Всегда показываем только запчасти, с применением всех фильтров
+    ads = _listing_ads(request, 'parts')
     
-    # Получаем объявления с применением всех фильтров
-    ads = get_filtered_ads(request, ad_type_filter=ad_type)
+    # Пагинация: номера первых страниц, дальше курсор; total_count из кэша
+    page_obj, total_count = _paginate_listing(request, ads)
     
-    # Сохраняем общее количество до пагинации
-    total_count = ads.count()
-    
-    # Пагинация
-    paginator = Paginator(ads, 12)
-    page_number = request.GET.get('page', 1)
-    try:
-        page_obj = paginator.get_page(page_number)
-    except:
-        page_obj = paginator.get_page(1)
-    
-    # Получаем уникальные города для фильтра
-    country = request.GET.get('country')
-    if country and country != 'all' and country.strip():
-        cities = Advertisement.objects.filter(
-            is_active=True,
-            country=country.strip(),
-            ad_type='parts'
-        ).values_list('city', flat=True).distinct().order_by('city')
-    else:
-        cities = Advertisement.objects.filter(
-            is_active=True,
-            ad_type='parts'
-        ).values_list('city', flat=True).distinct().order_by('city')
+    # Города и счётчики фильтров из предагрегированных фасетов (без GROUP BY по объявлениям)
+    facets = _listing_facets(request, 'parts')
+    cities = facets['city']
     
     # Получаем список ID избранных объявлений для текущего пользователя
-    favorited_ad_ids = []
-    if request.user.is_authenticated:
-        favorited_ad_ids = list(Favorite.objects.filter(user=request.user).values_list('advertisement_id', flat=True))
+    favorited_ad_ids = _favorited_ad_ids(request)
     
     context = {
         'user': request.user,
         'ads': page_obj,
         'page_obj': page_obj,
         'cities': cities,
+        'facets': facets,
         'total_count': total_count,
         'favorited_ad_ids': favorited_ad_ids,
+        'listing_section': 'parts',
+        'listing_query': _listing_query(request),
     }
+    _tag_listing_page(request, 'parts', page_obj)
     return render(request, 'uzmat/parts_repair.html', context)
 
 
@@ -1153,73 +1235,35 @@ def safety_page(request):
     return render(request, 'uzmat/safety.html', {'user': request.user})
 
 
+@conditional_page(_listing_validators('catalog'))
+@cache_anonymous_page('catalog')
 def catalog(request):
     """Страница каталога всех объявлений (только продажа и аренда, без услуг и запчастей)"""
-    # Отладочная информация
-    country_param = request.GET.get('country')
-    city_param = request.GET.get('city')
-    ad_type_param = request.GET.get('ad_type')
-    print(f"DEBUG catalog view: country={country_param}, city={city_param}, ad_type={ad_type_param}")
-    print(f"DEBUG catalog view: все GET параметры: {dict(request.GET)}")
-    
     # Определяем, какие типы объявлений показывать
-    if not ad_type_param:
-        # Если ad_type не указан - показываем ВСЕ объявления по продаже И аренде вместе
-        ads = get_filtered_ads(request)
-        ads = ads.filter(ad_type__in=['sale', 'rent'])
-    elif ad_type_param in ['sale', 'rent']:
-        # Если указан конкретный тип (sale или rent) - показываем только его
-        ads = get_filtered_ads(request, ad_type_filter=ad_type_param)
-    else:
-        # Если указан другой тип (service, parts) - не показываем (или можно показать пустой список)
-        ads = get_filtered_ads(request)
-        ads = ads.none()  # Пустой QuerySet
+    ads = _listing_ads(request, 'catalog')
     
-    # Сохраняем общее количество до пагинации
-    total_count = ads.count()
+    # Пагинация: номера первых страниц, дальше курсор; total_count из кэша
+    page_obj, total_count = _paginate_listing(request, ads)
     
-    # Пагинация
-    paginator = Paginator(ads, 12)
-    page_number = request.GET.get('page', 1)
-    try:
-        page_obj = paginator.get_page(page_number)
-    except:
-        page_obj = paginator.get_page(1)
-    
-    # Получаем уникальные города для фильтра
-    # Учитываем только объявления о продаже и аренде (без услуг и запчастей)
-    country = request.GET.get('country')
-    if country and country != 'all' and country.strip():
-        cities_query = Advertisement.objects.filter(
-            is_active=True, 
-            country=country.strip(),
-            ad_type__in=['sale', 'rent']
-        )
-    else:
-        cities_query = Advertisement.objects.filter(
-            is_active=True,
-            ad_type__in=['sale', 'rent']
-        )
-    
-    # Если указан конкретный ad_type, фильтруем города по нему
-    if ad_type_param in ['sale', 'rent']:
-        cities_query = cities_query.filter(ad_type=ad_type_param)
-    
-    cities = cities_query.values_list('city', flat=True).distinct().order_by('city')
+    # Города и счётчики фильтров из предагрегированных фасетов (без GROUP BY по объявлениям)
+    facets = _listing_facets(request, 'catalog')
+    cities = facets['city']
     
     # Получаем список ID избранных объявлений для текущего пользователя
-    favorited_ad_ids = []
-    if request.user.is_authenticated:
-        favorited_ad_ids = list(Favorite.objects.filter(user=request.user).values_list('advertisement_id', flat=True))
+    favorited_ad_ids = _favorited_ad_ids(request)
     
     context = {
         'user': request.user,
         'ads': page_obj,
         'page_obj': page_obj,
         'cities': cities,
+        'facets': facets,
         'total_count': total_count,
         'favorited_ad_ids': favorited_ad_ids,
+        'listing_section': 'catalog',
+        'listing_query': _listing_query(request),
     }
+    _tag_listing_page(request, 'catalog', page_obj)
     return render(request, 'uzmat/catalog.html', context)
 
 
@@ -1398,38 +1442,12 @@ def create_ad(request):
             else:
                 ad.price_usd = None
             
-            # Создаем slug вручную, если его нет
-            if not ad.slug or ad.slug.strip() == '':
-                ad.slug = slugify(ad.title)
-                if not ad.slug or ad.slug.strip() == '':
-                    # Если slug все еще пустой (например, title содержит только спецсимволы)
-                    ad.slug = slugify(f"ad-{ad.ad_type}-{ad.pk or 'new'}")
-            
-            # Убеждаемся, что slug уникален
-            original_slug = ad.slug
-            counter = 1
-            while Advertisement.objects.filter(slug=ad.slug).exclude(pk=ad.pk).exists():
-                ad.slug = f"{original_slug}-{counter}"
-                counter += 1
-            
             # Сохраняем объявление сначала, чтобы получить ID
+            # (slug из транслитерированного заголовка ставит Advertisement.save — utils/slugs.py)
             try:
                 ad.save()
                 # Проверяем, что объявление действительно сохранилось
                 if ad.pk:
-                    # Обновляем slug после сохранения, если он все еще пустой
-                    if not ad.slug or ad.slug.strip() == '':
-                        ad.slug = slugify(ad.title)
-                        if not ad.slug:
-                            ad.slug = f"ad-{ad.pk}"
-                        # Проверяем уникальность
-                        original_slug = ad.slug
-                        counter = 1
-                        while Advertisement.objects.filter(slug=ad.slug).exclude(pk=ad.pk).exists():
-                            ad.slug = f"{original_slug}-{counter}"
-                            counter += 1
-                        ad.save(update_fields=['slug'])
-                    
                     # Обработка загрузки фотографий (до 10 фотографий)
                     # Оптимизировано: быстрая валидация и bulk_create для производительности
                     photos = request.FILES.getlist('photos')
@@ -1475,18 +1493,24 @@ def create_ad(request):
                             
                             # Один запрос к БД вместо N запросов
                             AdvertisementImage.objects.bulk_create(image_objects)
+                            # Уменьшенные копии для карточек — в фоне (на MySQL bulk_create не возвращает id)
+                            schedule_thumbnails(
+                                AdvertisementImage,
+                                list(AdvertisementImage.objects.filter(advertisement=ad).values_list('id', flat=True))
+                            )
                             logging.info(f"Сохранено {len(image_objects)} фото для объявления {ad.id}")
                     
-                    # ВАЖНО: Отправляем в Telegram АСИНХРОННО в фоновом потоке
-                    # Это не блокирует ответ пользователю и значительно ускоряет создание объявления
+                    # Публикация в Telegram — только запись в очередь (отправляет run_telegram_outbox)
                     if django_settings.TELEGRAM_ENABLED:
-                        from uzmat.utils.background_tasks import run_in_background, send_ad_to_telegram_async
-                        
-                        # Запускаем отправку в фоновом потоке (не блокирует ответ)
-                        # Пользователь получит ответ сразу, а отправка в Telegram произойдет в фоне
-                        run_in_background(send_ad_to_telegram_async, ad.id)
-                        logging.info(f"Запущена асинхронная отправка объявления {ad.id} в Telegram")
-                    
+                        from uzmat.utils.telegram_outbox import enqueue_ad
+
+                        enqueue_ad(ad.id)
+                        logging.info(f"Объявление {ad.id} поставлено в очередь на отправку в Telegram")
+
+                    # Сверка с сохранёнными поисками покупателей — тоже в фоне через очередь
+                    from uzmat.utils.task_queue import enqueue_task
+                    enqueue_task('match_saved_searches', ad.id)
+
                     messages.success(request, f'Объявление "{ad.title}" успешно создано!')
                     return redirect('uzmat:ad_detail', slug=ad.slug)
                 else:
@@ -1538,6 +1562,7 @@ def edit_ad(request, slug):
         return redirect('uzmat:ad_detail', slug=slug)
     
     if request.method == 'POST':
+        old_title = ad.title
         try:
             # Получаем данные формы
             ad_type = request.POST.get('ad_type', ad.ad_type)
@@ -1717,15 +1742,9 @@ def edit_ad(request, slug):
             else:
                 ad.price_usd = None
             
-            # Обновляем slug, если изменился заголовок
-            new_slug = slugify(ad.title)
-            if new_slug and new_slug != ad.slug:
-                original_slug = new_slug
-                counter = 1
-                while Advertisement.objects.filter(slug=new_slug).exclude(pk=ad.pk).exists():
-                    new_slug = f"{original_slug}-{counter}"
-                    counter += 1
-                ad.slug = new_slug
+            # Обновляем slug, если изменился заголовок (старый адрес остаётся редиректом)
+            if ad.title != old_title and not slug_matches_title(ad):
+                change_slug(ad)
             
             # Обработка изображений
             MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10 МБ на фото
@@ -1864,13 +1883,7 @@ def promote_ad(request, slug):
         plan = request.POST.get('plan')
         country = request.POST.get('country') or request.GET.get('country') or 'uz'
         
-        durations = {
-            'gold': 3,
-            'premium': 14,
-            'vip': 30,
-        }
-        
-        days = durations.get(plan)
+        days = PROMOTION_DAYS.get(plan)
         if not days:
             messages.error(request, 'Неизвестный тариф продвижения')
             return redirect('uzmat:promote_info', slug=slug)
@@ -1879,26 +1892,12 @@ def promote_ad(request, slug):
         from .utils.currency import BASE_PRICES_UZS
         base_price_uzs = BASE_PRICES_UZS.get(plan, Decimal('0'))
         
-        # Генерируем уникальный ID платежа (timestamp + user_id)
-        import time
-        payment_id = int(time.time() * 1000) + request.user.id
-        
-        # Сохраняем данные о платеже в кэше (не в БД, TTL 24 часа)
-        from django.core.cache import cache
-        payment_data = {
-            'payment_type': 'promotion',
-            'user_id': request.user.id,
-            'ad_id': ad.id,
-            'ad_slug': ad.slug,
-            'plan': plan,
-            'amount': str(base_price_uzs),
-            'created_at': timezone.now().isoformat(),
-        }
-        cache.set(f'payment_{payment_id}', payment_data, 3600 * 24)  # 24 часа
+        # Платёж в БД (utils/payments.py): его id — merchant_trans_id для Click
+        payment = create_payment(request.user, 'promotion', base_price_uzs, advertisement=ad, plan=plan)
         
         # Генерируем URL для оплаты (Click принимает только сумы)
         return_url = request.build_absolute_uri(reverse('uzmat:profile'))
-        payment_url = generate_click_payment_url(payment_id, base_price_uzs, return_url)
+        payment_url = generate_click_payment_url(payment.id, base_price_uzs, return_url)
         
         return redirect(payment_url)
     
@@ -1915,29 +1914,21 @@ def promote_info(request, slug):
     click_trans_id = request.GET.get('click_trans_id')
     error = request.GET.get('error')
     
-    if merchant_trans_id and click_trans_id:
-        from django.core.cache import cache
-        try:
-            payment_id = int(merchant_trans_id)
-            # Проверяем, был ли платеж успешно обработан
-            payment_success_key = f'payment_success_{payment_id}'
-            payment_success = cache.get(payment_success_key)
-            
-            if payment_success:
-                # Платеж успешно обработан
+    payment = payment_for_return(request.user, merchant_trans_id) if merchant_trans_id and click_trans_id else None
+    if payment is not None:
+        if payment.status == 'completed':
+            # Сообщение об успехе — только при первом возврате
+            if mark_result_shown(payment):
                 plan_names = {'gold': 'GOLD', 'premium': 'PREMIUM', 'vip': 'VIP'}
-                plan_name = plan_names.get(payment_success.get('plan', ''), '')
+                plan_name = plan_names.get(payment.plan, '')
                 messages.success(request, f'Платеж успешно обработан! Продвижение {plan_name} активировано для объявления "{ad.title}".')
-                cache.delete(payment_success_key)
-            elif error:
-                # Была ошибка при оплате
-                error_note = request.GET.get('error_note', 'Неизвестная ошибка')
-                messages.error(request, f'Ошибка при оплате: {error_note}')
-            else:
-                # Платеж еще обрабатывается
-                messages.info(request, 'Платеж обрабатывается. Продвижение будет активировано в течение нескольких минут.')
-        except (ValueError, TypeError):
-            pass
+        elif error or payment.status == 'failed':
+            # Была ошибка при оплате
+            error_note = request.GET.get('error_note') or payment.error_note or 'Неизвестная ошибка'
+            messages.error(request, f'Ошибка при оплате: {error_note}')
+        else:
+            # Платеж еще обрабатывается
+            messages.info(request, 'Платеж обрабатывается. Продвижение будет активировано в течение нескольких минут.')
     
     # Получаем страну из запроса или localStorage (по умолчанию uz)
     country = request.GET.get('country') or 'uz'
@@ -1970,27 +1961,18 @@ def verify_info(request):
     click_trans_id = request.GET.get('click_trans_id')
     error = request.GET.get('error')
     
-    if merchant_trans_id and click_trans_id:
-        from django.core.cache import cache
-        try:
-            payment_id = int(merchant_trans_id)
-            # Проверяем, был ли платеж успешно обработан
-            payment_success_key = f'payment_success_{payment_id}'
-            payment_success = cache.get(payment_success_key)
-            
-            if payment_success:
-                # Платеж успешно обработан
+    payment = payment_for_return(user, merchant_trans_id) if merchant_trans_id and click_trans_id else None
+    if payment is not None:
+        if payment.status == 'completed':
+            if mark_result_shown(payment):
                 messages.success(request, 'Платеж успешно обработан! Заявка на верификацию создана и отправлена на модерацию. Вы получите уведомление после проверки.')
-                cache.delete(payment_success_key)
-            elif error:
-                # Была ошибка при оплате
-                error_note = request.GET.get('error_note', 'Неизвестная ошибка')
-                messages.error(request, f'Ошибка при оплате: {error_note}')
-            else:
-                # Платеж еще обрабатывается
-                messages.info(request, 'Платеж обрабатывается. Заявка на верификацию будет создана в течение нескольких минут.')
-        except (ValueError, TypeError):
-            pass
+        elif error or payment.status == 'failed':
+            # Была ошибка при оплате
+            error_note = request.GET.get('error_note') or payment.error_note or 'Неизвестная ошибка'
+            messages.error(request, f'Ошибка при оплате: {error_note}')
+        else:
+            # Платеж еще обрабатывается
+            messages.info(request, 'Платеж обрабатывается. Заявка на верификацию будет создана в течение нескольких минут.')
 
     if request.method == 'POST':
         if user.verification_status == 'pending':
@@ -2005,25 +1987,12 @@ def verify_info(request):
         amount_usd = Decimal('15.00')
         amount_uzs = convert_usd_to_uzs(float(amount_usd))
         
-        # Генерируем уникальный ID платежа (timestamp + user_id)
-        import time
-        payment_id = int(time.time() * 1000) + user.id
-        
-        # Сохраняем данные о платеже в кэше (не в БД, TTL 24 часа)
-        from django.core.cache import cache
-        payment_data = {
-            'payment_type': 'verification',
-            'user_id': user.id,
-            'verification_type': v_type,
-            'amount': str(amount_uzs),
-            'amount_usd': str(amount_usd),
-            'created_at': timezone.now().isoformat(),
-        }
-        cache.set(f'payment_{payment_id}', payment_data, 3600 * 24)  # 24 часа
+        # Платёж в БД (utils/payments.py): его id — merchant_trans_id для Click
+        payment = create_payment(user, 'verification', amount_uzs, verification_type=v_type)
         
         # Генерируем URL для оплаты (Click принимает только сумы)
         return_url = request.build_absolute_uri(reverse('uzmat:verify_info'))
-        payment_url = generate_click_payment_url(payment_id, amount_uzs, return_url)
+        payment_url = generate_click_payment_url(payment.id, amount_uzs, return_url)
         
         return redirect(payment_url)
 
@@ -2138,8 +2107,7 @@ def verify_moderation_detail(request, request_id: int):
             msg.set_text(comment)
             msg.save()
 
-            support_thread.last_message_at = msg.created_at
-            support_thread.save(update_fields=['last_message_at'])
+            support_thread.register_message(msg)
 
         if action == 'approve':
             messages.success(request, 'Профиль успешно верифицирован.')
@@ -2186,18 +2154,14 @@ def admin_send_notification(request):
             msg = ChatMessage(thread=thread, sender=me)
             msg.set_text(text)
             msg.save()
-            thread.last_message_at = msg.created_at
-            thread.save(update_fields=['last_message_at'])
+            thread.register_message(msg)
 
         try:
             if target == 'all':
-                users = User.objects.filter(is_active=True, is_staff=False).only('id')[:50000]
-                sent = 0
-                with transaction.atomic():
-                    for u in users.iterator():
-                        send_to_user(u)
-                        sent += 1
-                messages.success(request, f'Уведомление отправлено: {sent} пользователям.')
+                # Рассылка всем идёт фоновой задачей пачками (utils/broadcasts.py)
+                from .utils.broadcasts import start_broadcast
+                broadcast = start_broadcast(me, text)
+                messages.success(request, f'Рассылка #{broadcast.id} запущена: {broadcast.total_recipients} получателей. Прогресс — ниже на странице.')
             else:
                 try:
                     uid = int(user_id)
@@ -2217,9 +2181,11 @@ def admin_send_notification(request):
         return redirect('uzmat:admin_send_notification')
 
     users = User.objects.filter(is_active=True, is_staff=False).order_by('id')[:2000]
+    broadcasts = Broadcast.objects.select_related('sender')[:10]
     return render(request, 'uzmat/admin_send_notification.html', {
         'user': me,
         'users': users,
+        'broadcasts': broadcasts,
     })
 
 
@@ -2242,6 +2208,38 @@ def toggle_favorite(request, ad_id):
     return JsonResponse({'error': 'Invalid request method'}, status=405)
 
 
+@login_required
+@require_http_methods(["POST"])
+def saved_search_create(request):
+    """Сохранить текущий фильтр ленты, чтобы получать уведомления о новых объявлениях"""
+    from .utils.saved_searches import save_search
+
+    section = request.POST.get('section') or 'catalog'
+    if section not in LISTING_SECTIONS:
+        section = 'catalog'
+    saved_search, error = save_search(
+        request.user,
+        section,
+        request.POST.get('query') or '',
+        notify_email=request.POST.get('notify_email') == '1',
+    )
+    if error:
+        messages.error(request, error)
+        return redirect('uzmat:catalog')
+    messages.success(request, f'Поиск «{saved_search.title}» сохранён. Новые объявления придут в чат техподдержки.')
+    return redirect(saved_search.get_absolute_url())
+
+
+@login_required
+@require_http_methods(["POST"])
+def saved_search_delete(request, search_id: int):
+    """Отключить сохранённый поиск"""
+    updated = SavedSearch.objects.filter(id=search_id, user=request.user).update(is_active=False)
+    if updated:
+        messages.success(request, 'Сохранённый поиск удалён.')
+    return redirect('uzmat:profile')
+
+
 def privacy_policy(request):
     """Страница политики конфиденциальности"""
     context = {
@@ -2274,40 +2272,22 @@ def about(request):
     return render(request, 'uzmat/about.html', context)
 
 
+@conditional_page(_listing_validators('logistics'))
+@cache_anonymous_page('logistics')
 def logistics(request):
     """Страница ремонта - показывает все объявления типа 'service'"""
     # Получаем объявления типа 'service' с применением фильтров
-    ads = get_filtered_ads(request, ad_type_filter='service')
-    
-    # Сохраняем общее количество до пагинации
-    total_count = ads.count()
+    ads = _listing_ads(request, 'logistics')
     
-    # Пагинация
-    paginator = Paginator(ads, 12)
-    page_number = request.GET.get('page', 1)
-    try:
-        page_obj = paginator.get_page(page_number)
-    except:
-        page_obj = paginator.get_page(1)
+    # Пагинация: номера первых страниц, дальше курсор; total_count из кэша
+    page_obj, total_count = _paginate_listing(request, ads)
     
-    # Получаем уникальные города для фильтра
-    country = request.GET.get('country')
-    if country and country != 'all' and country.strip():
-        cities = Advertisement.objects.filter(
-            is_active=True, 
-            country=country.strip(),
-            ad_type='service'
-        ).values_list('city', flat=True).distinct().order_by('city')
-    else:
-        cities = Advertisement.objects.filter(
-            is_active=True,
-            ad_type='service'
-        ).values_list('city', flat=True).distinct().order_by('city')
+    # Города и счётчики фильтров из предагрегированных фасетов (без GROUP BY по объявлениям)
+    facets = _listing_facets(request, 'logistics')
+    cities = facets['city']
     
     # Получаем список ID избранных объявлений для текущего пользователя
-    favorited_ad_ids = []
-    if request.user.is_authenticated:
-        favorited_ad_ids = list(Favorite.objects.filter(user=request.user).values_list('advertisement_id', flat=True))
+    favorited_ad_ids = _favorited_ad_ids(request)
     
     context = {
         'active_tab': 'services',
@@ -2315,9 +2295,13 @@ def logistics(request):
         'ads': page_obj,
         'page_obj': page_obj,
         'cities': cities,
+        'facets': facets,
         'total_count': total_count,
         'favorited_ad_ids': favorited_ad_ids,
+        'listing_section': 'logistics',
+        'listing_query': _listing_query(request),
     }
+    _tag_listing_page(request, 'logistics', page_obj)
     return render(request, 'uzmat/logistics.html', context)
 
 
@@ -2334,188 +2318,11 @@ def add_cargo(request):
 @require_http_methods(["POST"])
 def click_webhook(request):
     """
-    Webhook для обработки callback от Click платежной системы
-    Использует кэш вместо БД для хранения данных о платежах
+    Webhook для обработки callback от Click платежной системы.
+    Платежи хранятся в таблице Payment, переходы статусов — utils/payments.py
     """
-    from django.core.cache import cache
-    
     try:
-        # Получаем параметры из запроса
-        merchant_trans_id = request.POST.get('merchant_trans_id', '')
-        click_trans_id = request.POST.get('click_trans_id', '')
-        amount = request.POST.get('amount', '')
-        action = int(request.POST.get('action', '0'))
-        sign_time = request.POST.get('sign_time', '')
-        sign_string = request.POST.get('sign_string', '')
-        merchant_prepare_id = request.POST.get('merchant_prepare_id', '')
-        error = request.POST.get('error', '')
-        error_note = request.POST.get('error_note', '')
-        
-        # Получаем данные о платеже из кэша
-        try:
-            payment_id = int(merchant_trans_id)
-            payment_data = cache.get(f'payment_{payment_id}')
-            
-            if not payment_data:
-                return JsonResponse({
-                    'error': -5,
-                    'error_note': 'Invalid merchant_trans_id'
-                })
-        except (ValueError, TypeError):
-            return JsonResponse({
-                'error': -5,
-                'error_note': 'Invalid merchant_trans_id'
-            })
-        
-        # Проверяем подпись
-        amount_decimal = Decimal(amount)
-        if not verify_click_signature(
-            merchant_trans_id=merchant_trans_id,
-            merchant_prepare_id=merchant_prepare_id or '',
-            amount=amount_decimal,
-            action=action,
-            sign_time=sign_time,
-            sign_string=sign_string
-        ):
-            return JsonResponse({
-                'error': -1,
-                'error_note': 'Invalid signature'
-            })
-        
-        # Обрабатываем действия
-        if action == 0:  # Prepare
-            # Проверяем сумму
-            expected_amount = Decimal(payment_data['amount'])
-            if amount_decimal != expected_amount:
-                return JsonResponse({
-                    'error': -2,
-                    'error_note': 'Invalid amount'
-                })
-            
-            # Сохраняем prepare_id в кэш
-            payment_data['click_payment_id'] = merchant_prepare_id
-            cache.set(f'payment_{payment_id}', payment_data, 3600 * 24)  # 24 часа
-            
-            return JsonResponse({
-                'click_trans_id': click_trans_id,
-                'merchant_trans_id': merchant_trans_id,
-                'merchant_prepare_id': merchant_prepare_id,
-                'error': 0,
-                'error_note': 'Success'
-            })
-        
-        elif action == 1:  # Complete
-            # Проверяем сумму
-            expected_amount = Decimal(payment_data['amount'])
-            if amount_decimal != expected_amount:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f'Click webhook: Invalid amount. Expected: {expected_amount}, Got: {amount_decimal}, Payment ID: {payment_id}')
-                return JsonResponse({
-                    'error': -2,
-                    'error_note': 'Invalid amount'
-                })
-            
-            # Обрабатываем в зависимости от типа платежа
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f'Click webhook: Processing payment complete. Payment ID: {payment_id}, Type: {payment_data.get("payment_type")}')
-            
-            with transaction.atomic():
-                payment_type = payment_data.get('payment_type')
-                
-                if payment_type == 'promotion':
-                    # Активируем продвижение объявления
-                    ad_id = payment_data.get('ad_id')
-                    plan = payment_data.get('plan')
-                    
-                    if ad_id and plan:
-                        try:
-                            ad = Advertisement.objects.get(id=ad_id)
-                            durations = {
-                                'gold': 3,
-                                'premium': 14,
-                                'vip': 30,
-                            }
-                            days = durations.get(plan, 0)
-                            if days > 0:
-                                now = timezone.now()
-                                ad.is_promoted = True
-                                ad.promoted_at = now
-                                ad.promotion_until = now + timezone.timedelta(days=days)
-                                ad.promotion_plan = plan
-                                ad.save(update_fields=['is_promoted', 'promoted_at', 'promotion_until', 'promotion_plan'])
-                                
-                                # Сохраняем флаг успешной оплаты для уведомления пользователя
-                                cache.set(f'payment_success_{payment_id}', {
-                                    'plan': plan,
-                                    'ad_id': ad_id,
-                                    'ad_title': ad.title,
-                                }, 3600)  # 1 час
-                                logger.info(f'Click webhook: Promotion activated. Ad ID: {ad_id}, Plan: {plan}, Payment ID: {payment_id}')
-                        except Advertisement.DoesNotExist:
-                            logger.error(f'Click webhook: Advertisement not found. Ad ID: {ad_id}, Payment ID: {payment_id}')
-                            pass
-                
-                elif payment_type == 'verification':
-                    # Создаем заявку на верификацию
-                    user_id = payment_data.get('user_id')
-                    v_type = payment_data.get('verification_type', 'individual')
-                    
-                    if user_id:
-                        try:
-                            user = User.objects.get(id=user_id)
-                            
-                            VerificationRequest.objects.create(
-                                user=user,
-                                verification_type=v_type,
-                                status='pending',
-                            )
-                            
-                            user.verification_type = v_type
-                            user.verification_status = 'pending'
-                            user.is_verified = False
-                            user.verified_until = None
-                            user.save(update_fields=['verification_type', 'verification_status', 'is_verified', 'verified_until'])
-                            
-                            # Сохраняем флаг успешной оплаты для уведомления пользователя
-                            cache.set(f'payment_success_{payment_id}', {
-                                'verification_type': v_type,
-                                'user_id': user_id,
-                            }, 3600)  # 1 час
-                            logger.info(f'Click webhook: Verification request created. User ID: {user_id}, Type: {v_type}, Payment ID: {payment_id}')
-                        except User.DoesNotExist:
-                            logger.error(f'Click webhook: User not found. User ID: {user_id}, Payment ID: {payment_id}')
-                            pass
-            
-            # Удаляем данные о платеже из кэша после успешной обработки
-            cache.delete(f'payment_{payment_id}')
-            
-            return JsonResponse({
-                'click_trans_id': click_trans_id,
-                'merchant_trans_id': merchant_trans_id,
-                'merchant_confirm_id': merchant_trans_id,
-                'error': 0,
-                'error_note': 'Success'
-            })
-        
-        elif action == -1:  # Cancel
-            # Удаляем данные о платеже из кэша при отмене
-            cache.delete(f'payment_{payment_id}')
-            
-            return JsonResponse({
-                'click_trans_id': click_trans_id,
-                'merchant_trans_id': merchant_trans_id,
-                'error': 0,
-                'error_note': 'Success'
-            })
-        
-        else:
-            return JsonResponse({
-                'error': -8,
-                'error_note': 'Action not found'
-            })
-    
+        return JsonResponse(handle_click_webhook(request.POST))
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
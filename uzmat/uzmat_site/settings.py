@@ -18,6 +18,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-uzmat-premium-site-2024-secret-key-change-in-production')
+# Прежние значения SECRET_KEY (через запятую) — чтобы после смены ключа читались старые сессии и сообщения
+SECRET_KEY_FALLBACKS = [k for k in os.environ.get('SECRET_KEY_FALLBACKS', '').split(',') if k.strip()]
 
 # SECURITY WARNING: don't run with debug turned on in production!
 # По умолчанию False для безопасности в production
@@ -217,6 +219,14 @@ DATA_UPLOAD_MAX_NUMBER_FIELDS = 1000
 # Session settings (запоминание пользователя)
 SESSION_COOKIE_AGE = 60 * 60 * 24 * 30  # 30 дней
 SESSION_SAVE_EVERY_REQUEST = True
+# Кэш + БД; неизменённая сессия не пишется в БД на каждый запрос (uzmat/utils/sessions.py)
+SESSION_ENGINE = 'uzmat.utils.sessions'
+# Срок сессии в БД продлевается не чаще раза в столько секунд
+SESSION_REFRESH_INTERVAL = int(os.environ.get('SESSION_REFRESH_INTERVAL', str(60 * 60 * 24)))
+# Сколько секунд сессия живёт в кэше (источник истины — БД)
+SESSION_CACHE_TIMEOUT = int(os.environ.get('SESSION_CACHE_TIMEOUT', '60'))
+# Как часто счётчики записей/пропусков сессий уходят из памяти процесса в общий кэш
+SESSION_METRICS_FLUSH_INTERVAL = int(os.environ.get('SESSION_METRICS_FLUSH_INTERVAL', '30'))
 SESSION_COOKIE_SECURE = not DEBUG  # True в production (HTTPS), False в development
 SESSION_COOKIE_HTTPONLY = True  # Защита от XSS
 SESSION_COOKIE_SAMESITE = 'Lax'  # Защита от CSRF
@@ -278,36 +288,48 @@ CLICK_SETTINGS = {
     'API_URL': 'https://api.click.uz/v2/merchant/',
 }
 
-# Кэш для конвертации валют и оптимизации производительности
-# Для production используйте Redis, для разработки - локальный кэш
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Кэш: L1 в памяти каждого воркера + общий L2 (uzmat/utils/two_tier_cache.py).
+# L2 — файл SQLite на хосте (общий для воркеров gunicorn и ASGI-процесса)
+# или Redis, если задан REDIS_URL (нужен пакет redis). Каждая запись в L2 на
+# SQLite — транзакция с блокировкой файла на все процессы: при нескольких
+# воркерах и заметной доле записей задайте REDIS_URL.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, '.cache'))
+
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'uzmat',
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'uzmat.utils.sqlite_cache.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'shared_cache.sqlite3'),
         'OPTIONS': {
-            'MAX_ENTRIES': 10000,
+            'MAX_ENTRIES': 50000,
             'CULL_FREQUENCY': 3,
         },
-        'TIMEOUT': 300,  # 5 минут по умолчанию
     }
-}
+SHARED_CACHE['TIMEOUT'] = 300  # 5 минут по умолчанию
 
-# Для production раскомментируйте и настройте Redis:
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-#         'LOCATION': 'redis://127.0.0.1:6379/1',
-#         'OPTIONS': {
-#             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-#             'SOCKET_CONNECT_TIMEOUT': 5,
-#             'SOCKET_TIMEOUT': 5,
-#             'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
-#             'IGNORE_EXCEPTIONS': True,
-#         },
-#         'KEY_PREFIX': 'uzmat',
-#         'TIMEOUT': 300,
-#     }
-# }
+CACHES = {
+    'default': {
+        'BACKEND': 'uzmat.utils.two_tier_cache.TwoTierCache',
+        'LOCATION': 'shared',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': 2000,
+            # Сколько секунд значение может жить в памяти воркера
+            'L1_TIMEOUT': 30,
+            # Как часто воркер сверяет журнал изменений других воркеров, сек
+            'SYNC_INTERVAL': 1.0,
+            # Только в общем кэше: часто меняющиеся счётчики и попытки входа
+            'L2_ONLY_PREFIXES': ('metrics:', 'login_attempts_', 'rate_limit_'),
+        },
+    },
+    'shared': SHARED_CACHE,
+}
 
 # Настройки email отключены (не используются в проекте)
 # Если понадобится отправка email в будущем, раскомментируйте и настройте:
@@ -328,6 +350,39 @@ STATIC_VERSION = os.environ.get('STATIC_VERSION', '2.6.0')
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '8294717234:AAGpeaIppFMSqnmZOjte-YbIOK3a9ZC-QF0')
 TELEGRAM_CHANNEL_ID = os.environ.get('TELEGRAM_CHANNEL_ID', '@Uzmat_uz')
 TELEGRAM_ENABLED = os.environ.get('TELEGRAM_ENABLED', 'True') == 'True'
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+# Очередь публикаций (utils/telegram_outbox.py): лимит канала ~20 сообщений в минуту
+TELEGRAM_RATE_PER_MINUTE = int(os.environ.get('TELEGRAM_RATE_PER_MINUTE', '20'))
+TELEGRAM_BURST = int(os.environ.get('TELEGRAM_BURST', '3'))
+
+# Фоновые задачи: пул потоков на процесс и ограниченная очередь (utils/background_tasks.py)
+BACKGROUND_TASK_WORKERS = int(os.environ.get('BACKGROUND_TASK_WORKERS', '4'))
+BACKGROUND_TASK_QUEUE_SIZE = int(os.environ.get('BACKGROUND_TASK_QUEUE_SIZE', '1000'))
+BACKGROUND_TASK_SUBMIT_TIMEOUT = float(os.environ.get('BACKGROUND_TASK_SUBMIT_TIMEOUT', '0.05'))
+
+# Как часто (сек) накопленные просмотры объявлений сбрасываются в БД (utils/view_counter.py)
+VIEW_COUNTER_FLUSH_INTERVAL = int(os.environ.get('VIEW_COUNTER_FLUSH_INTERVAL', '10'))
+
+# Сколько секунд кэшируется число объявлений в лентах каталога (utils/pagination.py)
+LISTING_COUNT_CACHE_TIMEOUT = int(os.environ.get('LISTING_COUNT_CACHE_TIMEOUT', '60'))
+
+# Индекс подсказок при вводе (utils/suggest.py): дозагрузка новых объявлений и полная пересборка, сек
+SUGGEST_REFRESH_INTERVAL = int(os.environ.get('SUGGEST_REFRESH_INTERVAL', '60'))
+SUGGEST_FULL_REBUILD_INTERVAL = int(os.environ.get('SUGGEST_FULL_REBUILD_INTERVAL', '3600'))
+
+# Сколько секунд анонимные страницы (главная, ленты, объявление) живут в кэше (utils/page_cache.py).
+# Сброс по тегам при изменении объявлений (версии тегов в общем кэше)
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', '60'))
+# Как часто счётчики попаданий/промахов кэша страниц уходят из памяти процесса в общий кэш
+PAGE_CACHE_METRICS_FLUSH_INTERVAL = int(os.environ.get('PAGE_CACHE_METRICS_FLUSH_INTERVAL', '30'))
+
+# ETag анонимных страниц меняется не реже раза в столько секунд (utils/conditional.py):
+# истечение продвижения и проверки продавца версии содержимого не увеличивают
+CONDITIONAL_GET_PERIOD = int(os.environ.get('CONDITIONAL_GET_PERIOD', '300'))
+
+# Ключи шифрования чатов (Fernet, через запятую; первый — основной).
+# Без них ключ выводится из SECRET_KEY (и SECRET_KEY_FALLBACKS для старых сообщений)
+CHAT_ENCRYPTION_KEYS = [k for k in os.environ.get('CHAT_ENCRYPTION_KEYS', '').split(',') if k.strip()]
 
 # Site URL для формирования ссылок в Telegram сообщениях
 SITE_URL = os.environ.get('SITE_URL', 'https://uzmat.uz')